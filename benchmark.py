@@ -0,0 +1,983 @@
+"""
+Micro-benchmarks for the product search and ingestion paths.
+
+Usage:
+    python benchmark.py search [--docs N] [--dim D] [--queries Q]
+    python benchmark.py ingest [--docs N] [--batch-sizes 1,32] [--concurrency 1,4] [--latency-ms L]
+    python benchmark.py parse [--docs N] [--workers 1,2,4,8]
+    python benchmark.py ann [--docs N] [--dim D] [--nlist 256,1024] [--nprobe 1,8,32] [--ef-search 16,64,256]
+    python benchmark.py startup [--docs N] [--dim D] [--processes P] [--index flat|ivf|hnsw|ivfpq]
+    python benchmark.py embed [--texts N] [--dim D] [--latency-ms L]
+    python benchmark.py hydrate [--hits N]
+    python benchmark.py hybrid [--docs N] [--dim D] [--queries Q]
+    python benchmark.py batch [--docs N] [--dim D] [--queries Q] [--latency-ms L]
+    python benchmark.py concurrency [--docs N] [--dim D] [--sessions 1,8,32] [--queries-per-session Q] [--latency-ms L]
+    python benchmark.py microbatch [--docs N] [--dim D] [--sessions S] [--windows-ms 0,1,2,5,10] [--max-batch B]
+    python benchmark.py rerank [--docs N] [--dim D] [--queries Q]
+    python benchmark.py handles [--calls N] [--top-k K]
+    python benchmark.py views [--results N] [--top-k K]
+    python benchmark.py facets [--docs N] [--queries Q]
+    python benchmark.py analyze [--docs N] [--workers 1,2,4,8]
+    python benchmark.py mmr [--docs N] [--dim D] [--queries Q] [--diversity 0.7]
+
+Benchmarks run against a synthetic index in a temporary directory so they do not need
+the Ollama embedding server or the real product catalog. Embedding calls go to a
+local stand-in server that mimics the Ollama API.
+"""
+import argparse
+import asyncio
+import contextlib
+import hashlib
+import io
+import json
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Callable, List, Optional, Tuple
+
+import faiss
+import numpy as np
+
+from action import parse_function_call
+from embeddings import BatchEmbedder, HashingEmbeddingProvider, OllamaEmbeddingProvider, embed_text_async
+from index_store import INDEX_KINDS, IndexSpec, MutableProductIndex, ProductIndexStore
+import ingest
+import json_analyzer
+from reranker import RERANK_MIN_CANDIDATES, RERANK_OVERFETCH, mmr_select, rerank_rows
+from result_cache import ResultSetStore
+from result_views import VIEWS, project_rows
+from search_scheduler import MicroBatcher
+from models import ProductChunkTyped, ProductResponse, ProductResultSet, ProductTable
+
+BRANDS = ["Nike", "Puma", "Adidas", "Wildcraft", "Quechua", "Peter England", "Fastrack", "Titan"]
+GENDERS = ["Men", "Women", "Boys", "Girls", "Unisex"]
+ARTICLE_TYPES = ["Tshirts", "Shirts", "Backpacks", "Sports Shoes", "Watches", "Water Bottle", "Jeans"]
+USAGES = ["Casual", "Sports", "Formal", "Ethnic", "Travel"]
+SEASONS = ["Summer", "Winter", "Fall", "Spring"]
+COLOURS = ["Black", "White", "Blue", "Red", "Green", "Grey", "Orange", "Pink"]
+
+
+def percentile_report(name: str, latencies: List[float]) -> dict:
+    """
+    Summarise a list of latencies (seconds) as p50/p99 in milliseconds and print it.
+    """
+    arr = np.array(latencies) * 1000.0
+    report = {
+        "name": name,
+        "runs": len(latencies),
+        "p50_ms": float(np.percentile(arr, 50)),
+        "p99_ms": float(np.percentile(arr, 99)),
+        "mean_ms": float(arr.mean()),
+    }
+    print(f"{name:<32} runs={report['runs']:<6} p50={report['p50_ms']:.3f}ms "
+          f"p99={report['p99_ms']:.3f}ms mean={report['mean_ms']:.3f}ms")
+    return report
+
+
+def time_calls(fn: Callable, args_list: list) -> List[float]:
+    latencies = []
+    for args in args_list:
+        start = time.perf_counter()
+        fn(*args)
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def synthetic_product(i: int, rng: np.random.Generator) -> dict:
+    """
+    A product document shaped like the fashion-dataset style JSON files.
+    """
+    brand = BRANDS[rng.integers(len(BRANDS))]
+    article_type = ARTICLE_TYPES[rng.integers(len(ARTICLE_TYPES))]
+    gender = GENDERS[rng.integers(len(GENDERS))]
+    colour = COLOURS[rng.integers(len(COLOURS))]
+    usage = USAGES[rng.integers(len(USAGES))]
+    price = float(rng.integers(199, 9999))
+    name = f"{brand} {gender} {colour} {article_type} {i}"
+    return {"data": {
+        "id": i,
+        "price": price,
+        "discountedPrice": price,
+        "styleType": "P",
+        "productTypeId": int(rng.integers(1, 500)),
+        "articleNumber": f"ART{i:07d}",
+        "productDisplayName": name,
+        "variantName": f"{article_type} {colour}",
+        "myntraRating": float(rng.integers(0, 50)) / 10.0,
+        "catalogAddDate": 1300000000 + i,
+        "brandName": brand,
+        "ageGroup": "Adults-" + ("Men" if gender == "Men" else "Women"),
+        "gender": gender,
+        "baseColour": colour,
+        "colour1": "",
+        "colour2": "",
+        "fashionType": "Fashion",
+        "season": SEASONS[rng.integers(len(SEASONS))],
+        "year": "2012",
+        "usage": usage,
+        "vat": 5.5,
+        "displayCategories": "Sale and Clearance, Casual Wear",
+        "articleAttributes": {"Fit": "Regular Fit", "Pattern": "Solid", "Occasion": usage},
+        "masterCategory": {"id": 9, "typeName": "Apparel", "active": True},
+        "subCategory": {"id": 39, "typeName": "Topwear", "active": True},
+        "articleType": {"id": 90, "typeName": article_type, "active": True},
+        "productDescriptors": {
+            "description": {"descriptorType": "description",
+                            "value": f"<p>{name} made for <b>{usage.lower()}</b> wear &amp; everyday comfort.</p>"},
+            "materials_care_desc": {"descriptorType": "materials_care_desc",
+                                    "value": "100% cotton<br>Machine-wash cold"},
+        },
+    }}
+
+
+def write_synthetic_documents(doc_dir: Path, n_docs: int, seed: int = 0) -> None:
+    rng = np.random.default_rng(seed)
+    for i in range(n_docs):
+        (doc_dir / f"{i}.json").write_text(json.dumps(synthetic_product(i, rng)))
+
+
+def deterministic_embedding(text: str, dim: int) -> np.ndarray:
+    """
+    A fixed pseudo-random unit vector per text, standing in for a real embedding model.
+    """
+    seed = int.from_bytes(hashlib.md5(text.encode("utf-8")).digest()[:8], "little")
+    vec = np.random.default_rng(seed).standard_normal(dim).astype(np.float32)
+    return vec / np.linalg.norm(vec)
+
+
+class StandInEmbeddingServer:
+    """
+    A local HTTP/1.1 (keep-alive) server implementing Ollama's /api/embed and /api/embeddings
+    endpoints with deterministic vectors and an optional fixed per-request latency.
+    `backlog` is the listen queue size; keep it at least the number of concurrent clients,
+    or connections beyond it are refused or reset.
+
+    Usage:
+        with StandInEmbeddingServer(dim=768) as server:
+            BatchEmbedder(OllamaEmbeddingProvider(url=server.batch_url))
+    """
+
+    def __init__(self, dim: int = 768, latency_ms: float = 0.0, backlog: int = 128):
+        self.dim = dim
+        self.latency_ms = latency_ms
+        self.requests = 0
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                server.requests += 1
+                if server.latency_ms:
+                    time.sleep(server.latency_ms / 1000.0)
+                if self.path == "/api/embed":
+                    texts = body["input"] if isinstance(body["input"], list) else [body["input"]]
+                    payload = {"embeddings": [deterministic_embedding(t, server.dim).tolist() for t in texts]}
+                else:
+                    payload = {"embedding": deterministic_embedding(body["prompt"], server.dim).tolist()}
+                data = json.dumps(payload).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        class Server(ThreadingHTTPServer):
+            request_queue_size = backlog
+
+        self._httpd = Server(("127.0.0.1", 0), Handler)
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def batch_url(self) -> str:
+        return f"{self.base_url}/api/embed"
+
+    @property
+    def single_url(self) -> str:
+        return f"{self.base_url}/api/embeddings"
+
+    def __enter__(self) -> "StandInEmbeddingServer":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+
+def build_synthetic_index(index_dir: Path, n_docs: int, dim: int, seed: int = 0) -> np.ndarray:
+    """
+    Write a synthetic index.bin/metadata.json pair shaped like the real product index.
+
+    Returns:
+        np.ndarray: The vectors that were indexed.
+    """
+    rng = np.random.default_rng(seed)
+    vectors = rng.standard_normal((n_docs, dim)).astype(np.float32)
+    index = faiss.IndexFlatL2(dim)
+    index.add(vectors)
+    faiss.write_index(index, str(index_dir / "index.bin"))
+    metadata = [
+        {
+            "doc": f"{i}.json",
+            "chunk": f"productDisplayName: Product {i} |#| displayCategories: Apparel",
+            "product_id": str(i),
+            "metadata": json.dumps({"id": i, "productDisplayName": f"Product {i}"}),
+        }
+        for i in range(n_docs)
+    ]
+    (index_dir / "metadata.json").write_text(json.dumps(metadata, indent=2))
+    return vectors
+
+
+def bench_search(n_docs: int, dim: int, n_queries: int, top_k: int = 5) -> None:
+    """
+    Compare the legacy load-per-query search against the resident ProductIndexStore.
+    Query embedding is excluded; both paths search with the same random query vectors.
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        index_dir = Path(tmp)
+        build_synthetic_index(index_dir, n_docs, dim)
+        queries = np.random.default_rng(1).standard_normal((n_queries, dim)).astype(np.float32)
+
+        def legacy_search(query: np.ndarray):
+            index = faiss.read_index(str(index_dir / "index.bin"))
+            metadata = json.loads((index_dir / "metadata.json").read_text())
+            _, I = index.search(query.reshape(1, -1), top_k)
+            return [metadata[i] for i in I[0] if 0 <= i < len(metadata)]
+
+        store = ProductIndexStore(index_dir)
+        store.get()
+
+        def resident_search(query: np.ndarray):
+            _, hits = store.get().search(query.reshape(1, -1), top_k)
+            return hits[0]
+
+        print(f"search benchmark: docs={n_docs} dim={dim} queries={n_queries} top_k={top_k}")
+        args = [(q,) for q in queries]
+        percentile_report("legacy (reload per query)", time_calls(legacy_search, args))
+        percentile_report("resident ProductIndexStore", time_calls(resident_search, args))
+
+
+def bench_ingest(n_docs: int, dim: int, batch_sizes: List[int], concurrencies: List[int],
+                 latency_ms: float) -> None:
+    """
+    Ingest a synthetic document directory against the stand-in embedding server for each
+    (batch_size, concurrency) combination and report docs/sec.
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        doc_dir = Path(tmp) / "documents"
+        doc_dir.mkdir()
+        write_synthetic_documents(doc_dir, n_docs)
+        print(f"ingest benchmark: docs={n_docs} dim={dim} server latency={latency_ms}ms/request")
+        with StandInEmbeddingServer(dim=dim, latency_ms=latency_ms) as server:
+            for batch_size in batch_sizes:
+                for concurrency in concurrencies:
+                    index_dir = Path(tempfile.mkdtemp(dir=tmp))
+                    server.requests = 0
+                    embedder = BatchEmbedder(OllamaEmbeddingProvider(url=server.batch_url),
+                                             batch_size=batch_size, concurrency=concurrency)
+                    stats = ingest.process_product_documents(doc_dir, index_dir, embedder=embedder)
+                    print(f"batch_size={batch_size:<5} concurrency={concurrency:<3} "
+                          f"requests={server.requests:<6} {stats.docs_per_sec:10.1f} docs/sec")
+
+
+def bench_parse(n_docs: int, workers_list: List[int]) -> None:
+    """
+    Time the parse stage alone (read, MD5, clean, ProductChunkTyped.from_json) for each
+    process-pool size and report files/sec.
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        doc_dir = Path(tmp)
+        write_synthetic_documents(doc_dir, n_docs)
+        files = sorted(doc_dir.glob("*.json"))
+        print(f"parse benchmark: docs={n_docs}")
+        for workers in workers_list:
+            start = time.perf_counter()
+            parsed = sum(1 for r in ingest.iter_parsed(files, {}, workers=workers) if r.product is not None)
+            seconds = time.perf_counter() - start
+            print(f"workers={workers:<3} parsed={parsed:<7} {parsed / seconds:10.1f} files/sec")
+
+
+def bench_analyze(n_docs: int, workers_list: List[int]) -> None:
+    """
+    Files/sec of JsonStructureAnalyzer.analyze_directory for each process-pool size.
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        doc_dir = Path(tmp)
+        write_synthetic_documents(doc_dir, n_docs)
+        parser = "ijson (streaming)" if json_analyzer.ijson is not None else "json.load"
+        print(f"analyze benchmark: docs={n_docs} parser={parser}")
+        for workers in workers_list:
+            analyzer = json_analyzer.JsonStructureAnalyzer()
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                analyzer.analyze_directory(str(doc_dir), workers=workers)
+            seconds = time.perf_counter() - start
+            print(f"workers={workers:<3} analyzed={analyzer.processed_files:<7} {analyzer.processed_files / seconds:10.1f} files/sec")
+
+
+def clustered_vectors(n: int, dim: int, n_clusters: int, rng: np.random.Generator) -> np.ndarray:
+    """
+    Vectors drawn around random centres, closer to real embedding distributions than pure noise.
+    """
+    centres = rng.standard_normal((n_clusters, dim)).astype(np.float32)
+    points = centres[rng.integers(n_clusters, size=n)] + 0.3 * rng.standard_normal((n, dim)).astype(np.float32)
+    return np.ascontiguousarray(points, dtype=np.float32)
+
+
+def bench_ann(n_docs: int, dim: int, n_queries: int, top_k: int, nlists: List[int],
+              nprobes: List[int], ef_searches: List[int], pq_m: int) -> None:
+    """
+    Report recall@k against the flat baseline and per-query latency for each index type
+    and query-time setting, to pick index settings for a catalog of `n_docs` products.
+    """
+    rng = np.random.default_rng(0)
+    vectors = clustered_vectors(n_docs + n_queries, dim, max(16, n_docs // 500), rng)
+    vectors, queries = vectors[:n_docs], vectors[n_docs:]
+    ids = np.arange(n_docs, dtype=np.int64)
+
+    def run(name: str, index: faiss.Index, params: faiss.SearchParameters = None):
+        found, latencies = [], []
+        for q in queries:
+            start = time.perf_counter()
+            _, I = index.search(q.reshape(1, -1), top_k, params=params)
+            latencies.append(time.perf_counter() - start)
+            found.append(I[0])
+        recall = np.mean([len(set(f) & set(t)) / top_k for f, t in zip(found, truth)])
+        arr = np.array(latencies) * 1000.0
+        print(f"{name:<36} recall@{top_k}={recall:.3f} p50={np.percentile(arr, 50):.3f}ms "
+              f"p99={np.percentile(arr, 99):.3f}ms")
+
+    print(f"ann benchmark: docs={n_docs} dim={dim} queries={n_queries} top_k={top_k}")
+    flat = IndexSpec(kind="flat").build(vectors)
+    flat.add_with_ids(vectors, ids)
+    _, truth = flat.search(queries, top_k)
+    run("flat", flat)
+
+    for kind in ("ivf", "ivfpq"):
+        for nlist in nlists:
+            start = time.perf_counter()
+            try:
+                index = IndexSpec(kind=kind, nlist=nlist, pq_m=pq_m).build(vectors)
+            except ValueError as e:
+                print(f"{kind} nlist={nlist}: skipped ({e})")
+                continue
+            index.add_with_ids(vectors, ids)
+            print(f"{kind} nlist={nlist}: built in {time.perf_counter() - start:.1f}s")
+            for nprobe in nprobes:
+                params = faiss.SearchParametersIVF()
+                params.nprobe = nprobe
+                run(f"  {kind} nlist={nlist} nprobe={nprobe}", index, params)
+
+    start = time.perf_counter()
+    hnsw = IndexSpec(kind="hnsw").build(vectors)
+    hnsw.add_with_ids(vectors, ids)
+    print(f"hnsw M={IndexSpec.hnsw_m}: built in {time.perf_counter() - start:.1f}s")
+    for ef_search in ef_searches:
+        params = faiss.SearchParametersHNSW()
+        params.efSearch = ef_search
+        run(f"  hnsw efSearch={ef_search}", hnsw, params)
+
+
+def build_synthetic_checkpoint(index_dir: Path, n_docs: int, dim: int, seed: int = 0,
+                               spec: Optional[IndexSpec] = None) -> None:
+    """
+    Write a checkpointed index (manifest, versioned index and SQLite metadata) of synthetic
+    products, flat unless `spec` names another index kind.
+    """
+    rng = np.random.default_rng(seed)
+    product_index = MutableProductIndex()
+    for start in range(0, n_docs, 10000):
+        stop = min(start + 10000, n_docs)
+        rows = []
+        for i in range(start, stop):
+            data = synthetic_product(i, rng)["data"]
+            rows.append({"doc": f"{i}.json", "product_id": str(i), "metadata": data,
+                         "chunk": f"productDisplayName: {data['productDisplayName']}"})
+        product_index.upsert(rows, rng.standard_normal((stop - start, dim)).astype(np.float32))
+    if spec is not None and spec.kind != "flat":
+        product_index.rebuild(spec)
+    product_index.save(index_dir, {})
+
+
+def process_memory_mb() -> dict:
+    """
+    Resident memory of this process from /proc, split into private (anonymous) and
+    file-backed pages. File-backed pages of a memory-mapped index are shared between processes.
+    """
+    status = {}
+    for line in Path("/proc/self/status").read_text().splitlines():
+        key, _, value = line.partition(":")
+        if key in ("VmRSS", "RssAnon", "RssFile"):
+            status[key] = int(value.split()[0]) / 1024.0
+    return status
+
+
+def startup_probe(index_dir: str, mmap: bool) -> None:
+    """
+    Runs in a child process: open the index, run one search, print timings and memory as JSON.
+    """
+    start = time.perf_counter()
+    store = ProductIndexStore(Path(index_dir), mmap=mmap)
+    snapshot = store.get()
+    opened = time.perf_counter() - start
+    query = np.random.default_rng(1).standard_normal((1, snapshot.index.d)).astype(np.float32)
+    snapshot.search(query, 5)
+    first_search = time.perf_counter() - start
+    print(json.dumps({"open_ms": opened * 1000.0, "first_search_ms": first_search * 1000.0, **process_memory_mb()}))
+
+
+def bench_startup(n_docs: int, dim: int, processes: int, kind: str = "flat") -> None:
+    """
+    Start `processes` concurrent server-like processes against one index, with and without
+    mmap, and report their start-up time and resident memory.
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        index_dir = Path(tmp)
+        build_synthetic_checkpoint(index_dir, n_docs, dim, spec=IndexSpec(kind=kind))
+        size_mb = sum(p.stat().st_size for p in index_dir.iterdir()) / (1024.0 * 1024.0)
+        print(f"startup benchmark: docs={n_docs} dim={dim} index={kind} files={size_mb:.1f}MB processes={processes}")
+        for mmap in (False, True):
+            children = [
+                subprocess.Popen([sys.executable, __file__, "startup-probe", str(index_dir)] + (["--mmap"] if mmap else []),
+                                 stdout=subprocess.PIPE, text=True)
+                for _ in range(processes)
+            ]
+            reports = [json.loads(child.communicate()[0]) for child in children]
+            mean = {key: np.mean([r[key] for r in reports]) for key in reports[0]}
+            print(f"{'mmap' if mmap else 'read into RAM':<14} open={mean['open_ms']:.1f}ms "
+                  f"open+first search={mean['first_search_ms']:.1f}ms rss={mean['VmRSS']:.1f}MB "
+                  f"private={mean.get('RssAnon', 0):.1f}MB shared/file={mean.get('RssFile', 0):.1f}MB (per process)")
+
+
+def bench_embed(n_texts: int, dim: int, latency_ms: float) -> None:
+    """
+    Per-text embedding latency through the Ollama HTTP API (stand-in server, so only
+    the serialization and network hop are measured) vs the in-process hashing provider.
+    """
+    rng = np.random.default_rng(0)
+    texts = [synthetic_product(i, rng)["data"]["productDisplayName"] for i in range(n_texts)]
+    print(f"embed benchmark: texts={n_texts} dim={dim} server latency={latency_ms}ms/request")
+    args = [([text],) for text in texts]
+    with StandInEmbeddingServer(dim=dim, latency_ms=latency_ms) as server:
+        percentile_report("ollama /api/embeddings", time_calls(OllamaEmbeddingProvider(url=server.single_url).embed, args))
+        percentile_report("ollama /api/embed", time_calls(OllamaEmbeddingProvider(url=server.batch_url).embed, args))
+    percentile_report("in-process hashing", time_calls(HashingEmbeddingProvider(dim=dim).embed, args))
+
+
+def bench_hydrate(n_hits: int) -> None:
+    """
+    Per-hit cost of turning a metadata row into a ProductResponse: re-parsing the
+    "|#|" chunk text vs validating the response JSON stored at ingest time.
+    """
+    rng = np.random.default_rng(0)
+    rows = []
+    for i in range(n_hits):
+        product = ProductChunkTyped.from_json(synthetic_product(i, rng))
+        rows.append({"product_id": str(product.id), "chunk": product.product_content,
+                     "metadata": product.metadata.model_dump(),
+                     "response": ProductResponse.from_product_chunk(product).model_dump_json()})
+    print(f"hydrate benchmark: hits={n_hits}")
+    percentile_report("re-parse chunk", time_calls(ProductResponse.from_row, [({**row, "response": None},) for row in rows]))
+    percentile_report("stored response", time_calls(ProductResponse.from_row, [(row,) for row in rows]))
+
+
+def bench_hybrid(n_docs: int, dim: int, n_queries: int, top_k: int = 5) -> None:
+    """
+    Per-query latency of vector-only search, the BM25 side alone, and hybrid (RRF) search.
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        index_dir = Path(tmp)
+        build_synthetic_checkpoint(index_dir, n_docs, dim)
+        snapshot = ProductIndexStore(index_dir).get()
+        rng = np.random.default_rng(1)
+        texts = [f"{BRANDS[rng.integers(len(BRANDS))]} {ARTICLE_TYPES[rng.integers(len(ARTICLE_TYPES))]}"
+                 for _ in range(n_queries)]
+        vectors = rng.standard_normal((n_queries, dim)).astype(np.float32)
+        snapshot.lexical()
+        print(f"hybrid benchmark: docs={n_docs} dim={dim} queries={n_queries} top_k={top_k}")
+        args = [(vectors[i:i + 1], text) for i, text in enumerate(texts)]
+        percentile_report("vector", time_calls(lambda v, t: snapshot.search(v, top_k), args))
+        percentile_report("bm25 only", time_calls(lambda v, t: snapshot.lexical().search(t, top_k), args))
+        percentile_report("hybrid (rrf)", time_calls(lambda v, t: snapshot.search(v, top_k, query_texts=[t]), args))
+
+
+def bench_batch(n_docs: int, dim: int, n_queries: int, latency_ms: float, top_k: int = 5) -> None:
+    """
+    Queries/sec of the per-query path (one embedding request and one 1 x d search per
+    query) vs the batch path (one embedding request and one n x d search for all queries).
+    The MCP round-trip saved per query by the batch tool comes on top of this.
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        index_dir = Path(tmp)
+        build_synthetic_checkpoint(index_dir, n_docs, dim)
+        snapshot = ProductIndexStore(index_dir).get()
+        rng = np.random.default_rng(1)
+        queries = [f"{BRANDS[rng.integers(len(BRANDS))]} {COLOURS[rng.integers(len(COLOURS))]} "
+                   f"{ARTICLE_TYPES[rng.integers(len(ARTICLE_TYPES))]} {i}" for i in range(n_queries)]
+        print(f"batch benchmark: docs={n_docs} dim={dim} queries={n_queries} top_k={top_k} "
+              f"server latency={latency_ms}ms/request")
+        with StandInEmbeddingServer(dim=dim, latency_ms=latency_ms) as server:
+            single = OllamaEmbeddingProvider(url=server.single_url)
+            start = time.perf_counter()
+            for query in queries:
+                snapshot.search(single.embed_one(query).reshape(1, -1), top_k)
+            per_query = time.perf_counter() - start
+
+            batch = BatchEmbedder(OllamaEmbeddingProvider(url=server.batch_url))
+            start = time.perf_counter()
+            snapshot.search(batch.embed(queries), top_k)
+            batched_seconds = time.perf_counter() - start
+        print(f"{'per-query':<12} {n_queries / per_query:10.1f} queries/sec")
+        print(f"{'batch':<12} {n_queries / batched_seconds:10.1f} queries/sec")
+
+
+def bench_concurrency(n_docs: int, dim: int, sessions_list: List[int], queries_per_session: int,
+                      latency_ms: float, top_k: int = 5) -> None:
+    """
+    Throughput and latency with many concurrent sessions on one event loop.
+
+    "blocking" mimics the former synchronous tool: each call blocks the loop on the
+    embedding request and the FAISS search, so concurrent calls run one after another.
+    "async" mimics the async tool: the embedding request is awaited on a pooled client and
+    the search runs on a thread pool, so sessions overlap.
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        index_dir = Path(tmp)
+        build_synthetic_checkpoint(index_dir, n_docs, dim)
+        snapshot = ProductIndexStore(index_dir).get()
+        print(f"concurrency benchmark: docs={n_docs} dim={dim} queries/session={queries_per_session} "
+              f"server latency={latency_ms}ms/request")
+        with StandInEmbeddingServer(dim=dim, latency_ms=latency_ms, backlog=max(128, *sessions_list)) as server, \
+                ThreadPoolExecutor() as pool:
+            provider = OllamaEmbeddingProvider(url=server.batch_url)
+
+            async def blocking_call(query: str) -> float:
+                start = time.perf_counter()
+                snapshot.search(provider.embed([query]), top_k)
+                return time.perf_counter() - start
+
+            async def async_call(query: str) -> float:
+                start = time.perf_counter()
+                vector = await embed_text_async(query, provider=provider)
+                await asyncio.get_running_loop().run_in_executor(pool, snapshot.search, vector.reshape(1, -1), top_k)
+                return time.perf_counter() - start
+
+            async def run(call, sessions: int) -> List[float]:
+                async def session(s: int) -> List[float]:
+                    return [await call(f"session {s} query {q}") for q in range(queries_per_session)]
+                return [latency for latencies in await asyncio.gather(*(session(s) for s in range(sessions)))
+                        for latency in latencies]
+
+            for sessions in sessions_list:
+                for name, call in (("blocking", blocking_call), ("async", async_call)):
+                    start = time.perf_counter()
+                    latencies = asyncio.run(run(call, sessions))
+                    seconds = time.perf_counter() - start
+                    percentile_report(f"{name} sessions={sessions}", latencies)
+                    print(f"{'':<32} {len(latencies) / seconds:10.1f} queries/sec")
+
+
+def bench_microbatch(n_docs: int, dim: int, sessions: int, queries_per_session: int, windows_ms: List[float],
+                     max_batch: int, latency_ms: float, top_k: int = 5) -> None:
+    """
+    Throughput/latency trade-off of the micro-batching scheduler: `sessions` concurrent
+    sessions search through a MicroBatcher that embeds each batch in one request and
+    searches it with one multi-row index search. Window 0 disables batching.
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        index_dir = Path(tmp)
+        build_synthetic_checkpoint(index_dir, n_docs, dim)
+        snapshot = ProductIndexStore(index_dir).get()
+        print(f"microbatch benchmark: docs={n_docs} dim={dim} sessions={sessions} "
+              f"queries/session={queries_per_session} max_batch={max_batch} server latency={latency_ms}ms/request")
+        with StandInEmbeddingServer(dim=dim, latency_ms=latency_ms) as server, ThreadPoolExecutor() as pool:
+            embedder = BatchEmbedder(OllamaEmbeddingProvider(url=server.batch_url))
+
+            async def process(key, queries: List[str]):
+                vectors = await embedder.aembed(queries)
+                _, hits = await asyncio.get_running_loop().run_in_executor(pool, snapshot.search, vectors, top_k)
+                return hits
+
+            async def run(batcher: MicroBatcher) -> List[float]:
+                async def session(s: int) -> List[float]:
+                    latencies = []
+                    for q in range(queries_per_session):
+                        start = time.perf_counter()
+                        await batcher.submit(top_k, f"session {s} query {q}")
+                        latencies.append(time.perf_counter() - start)
+                    return latencies
+                return [latency for latencies in await asyncio.gather(*(session(s) for s in range(sessions)))
+                        for latency in latencies]
+
+            for window_ms in windows_ms:
+                batcher = MicroBatcher(process, window=window_ms / 1000.0, max_batch=max_batch)
+                start = time.perf_counter()
+                latencies = asyncio.run(run(batcher))
+                seconds = time.perf_counter() - start
+                percentile_report(f"window={window_ms}ms", latencies)
+                print(f"{'':<32} {len(latencies) / seconds:10.1f} queries/sec "
+                      f"mean batch={batcher.stats()['mean_batch_size']:.1f}")
+
+
+def bench_rerank(n_docs: int, dim: int, n_queries: int, top_k: int = 5) -> None:
+    """
+    Per-query latency of a plain top_k search vs an overfetched search followed by the
+    server-side rerank, i.e. the cost that replaces an LLM rerank round-trip.
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        index_dir = Path(tmp)
+        build_synthetic_checkpoint(index_dir, n_docs, dim)
+        snapshot = ProductIndexStore(index_dir).get()
+        rng = np.random.default_rng(1)
+        entities = [[BRANDS[rng.integers(len(BRANDS))], GENDERS[rng.integers(len(GENDERS))],
+                     ARTICLE_TYPES[rng.integers(len(ARTICLE_TYPES))]] for _ in range(n_queries)]
+        vectors = rng.standard_normal((n_queries, dim)).astype(np.float32)
+        fetch_k = max(top_k * RERANK_OVERFETCH, RERANK_MIN_CANDIDATES)
+
+        def reranked(vector, query_entities):
+            _, hits = snapshot.search(vector, fetch_k)
+            return rerank_rows(hits[0], top_k, entities=query_entities, max_price=100.0)
+
+        print(f"rerank benchmark: docs={n_docs} dim={dim} queries={n_queries} top_k={top_k} candidates={fetch_k}")
+        args = [(vectors[i:i + 1], query_entities) for i, query_entities in enumerate(entities)]
+        percentile_report("search", time_calls(lambda v, e: snapshot.search(v, top_k), args))
+        percentile_report("search + rerank", time_calls(reranked, args))
+
+
+def bench_handles(n_calls: int, top_k: int) -> None:
+    """
+    Size and server-side cost of a follow-up FUNCTION_CALL that passes the product list
+    itself vs a result handle and indices. Tokens are estimated as characters / 4; a
+    parse failure is a call whose product list does not survive parse_function_call.
+    """
+    rng = np.random.default_rng(0)
+    store = ResultSetStore(max_entries=n_calls)
+    list_calls, handle_calls = [], []
+    for call in range(n_calls):
+        products = [ProductResponse.from_product_chunk(ProductChunkTyped.from_json(synthetic_product(call * top_k + i, rng)))
+                    for i in range(top_k)]
+        ranked = rng.permutation(top_k)[:3].tolist()
+        list_calls.append("FUNCTION_CALL: return_ranked_product_response_from_ranked_index|product_responses="
+                          + json.dumps([p.model_dump(mode="json") for p in products]) + f"|ranked_indices={ranked}")
+        handle_calls.append(f'FUNCTION_CALL: return_ranked_product_response_from_ranked_index|handle="{store.put(products)}"'
+                            f"|ranked_indices={ranked}")
+
+    def by_list(call: str):
+        _, arguments = parse_function_call(call)
+        products = [ProductResponse.model_validate(item) for item in arguments["product_responses"]]
+        return [products[i] for i in arguments["ranked_indices"]]
+
+    def by_handle(call: str):
+        _, arguments = parse_function_call(call)
+        return store.get(arguments["handle"], arguments["ranked_indices"])
+
+    parsable = []
+    for call in list_calls:
+        try:
+            by_list(call)
+            parsable.append((call,))
+        except Exception:
+            pass
+    print(f"handles benchmark: calls={n_calls} top_k={top_k}")
+    for name, calls in (("product list", list_calls), ("handle + indices", handle_calls)):
+        chars = float(np.mean([len(call) for call in calls]))
+        print(f"  {name:<18} mean_chars={chars:10.0f}  ~tokens={chars / 4:8.0f}")
+    print(f"  product list parse failures: {n_calls - len(parsable)}/{n_calls}")
+    if parsable:
+        percentile_report("product list", time_calls(by_list, parsable))
+    percentile_report("handle + indices", time_calls(by_handle, [(call,) for call in handle_calls]))
+
+
+def bench_views(n_results: int, top_k: int) -> None:
+    """
+    Serialized size and server-side encoding time of one search result per output view,
+    pretty-printed (as pasted into the next prompt) and compact.
+    """
+    rng = np.random.default_rng(0)
+    results = [[ProductResponse.from_product_chunk(ProductChunkTyped.from_json(synthetic_product(r * top_k + i, rng)))
+                for i in range(top_k)] for r in range(n_results)]
+
+    def encode(products, view, compact):
+        columns = VIEWS[view]
+        result = (ProductResultSet(handle="rs-00000000", products=products) if columns is None
+                  else ProductTable(handle="rs-00000000", columns=columns, rows=project_rows(products, columns)))
+        return result.model_dump_json(exclude_none=True) if compact else result.model_dump_json(indent=2)
+
+    print(f"views benchmark: results={n_results} top_k={top_k}")
+    for view in VIEWS:
+        for compact in (False, True):
+            name = f"{view}{' compact' if compact else ''}"
+            chars = float(np.mean([len(encode(products, view, compact)) for products in results]))
+            print(f"  {name:<14} mean_chars={chars:9.0f}  ~tokens={chars / 4:7.0f}")
+            percentile_report(name, time_calls(encode, [(products, view, compact) for products in results]))
+
+
+def bench_facets(n_docs: int, n_queries: int) -> None:
+    """
+    Facet latency from the columnar arrays: whole catalog, a filter expression, and the
+    products of one result set, against one scan of the metadata store rows.
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        index_dir = Path(tmp)
+        build_synthetic_checkpoint(index_dir, n_docs, 8)
+        snapshot = ProductIndexStore(index_dir).get()
+        columns = snapshot.columns()
+        rng = np.random.default_rng(1)
+        filters = [{"brandName": [BRANDS[rng.integers(len(BRANDS))]], "max_price": float(rng.integers(500, 5000))}
+                   for _ in range(n_queries)]
+        result_sets = [rng.choice(columns.product_ids, 5, replace=False) for _ in range(n_queries)]
+        print(f"facets benchmark: docs={n_docs} queries={n_queries}")
+        percentile_report("catalog", time_calls(columns.facets, [() for _ in range(n_queries)]))
+        percentile_report("filters", time_calls(lambda f: columns.facets(columns.mask(f)), [(f,) for f in filters]))
+        percentile_report("result set", time_calls(lambda ids: columns.facets(np.isin(columns.product_ids, ids)),
+                                                   [(ids,) for ids in result_sets]))
+
+        def scan():
+            counts = {}
+            for _, row in snapshot.metadata.iter_rows():
+                for name in ("brandName", "gender", "usage", "season", "baseColour"):
+                    key = (name, row["metadata"].get(name))
+                    counts[key] = counts.get(key, 0) + 1
+            return counts
+
+        percentile_report("metadata scan", time_calls(scan, [()]))
+
+
+def variant_vectors(n: int, dim: int, variants: int, rng: np.random.Generator) -> np.ndarray:
+    """
+    Vectors of products that come in `variants` near-identical variants (rows
+    i * variants .. (i + 1) * variants - 1 are one product), with products grouped
+    around category centres.
+    """
+    n_products = -(-n // variants)
+    categories = rng.standard_normal((max(1, n // 1000), dim)).astype(np.float32)
+    products = categories[rng.integers(len(categories), size=n_products)] \
+        + 0.6 * rng.standard_normal((n_products, dim)).astype(np.float32)
+    points = np.repeat(products, variants, axis=0)[:n] + 0.15 * rng.standard_normal((n, dim)).astype(np.float32)
+    return np.ascontiguousarray(points, dtype=np.float32)
+
+
+def bench_mmr(n_docs: int, dim: int, n_queries: int, diversity: float, top_k: int = 5, variants: int = 5) -> None:
+    """
+    Per-query latency, result redundancy (mean pairwise cosine similarity within the
+    top_k) and distinct products in the top_k of plain search vs overfetch + MMR, on an
+    index where every product comes in `variants` near-identical variants.
+
+    Raises:
+        SystemExit: MMR at `diversity` does not reduce redundancy.
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        index_dir = Path(tmp)
+        rng = np.random.default_rng(0)
+        product_index = MutableProductIndex()
+        rows = [{"doc": f"{i}.json", "product_id": str(i), "metadata": synthetic_product(i, rng)["data"],
+                 "chunk": f"product {i}"} for i in range(n_docs)]
+        product_index.upsert(rows, variant_vectors(n_docs, dim, variants, rng))
+        product_index.save(index_dir, {})
+        snapshot = ProductIndexStore(index_dir).get()
+        # Queries near stored products (row ids of a fresh index are 0..n_docs-1)
+        queries = snapshot.vectors(rng.choice(n_docs, n_queries)) + 0.1 * rng.standard_normal((n_queries, dim)).astype(np.float32)
+        fetch_k = max(top_k * RERANK_OVERFETCH, RERANK_MIN_CANDIDATES)
+
+        def plain(vector):
+            return snapshot.search(vector, top_k)[1][0]
+
+        def diversified(vector):
+            rows = snapshot.search(vector, fetch_k)[1][0]
+            relevance = -np.array([row["distance"] for row in rows])
+            return [rows[i] for i in mmr_select(snapshot.vectors([row["row_id"] for row in rows]), relevance, top_k, diversity)]
+
+        def redundancy(select) -> Tuple[float, float]:
+            cosines, products = [], []
+            for i in range(n_queries):
+                row_ids = [row["row_id"] for row in select(queries[i:i + 1])]
+                vectors = snapshot.vectors(row_ids)
+                unit = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+                similarity = unit @ unit.T
+                cosines.append(similarity[np.triu_indices(len(unit), 1)].mean())
+                products.append(len({row_id // variants for row_id in row_ids}))
+            return float(np.mean(cosines)), float(np.mean(products))
+
+        print(f"mmr benchmark: docs={n_docs} dim={dim} variants/product={variants} queries={n_queries} "
+              f"top_k={top_k} candidates={fetch_k} diversity={diversity}")
+        args = [(queries[i:i + 1],) for i in range(n_queries)]
+        measured = {}
+        for name, select in (("search", plain), ("search + mmr", diversified)):
+            measured[name] = redundancy(select)
+            print(f"  {name:<14} mean pairwise cosine={measured[name][0]:.3f}  "
+                  f"distinct products={measured[name][1]:.2f}/{top_k}")
+            percentile_report(name, time_calls(select, args))
+        if measured["search + mmr"][0] >= measured["search"][0] - 0.05:
+            raise SystemExit(f"diversity={diversity} did not reduce redundancy: "
+                             f"{measured['search'][0]:.3f} -> {measured['search + mmr'][0]:.3f}")
+
+
+def float_list(value: str) -> List[float]:
+    return [float(v) for v in value.split(",") if v]
+
+
+def int_list(value: str) -> List[int]:
+    return [int(v) for v in value.split(",") if v]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="RAG-MCP search benchmarks")
+    sub = parser.add_subparsers(dest="bench", required=True)
+
+    search = sub.add_parser("search", help="p50/p99 search latency, reload-per-query vs resident index")
+    search.add_argument("--docs", type=int, default=20000)
+    search.add_argument("--dim", type=int, default=768)
+    search.add_argument("--queries", type=int, default=200)
+
+    ingest_parser = sub.add_parser("ingest", help="ingestion docs/sec vs embedding batch size and concurrency")
+    ingest_parser.add_argument("--docs", type=int, default=2000)
+    ingest_parser.add_argument("--dim", type=int, default=768)
+    ingest_parser.add_argument("--batch-sizes", type=int_list, default=[1, 8, 32, 64])
+    ingest_parser.add_argument("--concurrency", type=int_list, default=[1, 4, 8])
+    ingest_parser.add_argument("--latency-ms", type=float, default=20.0)
+
+    parse_parser = sub.add_parser("parse", help="parse-stage files/sec vs process-pool size")
+    parse_parser.add_argument("--docs", type=int, default=10000)
+    parse_parser.add_argument("--workers", type=int_list, default=[1, 2, 4, 8])
+
+    ann_parser = sub.add_parser("ann", help="recall@k vs latency of IVF / IVF-PQ / HNSW against flat")
+    ann_parser.add_argument("--docs", type=int, default=50000)
+    ann_parser.add_argument("--dim", type=int, default=768)
+    ann_parser.add_argument("--queries", type=int, default=200)
+    ann_parser.add_argument("--top-k", type=int, default=5)
+    ann_parser.add_argument("--nlist", type=int_list, default=[256, 1024])
+    ann_parser.add_argument("--nprobe", type=int_list, default=[1, 8, 32, 64])
+    ann_parser.add_argument("--ef-search", type=int_list, default=[16, 64, 256])
+    ann_parser.add_argument("--pq-m", type=int, default=IndexSpec.pq_m)
+
+    startup_parser = sub.add_parser("startup", help="start-up time and RSS with and without mmap")
+    startup_parser.add_argument("--docs", type=int, default=50000)
+    startup_parser.add_argument("--dim", type=int, default=768)
+    startup_parser.add_argument("--processes", type=int, default=4)
+    startup_parser.add_argument("--index", default="flat", choices=INDEX_KINDS)
+
+    embed_parser = sub.add_parser("embed", help="per-text embedding latency, Ollama HTTP vs in-process")
+    embed_parser.add_argument("--texts", type=int, default=500)
+    embed_parser.add_argument("--dim", type=int, default=768)
+    embed_parser.add_argument("--latency-ms", type=float, default=0.0)
+
+    hydrate_parser = sub.add_parser("hydrate", help="per-hit ProductResponse hydration, re-parse vs stored")
+    hydrate_parser.add_argument("--hits", type=int, default=5000)
+
+    hybrid_parser = sub.add_parser("hybrid", help="per-query latency, vector vs BM25 vs hybrid search")
+    hybrid_parser.add_argument("--docs", type=int, default=50000)
+    hybrid_parser.add_argument("--dim", type=int, default=768)
+    hybrid_parser.add_argument("--queries", type=int, default=200)
+
+    batch_parser = sub.add_parser("batch", help="search throughput, per-query vs one batch")
+    batch_parser.add_argument("--docs", type=int, default=50000)
+    batch_parser.add_argument("--dim", type=int, default=768)
+    batch_parser.add_argument("--queries", type=int, default=500)
+    batch_parser.add_argument("--latency-ms", type=float, default=5.0)
+
+    concurrency_parser = sub.add_parser("concurrency", help="concurrent sessions, blocking vs async tool path")
+    concurrency_parser.add_argument("--docs", type=int, default=20000)
+    concurrency_parser.add_argument("--dim", type=int, default=768)
+    concurrency_parser.add_argument("--sessions", type=int_list, default=[1, 8, 32])
+    concurrency_parser.add_argument("--queries-per-session", type=int, default=20)
+    concurrency_parser.add_argument("--latency-ms", type=float, default=20.0)
+
+    microbatch_parser = sub.add_parser("microbatch", help="micro-batching window vs throughput and latency")
+    microbatch_parser.add_argument("--docs", type=int, default=20000)
+    microbatch_parser.add_argument("--dim", type=int, default=768)
+    microbatch_parser.add_argument("--sessions", type=int, default=32)
+    microbatch_parser.add_argument("--queries-per-session", type=int, default=20)
+    microbatch_parser.add_argument("--windows-ms", type=float_list, default=[0, 1, 2, 5, 10])
+    microbatch_parser.add_argument("--max-batch", type=int, default=32)
+    microbatch_parser.add_argument("--latency-ms", type=float, default=20.0)
+
+    rerank_parser = sub.add_parser("rerank", help="per-query latency, plain search vs overfetch + rerank")
+    rerank_parser.add_argument("--docs", type=int, default=50000)
+    rerank_parser.add_argument("--dim", type=int, default=768)
+    rerank_parser.add_argument("--queries", type=int, default=200)
+
+    handles_parser = sub.add_parser("handles", help="follow-up call size and cost, product list vs result handle")
+    handles_parser.add_argument("--calls", type=int, default=200)
+    handles_parser.add_argument("--top-k", type=int, default=5)
+
+    views_parser = sub.add_parser("views", help="search output size and encoding time per view")
+    views_parser.add_argument("--results", type=int, default=200)
+    views_parser.add_argument("--top-k", type=int, default=5)
+
+    facets_parser = sub.add_parser("facets", help="facet latency, columnar arrays vs metadata scan")
+    facets_parser.add_argument("--docs", type=int, default=50000)
+    facets_parser.add_argument("--queries", type=int, default=200)
+
+    analyze_parser = sub.add_parser("analyze", help="JSON structure analysis files/sec vs process-pool size")
+    analyze_parser.add_argument("--docs", type=int, default=20000)
+    analyze_parser.add_argument("--workers", type=int_list, default=[1, 2, 4, 8])
+
+    mmr_parser = sub.add_parser("mmr", help="latency and result redundancy, plain search vs MMR")
+    mmr_parser.add_argument("--docs", type=int, default=50000)
+    mmr_parser.add_argument("--dim", type=int, default=768)
+    mmr_parser.add_argument("--queries", type=int, default=200)
+    mmr_parser.add_argument("--diversity", type=float, default=0.7)
+
+    probe_parser = sub.add_parser("startup-probe", help=argparse.SUPPRESS)
+    probe_parser.add_argument("index_dir")
+    probe_parser.add_argument("--mmap", action="store_true")
+
+    args = parser.parse_args()
+    if args.bench == "search":
+        bench_search(args.docs, args.dim, args.queries)
+    elif args.bench == "ingest":
+        bench_ingest(args.docs, args.dim, args.batch_sizes, args.concurrency, args.latency_ms)
+    elif args.bench == "parse":
+        bench_parse(args.docs, args.workers)
+    elif args.bench == "ann":
+        bench_ann(args.docs, args.dim, args.queries, args.top_k, args.nlist, args.nprobe,
+                  args.ef_search, args.pq_m)
+    elif args.bench == "startup":
+        bench_startup(args.docs, args.dim, args.processes, args.index)
+    elif args.bench == "embed":
+        bench_embed(args.texts, args.dim, args.latency_ms)
+    elif args.bench == "hydrate":
+        bench_hydrate(args.hits)
+    elif args.bench == "hybrid":
+        bench_hybrid(args.docs, args.dim, args.queries)
+    elif args.bench == "batch":
+        bench_batch(args.docs, args.dim, args.queries, args.latency_ms)
+    elif args.bench == "concurrency":
+        bench_concurrency(args.docs, args.dim, args.sessions, args.queries_per_session, args.latency_ms)
+    elif args.bench == "microbatch":
+        bench_microbatch(args.docs, args.dim, args.sessions, args.queries_per_session, args.windows_ms,
+                         args.max_batch, args.latency_ms)
+    elif args.bench == "rerank":
+        bench_rerank(args.docs, args.dim, args.queries)
+    elif args.bench == "handles":
+        bench_handles(args.calls, args.top_k)
+    elif args.bench == "views":
+        bench_views(args.results, args.top_k)
+    elif args.bench == "facets":
+        bench_facets(args.docs, args.queries)
+    elif args.bench == "analyze":
+        bench_analyze(args.docs, args.workers)
+    elif args.bench == "mmr":
+        bench_mmr(args.docs, args.dim, args.queries, args.diversity)
+    elif args.bench == "startup-probe":
+        startup_probe(args.index_dir, args.mmap)
+
+
+if __name__ == "__main__":
+    main()
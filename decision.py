@@ -57,7 +57,7 @@ Always follow this loop:
     - Modify query could be "BrandName Puma, Appreal - T-shirt, Comfort casual Gender female Age group under 18" or similarly you can modify query to focus only on product attributes, entities, or metadata.
 3. If a tool is needed, respond using the format:
    FUNCTION_CALL: tool_name|param1=value1|param2=value2
-4. When the retrieval result is known, refine or rerank the results based on relevance to the user query. Use tools like `product_metadata_analysis_for_refine_or_tuning_search_result, preety_print_product_metadata_response` if needed.
+4. Prefer passing the perceived entities as `rerank.entities` to `search_product_documents`: the server then returns results reranked by similarity, entity match, price and rating, without products above `rerank.max_price`. Otherwise, when the retrieval result is known, refine or rerank the results based on relevance to the user query. Use tools like `product_metadata_analysis_for_refine_or_tuning_search_result, preety_print_product_metadata_response` if needed.
 5. If you call tools like `preety_print_product_metadata_response`, you should receive a string representation of list of ProductMetadataSubset objects, you don't need to call `product_metadata_analysis_for_refine_or_tuning_search_result`  or `search_product_documents` after that.
 6. FINAL_ANSWER is a list of ProductMetadataSubset objects in pretty format.
 5. When the final answer is ready, respond using:
@@ -81,29 +81,40 @@ Input Summary:
 - Tool hint: {perception.tool_hint or 'None'}
 
 ✅ Examples:
-- FUNCTION_CALL: return_ranked_product_response_from_ranked_index|product_responses=[ProductResponse(name="Nike T-shirt for Men", price=100, description="This is a Nike T-shirt for Men"), ProductResponse(name="Adidas T-shirt for Men", price=80, description="This is an Adidas T-shirt for Men")],ranked_indices=[0,1]
+- FUNCTION_CALL: return_ranked_product_response_from_ranked_index|handle="rs-1a2b3c4d"|ranked_indices=[2,0,1]
 - FUNCTION_CALL: product_metadata_analysis_for_refine_or_tuning_search_result
+- FUNCTION_CALL: product_facets|filters.article_type=["Tshirts"]|filters.gender=["Men"]
+- FUNCTION_CALL: product_facets|handle="rs-1a2b3c4d"
 - FUNCTION_CALL: search_product_documents|query="Find Nike T-shirt for Men",top_k=5
+- FUNCTION_CALL: search_product_documents|query="casual T-shirt",top_k=5|filters.brandName=["Nike"]|filters.gender=["Men"]|filters.max_price=100
+- FUNCTION_CALL: search_product_documents|query="Nike T-shirt for Men",top_k=5|rerank.entities=["Nike","Men","T-shirt"]|rerank.max_price=100
+- FUNCTION_CALL: search_product_documents|query="Nike T-shirt for Men",top_k=5|view="summary"|compact=True
+- FUNCTION_CALL: search_product_documents|query="running shoes",top_k=5|diversity=0.7
 - FUNCTION_CALL: int_list_to_exponential_sum|input.int_list=[73,78,68,73,65]
-- FUNCTION_CALL: preety_print_product_metadata_response|product_response_list=[ProductResponse(name="Nike T-shirt for Men", price=100, description="This is a Nike T-shirt for Men"), ProductResponse(name="Adidas T-shirt for Men", price=80, description="This is an Adidas T-shirt for Men")]
+- FUNCTION_CALL: preety_print_product_metadata_response|handle="rs-5e6f7a8b"
+- FUNCTION_CALL: preety_print_product_metadata_response|handle="rs-1a2b3c4d"|indices=[2,0]
 - FINAL_ANSWER: [final answer generated from string representation of list of ProductMetadataSubset objects]
 
 ✅ Examples:
 - User asks: "Nike T-shirt for casual wear"
   - FUNCTION_CALL: search_product_documents|query=modified_query,top_k=5
-  - [Receives a list of product responses]
+  - [Receives a handle, e.g. "rs-1a2b3c4d", and a list of product responses]
   - FUNCTION_CALL: product_metadata_analysis_for_refine_or_tuning_search_result
   - [Received detail metadata of product]
   - Idetify the Ranked indices of product responses based on relevance to user query
-  - FUNCTION_CALL: return_ranked_product_response_from_ranked_index|product_responses=[ProductResponse(name="Nike T-shirt for Men", price=100, description="This is a Nike T-shirt for Men"), ProductResponse(name="Adidas T-shirt for Men", price=80, description="This is an Adidas T-shirt for Men")],ranked_indices=[0,1]
-  - [receives a final answer - List[ProductResponse]]
-  - FUNCTION_CALL: preety_print_product_metadata_response|product_response_list=[ProductResponse(name="Nike T-shirt for Men", price=100, description="This is a Nike T-shirt for Men"), ProductResponse(name="Adidas T-shirt for Men", price=80, description="This is an Adidas T-shirt for Men")]
+  - FUNCTION_CALL: return_ranked_product_response_from_ranked_index|handle="rs-1a2b3c4d"|ranked_indices=[1,0]
+  - [receives a new handle, e.g. "rs-5e6f7a8b", and the ranked List[ProductResponse]]
+  - FUNCTION_CALL: preety_print_product_metadata_response|handle="rs-5e6f7a8b"
   - [receives a final answer - string representation of list of ProductMetadataSubset objects]
   - FINAL_ANSWER: [final answer generated from string representation of list of ProductMetadataSubset objects]
   
 
 IMPORTANT:
 - 🚫 Do NOT invent tools. Use only the tools listed below.
+- To choose filters, call product_facets for the real values and counts (brand, gender, article type, usage, season, colour, price ranges) instead of guessing.
+- If results are near-identical variants of one product, search once more with diversity=0.7 instead of rewriting the query.
+- Use view="summary" (or fields=[...]) when only names, brands, prices and ratings are needed; the handle still gives follow-up tools the full products.
+- Search results come with a handle. Pass the handle (and indices) to follow-up tools; never copy product lists into a FUNCTION_CALL.
 - If You need to modify or extract some information from the product metadata, you can use tools to get plan how to do that e.g product_metadata_analysis_for_refine_or_tuning_search_result
 - 🤖 If the previous tool output already contains factual information, DO NOT search again. Instead, summarize the relevant facts based on metadata matching or analysisand respond with: FINAL_ANSWER: [your answer]
 - Only repeat `search_product_documents` if the last result was irrelevant or empty, or never call search_product_documents with same input query.
@@ -127,11 +138,12 @@ Always follow this loop:
     - Modify query could be "BrandName Puma, Appreal - T-shirt, Comfort casual Gender female Age group under 18" or similarly you can modify query to focus only on product attributes, entities, or metadata.
 3. If a tool is needed, respond using the format:
    FUNCTION_CALL: tool_name|param1=value1|param2=value2
-4. When the retrieval result is known, refine or rerank the results based on relevance to the user query. Use tools like `product_metadata_analysis_for_refine_or_tuning_search_result`, `preety_print_product_metadata_response` if needed.
+4. Prefer passing the perceived entities as `rerank.entities` to `search_product_documents`: the server then returns results reranked by similarity, entity match, price and rating, without products above `rerank.max_price`. Otherwise, when the retrieval result is known, refine or rerank the results based on relevance to the user query. Use tools like `product_metadata_analysis_for_refine_or_tuning_search_result`, `preety_print_product_metadata_response` if needed.
 5. If you call `preety_print_product_metadata_response`, you should receive a string representation of a list of ProductMetadataSubset objects. ⛔ IMMEDIATELY stop further steps and respond with:
    FINAL_ANSWER: [<output of preety_print_product_metadata_response>]
 6. Do NOT call `search_product_documents` again with the same query unless previous output was empty or irrelevant.
-7. Respond using EXACTLY ONE of the formats above per step. Do NOT include any explanation, commentary, or other text outside tool or FINAL_ANSWER formats.
+7. Search results come with a handle. Pass the handle (and indices) to follow-up tools; never copy product lists into a FUNCTION_CALL.
+8. Respond using EXACTLY ONE of the formats above per step. Do NOT include any explanation, commentary, or other text outside tool or FINAL_ANSWER formats.
 
 ✅ Strict Finalization Rule:
 - 🚨 If you call `preety_print_product_metadata_response`, your VERY NEXT and FINAL response MUST be:
@@ -160,9 +172,15 @@ Relevant Memories:
 
 ✅ Examples:
 - FUNCTION_CALL: search_product_documents|query="Nike T-shirt for Men",top_k=5
+- FUNCTION_CALL: search_product_documents|query="T-shirt",top_k=5|filters.brandName=["Nike"]|filters.gender=["Men"]|filters.max_price=100
+- FUNCTION_CALL: search_product_documents|query="Nike T-shirt for Men",top_k=5|rerank.entities=["Nike","Men","T-shirt"]|rerank.max_price=100
+- FUNCTION_CALL: search_product_documents|query="Nike T-shirt for Men",top_k=5|view="summary"|compact=True
+- FUNCTION_CALL: search_product_documents|query="running shoes",top_k=5|diversity=0.7
 - FUNCTION_CALL: product_metadata_analysis_for_refine_or_tuning_search_result
-- FUNCTION_CALL: return_ranked_product_response_from_ranked_index|product_responses=[ProductResponse(...)],ranked_indices=[0,1]
-- FUNCTION_CALL: preety_print_product_metadata_response|product_response_list=[ProductResponse(...)]
+- FUNCTION_CALL: product_facets|filters.article_type=["Tshirts"]|filters.gender=["Men"]
+- FUNCTION_CALL: product_facets|handle="rs-1a2b3c4d"
+- FUNCTION_CALL: return_ranked_product_response_from_ranked_index|handle="rs-1a2b3c4d"|ranked_indices=[1,0]
+- FUNCTION_CALL: preety_print_product_metadata_response|handle="rs-5e6f7a8b"
 - FINAL_ANSWER: [<output of preety_print_product_metadata_response>]
 
 ⛔ Wrong Examples:
@@ -0,0 +1,483 @@
+import asyncio
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import batched
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple, TypeVar
+
+import httpx
+import numpy as np
+import requests
+
+## OLLAMA Embedding Model
+# Default endpoint: one text per request, vectors as the model returns them. Product
+# indexes built before batching hold these vectors, so queries must use the same space.
+EMBED_URL = "http://localhost:11434/api/embeddings"
+# Batch endpoint: many texts per request, but L2-normalised vectors, i.e. a different
+# vector space; only use it (EMBED_PROVIDER_URL) for indexes built from scratch with it
+EMBED_BATCH_URL = "http://localhost:11434/api/embed"
+EMBED_MODEL = "nomic-embed-text"
+EMBED_CACHE_PATH = Path(__file__).parent.resolve() / "cache" / "embeddings.db"
+# Vector size of nomic-embed-text, also used by the in-process hashing backend
+EMBED_DIM = 768
+
+T = TypeVar("T")
+
+
+class EmbeddingProvider:
+    """
+    Turns texts into float32 vectors. Every provider returns one row per input text, and
+    `space` identifies the vector space: the embedding cache is keyed by it, so cached
+    vectors from different providers, models or normalisations never mix.
+    """
+
+    model_name: str
+
+    @property
+    def space(self) -> str:
+        """Name of the vector space these embeddings live in; by default the model name."""
+        return self.model_name
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        """
+        Returns:
+            np.ndarray: A (len(texts), dim) float32 matrix.
+        """
+        raise NotImplementedError
+
+    def embed_one(self, text: str) -> np.ndarray:
+        return self.embed([text])[0]
+
+    async def aembed(self, texts: List[str]) -> np.ndarray:
+        """
+        Async `embed`. The default runs `embed` in a worker thread so the event loop keeps running.
+        """
+        return await asyncio.to_thread(self.embed, list(texts))
+
+
+class OllamaEmbeddingProvider(EmbeddingProvider):
+    """
+    Embeds through an Ollama server. `url` may be `/api/embeddings` (the default, one
+    request per text) or the batch endpoint `/api/embed` (one request per call). The batch
+    endpoint L2-normalises its vectors and `/api/embeddings` does not, so an index must be
+    searched through the endpoint it was built with.
+
+    Attributes:
+        url (str): Embedding endpoint; point it at a stand-in server for tests/benchmarks.
+        model_name (str): Name of the embedding model.
+        timeout (float): Per-request timeout in seconds.
+    """
+
+    def __init__(self, url: str = EMBED_URL, model_name: str = EMBED_MODEL, timeout: float = 120.0,
+                 max_connections: int = 32):
+        self.url = url
+        self.model_name = model_name
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self._local = threading.local()
+        self._async_clients: Dict[asyncio.AbstractEventLoop, httpx.AsyncClient] = {}
+
+    def _session(self) -> requests.Session:
+        # One pooled HTTP session per thread
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = requests.Session()
+            self._local.session = session
+        return session
+
+    def _single_endpoint(self) -> bool:
+        return self.url.rstrip("/").endswith("/api/embeddings")
+
+    @property
+    def space(self) -> str:
+        # The endpoint decides the normalisation, so it is part of the vector space
+        return f"ollama:{self.model_name}:{'raw' if self._single_endpoint() else 'l2'}"
+
+    def _parse_batch(self, payload: dict, count: int) -> np.ndarray:
+        embeddings = np.array(payload["embeddings"], dtype=np.float32)
+        if embeddings.shape[0] != count:
+            raise ValueError(f"Expected {count} embeddings, got {embeddings.shape[0]}")
+        return embeddings
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        texts = list(texts)
+        if self._single_endpoint():
+            vectors = []
+            for text in texts:
+                response = self._session().post(
+                    self.url, json={"model": self.model_name, "prompt": text}, timeout=self.timeout
+                )
+                response.raise_for_status()
+                vectors.append(response.json()["embedding"])
+            return np.array(vectors, dtype=np.float32)
+        response = self._session().post(
+            self.url,
+            json={"model": self.model_name, "input": texts},
+            timeout=self.timeout,
+        )
+        response.raise_for_status()
+        return self._parse_batch(response.json(), len(texts))
+
+    def _async_client(self) -> httpx.AsyncClient:
+        # Pooled keep-alive connections, one client per event loop
+        loop = asyncio.get_running_loop()
+        client = self._async_clients.get(loop)
+        if client is None:
+            for stale in [other for other in self._async_clients if other.is_closed()]:
+                del self._async_clients[stale]
+            client = httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=httpx.Limits(max_connections=self.max_connections,
+                                    max_keepalive_connections=self.max_connections),
+            )
+            self._async_clients[loop] = client
+        return client
+
+    async def aembed(self, texts: List[str]) -> np.ndarray:
+        texts = list(texts)
+        client = self._async_client()
+        if self._single_endpoint():
+            responses = await asyncio.gather(*(
+                client.post(self.url, json={"model": self.model_name, "prompt": text}) for text in texts
+            ))
+            for response in responses:
+                response.raise_for_status()
+            return np.array([response.json()["embedding"] for response in responses], dtype=np.float32)
+        response = await client.post(self.url, json={"model": self.model_name, "input": texts})
+        response.raise_for_status()
+        return self._parse_batch(response.json(), len(texts))
+
+
+class HashingEmbeddingProvider(EmbeddingProvider):
+    """
+    CPU-only, in-process embeddings by feature hashing: lower-cased word unigrams and
+    bigrams are hashed into `dim` signed buckets and the result is L2-normalised.
+
+    Texts sharing words land close together, which is enough for offline benchmarks and
+    tests and for deployments that trade some recall for no network hop and no daemon.
+    Vectors are deterministic across processes and machines.
+    """
+
+    _TOKEN = re.compile(r"[a-z0-9]+")
+
+    def __init__(self, dim: int = EMBED_DIM):
+        self.dim = dim
+        self.model_name = f"hashing-{dim}"
+
+    def _features(self, text: str) -> List[str]:
+        words = self._TOKEN.findall(text.lower())
+        return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for i, text in enumerate(texts):
+            hashes = np.fromiter((zlib.crc32(f.encode("utf-8")) for f in self._features(text)), dtype=np.uint32)
+            if hashes.size:
+                signs = np.where(hashes & 0x80000000, -1.0, 1.0).astype(np.float32)
+                np.add.at(out[i], hashes % self.dim, signs)
+        norms = np.linalg.norm(out, axis=1, keepdims=True)
+        np.divide(out, norms, out=out, where=norms > 0)
+        return out
+
+
+def make_embedding_provider(kind: str = "ollama", url: str = EMBED_URL, model_name: str = EMBED_MODEL,
+                            dim: int = EMBED_DIM) -> EmbeddingProvider:
+    """
+    Build a provider by name: "ollama" (HTTP to the Ollama server) or "hashing" (in-process).
+    """
+    if kind == "ollama":
+        return OllamaEmbeddingProvider(url=url, model_name=model_name)
+    if kind == "hashing":
+        return HashingEmbeddingProvider(dim=dim)
+    raise ValueError(f"Unknown embedding provider {kind!r}; expected 'ollama' or 'hashing'")
+
+
+_default_provider: Optional[EmbeddingProvider] = None
+
+
+def default_embedding_provider() -> EmbeddingProvider:
+    """
+    The process-wide provider selected by EMBED_PROVIDER (ollama|hashing, default ollama),
+    with EMBED_MODEL_NAME, EMBED_PROVIDER_URL and EMBED_DIM as overrides. The MCP server,
+    ingestion and agent memory all read the same variables so their vectors stay comparable.
+    """
+    global _default_provider
+    if _default_provider is None:
+        _default_provider = make_embedding_provider(
+            os.getenv("EMBED_PROVIDER", "ollama"),
+            url=os.getenv("EMBED_PROVIDER_URL", EMBED_URL),
+            model_name=os.getenv("EMBED_MODEL_NAME", EMBED_MODEL),
+            dim=int(os.getenv("EMBED_DIM", str(EMBED_DIM))),
+        )
+    return _default_provider
+
+
+class EmbeddingCache:
+    """
+    Content-addressed embedding cache shared by ingestion, search and agent memory.
+
+    Entries are keyed by a hash of (vector space, text), see EmbeddingProvider.space, and
+    stored as raw float32 bytes in a SQLite file, so every process on the host shares them.
+    An in-memory LRU sits in front of the file. The file holds at most `max_disk_entries` entries; the least
+    recently used ones are evicted first.
+
+    Attributes:
+        path (Path): SQLite file holding the cache.
+        memory_items (int): Capacity of the in-memory LRU.
+        max_disk_entries (int): Capacity of the on-disk cache.
+    """
+
+    def __init__(self, path: Path = EMBED_CACHE_PATH, memory_items: int = 10000,
+                 max_disk_entries: int = 500000):
+        self.path = Path(path)
+        self.memory_items = memory_items
+        self.max_disk_entries = max_disk_entries
+        self._lru: OrderedDict[str, np.ndarray] = OrderedDict()
+        self._lock = threading.Lock()
+        self._puts_since_evict = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30.0)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "key TEXT PRIMARY KEY, model TEXT NOT NULL, vector BLOB NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)")
+        self._conn.commit()
+
+    @staticmethod
+    def key(model: str, text: str) -> str:
+        return hashlib.sha256(f"{model}\0{text}".encode("utf-8")).hexdigest()
+
+    def _remember(self, key: str, vector: np.ndarray) -> None:
+        self._lru[key] = vector
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.memory_items:
+            self._lru.popitem(last=False)
+
+    def get_many(self, model: str, texts: List[str]) -> List[Optional[np.ndarray]]:
+        """
+        Look up several texts at once. Missing entries come back as None.
+        """
+        keys = [self.key(model, text) for text in texts]
+        found: Dict[str, np.ndarray] = {}
+        with self._lock:
+            for key in keys:
+                if key in self._lru:
+                    self._lru.move_to_end(key)
+                    found[key] = self._lru[key]
+            self.memory_hits += len(found)
+            on_disk = [key for key in dict.fromkeys(keys) if key not in found]
+            for chunk in batched(on_disk, 500):
+                placeholders = ",".join("?" * len(chunk))
+                for key, blob in self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", chunk
+                ):
+                    vector = np.frombuffer(blob, dtype=np.float32)
+                    found[key] = vector
+                    self._remember(key, vector)
+                    self.disk_hits += 1
+                if chunk:
+                    self._conn.execute(
+                        f"UPDATE embeddings SET last_used = ? WHERE key IN ({placeholders})",
+                        (time.time(), *chunk),
+                    )
+            self._conn.commit()
+            self.misses += sum(1 for key in keys if key not in found)
+        return [found.get(key) for key in keys]
+
+    def get(self, model: str, text: str) -> Optional[np.ndarray]:
+        return self.get_many(model, [text])[0]
+
+    def put_many(self, model: str, texts: List[str], vectors: np.ndarray) -> None:
+        now = time.time()
+        entries = []
+        with self._lock:
+            for text, vector in zip(texts, vectors):
+                key = self.key(model, text)
+                vector = np.ascontiguousarray(vector, dtype=np.float32)
+                self._remember(key, vector)
+                entries.append((key, model, vector.tobytes(), now))
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, model, vector, last_used) VALUES (?, ?, ?, ?)", entries
+            )
+            self._puts_since_evict += len(entries)
+            # Counting rows is not free; only check the bound every so often
+            if self._puts_since_evict >= 1000:
+                self._puts_since_evict = 0
+                excess = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0] - self.max_disk_entries
+                if excess > 0:
+                    self._conn.execute(
+                        "DELETE FROM embeddings WHERE key IN "
+                        "(SELECT key FROM embeddings ORDER BY last_used LIMIT ?)", (excess,)
+                    )
+            self._conn.commit()
+
+    def put(self, model: str, text: str, vector: np.ndarray) -> None:
+        self.put_many(model, [text], np.asarray(vector).reshape(1, -1))
+
+    def stats(self) -> dict:
+        """
+        Hit/miss counters for this process, plus the current cache sizes.
+        """
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            disk_entries = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+                "memory_entries": len(self._lru),
+                "disk_entries": disk_entries,
+            }
+
+
+_default_cache: Optional[EmbeddingCache] = None
+_default_cache_lock = threading.Lock()
+
+
+def default_embedding_cache() -> EmbeddingCache:
+    """
+    The process-wide EmbeddingCache at EMBED_CACHE_PATH, created on first use.
+    """
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = EmbeddingCache()
+        return _default_cache
+
+
+def embed_text(text: str, provider: Optional[EmbeddingProvider] = None,
+               cache: Optional[EmbeddingCache] = None) -> np.ndarray:
+    """
+    Embed one text with `provider` (default: default_embedding_provider()), serving repeats from `cache`.
+    """
+    provider = provider or default_embedding_provider()
+    if cache is not None:
+        cached = cache.get(provider.space, text)
+        if cached is not None:
+            return cached
+    embedding = provider.embed_one(text)
+    if cache is not None:
+        cache.put(provider.space, text, embedding)
+    return embedding
+
+
+async def embed_text_async(text: str, provider: Optional[EmbeddingProvider] = None,
+                           cache: Optional[EmbeddingCache] = None) -> np.ndarray:
+    """
+    Async `embed_text`: the HTTP call is awaited on a pooled client and cache reads and
+    writes (SQLite) run in a worker thread, so the event loop never blocks.
+    """
+    provider = provider or default_embedding_provider()
+    if cache is not None:
+        cached = await asyncio.to_thread(cache.get, provider.space, text)
+        if cached is not None:
+            return cached
+    embedding = (await provider.aembed([text]))[0]
+    if cache is not None:
+        await asyncio.to_thread(cache.put, provider.space, text, embedding)
+    return embedding
+
+
+class BatchEmbedder:
+    """
+    Embeds texts in batches through an EmbeddingProvider, keeping up to `concurrency`
+    batches in flight at once.
+
+    Attributes:
+        provider (EmbeddingProvider): Backend; defaults to default_embedding_provider().
+        batch_size (int): Number of texts per embedding request.
+        concurrency (int): Maximum number of requests in flight.
+        cache (Optional[EmbeddingCache]): Texts found here are not sent to the provider.
+    """
+
+    def __init__(
+        self,
+        provider: Optional[EmbeddingProvider] = None,
+        batch_size: int = 32,
+        concurrency: int = 4,
+        cache: Optional[EmbeddingCache] = None,
+    ):
+        self.provider = provider or default_embedding_provider()
+        self.batch_size = max(1, batch_size)
+        self.concurrency = max(1, concurrency)
+        self.cache = cache
+
+    @property
+    def space(self) -> str:
+        return self.provider.space
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        """
+        Embeds a list of texts with at most one provider call; cached texts are not sent.
+
+        Returns:
+            np.ndarray: A (len(texts), dim) float32 matrix.
+        """
+        texts = list(texts)
+        if self.cache is None:
+            return self.provider.embed(texts)
+        cached = self.cache.get_many(self.space, texts)
+        missing = [i for i, vector in enumerate(cached) if vector is None]
+        if missing:
+            fresh = self.provider.embed([texts[i] for i in missing])
+            self.cache.put_many(self.space, [texts[i] for i in missing], fresh)
+            for i, vector in zip(missing, fresh):
+                cached[i] = vector
+        return np.vstack(cached)
+
+    async def aembed(self, texts: List[str]) -> np.ndarray:
+        """
+        Async `embed`: cache lookups run in a worker thread and the provider call is awaited.
+        """
+        texts = list(texts)
+        if self.cache is None:
+            return await self.provider.aembed(texts)
+        cached = await asyncio.to_thread(self.cache.get_many, self.space, texts)
+        missing = [i for i, vector in enumerate(cached) if vector is None]
+        if missing:
+            fresh = await self.provider.aembed([texts[i] for i in missing])
+            await asyncio.to_thread(self.cache.put_many, self.space, [texts[i] for i in missing], fresh)
+            for i, vector in zip(missing, fresh):
+                cached[i] = vector
+        return np.vstack(cached)
+
+    def map_batches(
+        self, items: Iterable[T], text_of: Callable[[T], str]
+    ) -> Iterator[Tuple[List[T], Optional[np.ndarray], Optional[Exception]]]:
+        """
+        Embeds `items` in batches of `batch_size` with bounded concurrency.
+
+        Batches are yielded in input order as (items, embeddings, error). A failed batch
+        yields embeddings=None and the exception, so callers can skip it and retry later.
+        `items` is consumed lazily, so at most `concurrency` batches are held in memory.
+        """
+        pending = deque()
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            for batch in batched(items, self.batch_size):
+                batch = list(batch)
+                pending.append((batch, pool.submit(self.embed, [text_of(item) for item in batch])))
+                if len(pending) >= self.concurrency:
+                    yield self._collect(*pending.popleft())
+            while pending:
+                yield self._collect(*pending.popleft())
+
+    @staticmethod
+    def _collect(batch, future):
+        try:
+            return batch, future.result(), None
+        except Exception as e:
+            return batch, None, e
@@ -0,0 +1,764 @@
+import io
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import faiss
+import numpy as np
+
+from json_analyzer import SchemaCatalog
+from log_utils import stderr_log
+from metadata_store import MetadataStore
+from lexical_index import BM25Index, reciprocal_rank_fusion
+from product_filters import ProductColumns
+
+MANIFEST_FILE = "manifest.json"
+# Pre-checkpoint file names, still read when there is no manifest
+LEGACY_FILES = {"index": "index.bin", "metadata": "metadata.json", "cache": "product_index_cache.json"}
+# Filtered searches on ANN indexes matching at most this many rows are scored exactly instead
+EXACT_FILTER_LIMIT = 4096
+# Hybrid search fuses this many candidates per side (at least top_k)
+HYBRID_CANDIDATES = 50
+
+
+def atomic_write_bytes(path: Path, data: bytes) -> None:
+    """
+    Write `data` to `path` via a temp file and rename, so readers never see a partial file.
+    """
+    tmp = path.with_name(f".{path.name}.tmp")
+    with open(tmp, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def atomic_write_text(path: Path, text: str) -> None:
+    atomic_write_bytes(path, text.encode("utf-8"))
+
+
+def read_manifest(index_dir: Path) -> Optional[dict]:
+    """
+    Returns the current checkpoint manifest, or None for an unversioned (legacy) index.
+    """
+    try:
+        return json.loads((index_dir / MANIFEST_FILE).read_text())
+    except FileNotFoundError:
+        return None
+
+
+def index_file_paths(index_dir: Path, manifest: Optional[dict] = None) -> Dict[str, Path]:
+    """
+    Paths of the index, metadata and file-hash cache that belong together.
+    """
+    manifest = manifest if manifest is not None else read_manifest(index_dir)
+    names = manifest["files"] if manifest else LEGACY_FILES
+    return {kind: index_dir / name for kind, name in names.items()}
+
+
+def load_file_hashes(index_dir: Path) -> Dict[str, str]:
+    """
+    The per-file MD5 cache saved with the current checkpoint.
+    """
+    path = index_file_paths(index_dir)["cache"]
+    return json.loads(path.read_text()) if path.exists() else {}
+
+
+def load_original_vectors(index_dir: Path) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+    """
+    Row ids and original float vectors saved with the current checkpoint of a lossy
+    index, or None if it has none.
+    """
+    path = index_file_paths(index_dir).get("vectors")
+    if path is None or not path.exists():
+        return None
+    with np.load(path, allow_pickle=False) as data:
+        return data["row_ids"], data["vectors"]
+
+
+def load_schema_catalog(index_dir: Path) -> SchemaCatalog:
+    """
+    The document schema catalog saved with the current checkpoint (empty if there is none).
+    """
+    path = index_file_paths(index_dir).get("catalog")
+    return SchemaCatalog.load(path) if path is not None and path.exists() else SchemaCatalog()
+
+
+INDEX_KINDS = ("flat", "ivf", "hnsw", "ivfpq")
+# Index kinds that store compressed codes: their reconstructions are approximations, so
+# the original vectors are kept next to them for compaction and rebuilds
+LOSSY_KINDS = ("ivfpq",)
+
+
+@dataclass
+class IndexSpec:
+    """
+    Build-time and default query-time settings for the product index.
+
+    Attributes:
+        kind (str): One of "flat", "ivf", "hnsw", "ivfpq".
+        nlist (int): IVF inverted lists; lowered automatically for small catalogs.
+        nprobe (int): Default IVF lists probed per query.
+        hnsw_m (int): HNSW neighbours per node.
+        ef_construction (int): HNSW build-time search depth.
+        ef_search (int): Default HNSW query-time search depth.
+        pq_m (int): IVF-PQ sub-quantizers; must divide the embedding dimension.
+        pq_bits (int): Bits per IVF-PQ sub-quantizer code.
+        train_sample (int): Maximum vectors sampled to train IVF quantizers.
+    """
+    kind: str = "flat"
+    nlist: int = 1024
+    nprobe: int = 16
+    hnsw_m: int = 32
+    ef_construction: int = 200
+    ef_search: int = 64
+    pq_m: int = 16
+    pq_bits: int = 8
+    train_sample: int = 50000
+
+    def __post_init__(self):
+        if self.kind not in INDEX_KINDS:
+            raise ValueError(f"Unknown index type {self.kind!r}, expected one of {INDEX_KINDS}")
+
+    def build(self, vectors: np.ndarray, seed: int = 0) -> faiss.Index:
+        """
+        Create an empty IndexIDMap2 of this kind, trained on a sample of `vectors`.
+        """
+        d = vectors.shape[1]
+        # IVF wants roughly 39+ training points per list
+        nlist = max(1, min(self.nlist, len(vectors) // 39))
+        if self.kind == "hnsw":
+            base = faiss.IndexHNSWFlat(d, self.hnsw_m)
+            base.hnsw.efConstruction = self.ef_construction
+            base.hnsw.efSearch = self.ef_search
+        elif self.kind == "ivf":
+            base = faiss.IndexIVFFlat(faiss.IndexFlatL2(d), d, nlist)
+        elif self.kind == "ivfpq":
+            if d % self.pq_m:
+                raise ValueError(f"pq_m={self.pq_m} does not divide embedding dimension {d}")
+            if len(vectors) < 2 ** self.pq_bits:
+                raise ValueError(f"IVF-PQ needs at least {2 ** self.pq_bits} vectors to train, got {len(vectors)}")
+            base = faiss.IndexIVFPQ(faiss.IndexFlatL2(d), d, nlist, self.pq_m, self.pq_bits)
+        else:
+            base = faiss.IndexFlatL2(d)
+        if not base.is_trained:
+            rng = np.random.default_rng(seed)
+            sample = vectors[rng.choice(len(vectors), min(self.train_sample, len(vectors)), replace=False)]
+            base.train(np.ascontiguousarray(sample))
+        if isinstance(base, faiss.IndexIVF):
+            base.nprobe = min(self.nprobe, nlist)
+            # IndexIDMap2 reconstructs vectors by position, which IVF only supports with a direct map
+            base.make_direct_map()
+        return faiss.IndexIDMap2(base)
+
+
+def index_kind(index: faiss.Index) -> str:
+    """
+    The IndexSpec kind of a built index ("flat", "ivf", "hnsw" or "ivfpq").
+    """
+    base = faiss.downcast_index(index.index) if isinstance(index, faiss.IndexIDMap2) else index
+    if isinstance(base, faiss.IndexHNSW):
+        return "hnsw"
+    if isinstance(base, faiss.IndexIVFPQ):
+        return "ivfpq"
+    if isinstance(base, faiss.IndexIVF):
+        return "ivf"
+    return "flat"
+
+
+def _read_json_metadata(path: Path, index: faiss.Index,
+                        manifest: Optional[dict]) -> Tuple[faiss.Index, Dict[int, dict], Set[int], int]:
+    """
+    Read metadata saved as JSON by earlier versions.
+
+    Indexes written by the original positional format (a bare IndexFlatL2 plus a metadata
+    list) are migrated in memory to an IndexIDMap2 over row ids, keeping only the newest
+    row for each product_id.
+    """
+    metadata = json.loads(path.read_text())
+    if isinstance(metadata, dict) and metadata.get("format") == 2:
+        if manifest and metadata.get("version") != manifest["version"]:
+            raise ValueError(f"Metadata version {metadata.get('version')} does not match manifest {manifest['version']}")
+        rows = {int(row_id): row for row_id, row in metadata["rows"].items()}
+        return index, rows, set(metadata["tombstones"]), int(metadata["next_id"])
+
+    # Positional format: row i of the flat index belongs to metadata[i]
+    n = min(index.ntotal, len(metadata))
+    vectors = index.reconstruct_n(0, n) if n else np.zeros((0, index.d), dtype=np.float32)
+    id_index = faiss.IndexIDMap2(faiss.IndexFlatL2(index.d))
+    id_index.add_with_ids(vectors, np.arange(n, dtype=np.int64))
+    rows, tombstones, live = {}, set(), {}
+    for row_id in range(n):
+        row = metadata[row_id]
+        if row["product_id"] in live:
+            tombstones.add(live[row["product_id"]])
+            del rows[live[row["product_id"]]]
+        live[row["product_id"]] = row_id
+        rows[row_id] = row
+    stderr_log("INFO", f"Migrated legacy product index: {len(rows)} live rows, {len(tombstones)} duplicates tombstoned")
+    return id_index, rows, tombstones, n
+
+
+def mmap_read_index(path: Path) -> faiss.Index:
+    """
+    Read an index memory-mapped and read-only.
+
+    IO_FLAG_MMAP_IFC (newer faiss releases) also maps the vector storage of flat and HNSW
+    indexes, but combined with IO_FLAG_MMAP faiss refuses to read IVF inverted lists
+    ("mmap only supported for File objects"). Those indexes are read again with plain
+    IO_FLAG_MMAP, which maps the inverted lists on its own.
+    """
+    flags = faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY
+    ifc = getattr(faiss, "IO_FLAG_MMAP_IFC", 0)
+    if ifc:
+        try:
+            return faiss.read_index(str(path), flags | ifc)
+        except RuntimeError:
+            pass
+    return faiss.read_index(str(path), flags)
+
+
+def open_index_files(index_dir: Path, mmap: bool = False) -> Tuple[faiss.Index, MetadataStore]:
+    """
+    Open the index and metadata store of the current checkpoint for serving.
+
+    The index is an IndexIDMap2 whose ids are row ids, and the metadata store maps live
+    row ids to their rows. SQLite metadata is opened read-only and read lazily; JSON
+    metadata from earlier versions is loaded into an in-memory store.
+
+    With mmap=True the index and metadata files are memory-mapped read-only instead of
+    copied into private memory. Checkpoint files are never modified after the manifest
+    points at them, so the mappings stay valid, start-up is near-instant and the OS page
+    cache is shared by every server process on the host.
+    """
+    manifest = read_manifest(index_dir)
+    paths = index_file_paths(index_dir, manifest)
+    if mmap and manifest is not None:
+        index = mmap_read_index(paths["index"])
+    else:
+        index = faiss.read_index(str(paths["index"]))
+    if paths["metadata"].suffix == ".db":
+        store = MetadataStore.open(paths["metadata"], mmap=mmap)
+        if manifest and store.info().get("version") != manifest["version"]:
+            raise ValueError(f"Metadata store version does not match manifest {manifest['version']}")
+        return index, store
+    index, rows, tombstones, next_id = _read_json_metadata(paths["metadata"], index, manifest)
+    return index, MetadataStore.from_rows(rows, tombstones, next_id)
+
+
+def load_index_files(index_dir: Path) -> Tuple[faiss.Index, Dict[int, dict], Set[int], int]:
+    """
+    Load the index and every metadata row of the current checkpoint, for ingestion.
+
+    Returns:
+        (index, rows, tombstones, next_id)
+    """
+    manifest = read_manifest(index_dir)
+    paths = index_file_paths(index_dir, manifest)
+    index = faiss.read_index(str(paths["index"]))
+    if paths["metadata"].suffix != ".db":
+        return _read_json_metadata(paths["metadata"], index, manifest)
+    store = MetadataStore.open(paths["metadata"])
+    try:
+        rows = dict(store.iter_rows())
+        return index, rows, store.tombstones(), int(store.info()["next_id"])
+    finally:
+        store.close()
+
+
+@dataclass(frozen=True)
+class IndexSnapshot:
+    """
+    An immutable view of the product index and its metadata store.
+
+    Searches grab one snapshot and use it for the whole request, so a reload that
+    happens in the middle of a search never mixes an old index with new metadata.
+    """
+    index: faiss.Index
+    metadata: MetadataStore
+    version: Tuple
+    columns_path: Optional[Path] = None
+    lexical_path: Optional[Path] = None
+    catalog_path: Optional[Path] = None
+    tombstones: Set[int] = field(default_factory=set, init=False)
+    kind: str = field(default="flat", init=False)
+    _selectors: tuple = field(default=(), init=False, repr=False)
+    _sidecars: dict = field(default_factory=dict, init=False, repr=False)
+    _sidecars_lock: threading.Lock = field(default_factory=threading.Lock, init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        object.__setattr__(self, "tombstones", self.metadata.tombstones())
+        object.__setattr__(self, "kind", index_kind(self.index))
+        if self.tombstones:
+            # Tombstoned vectors are still in the index until compaction; exclude them
+            dead = faiss.IDSelectorBatch(np.fromiter(self.tombstones, dtype=np.int64))
+            alive = faiss.IDSelectorNot(dead)
+            object.__setattr__(self, "_selectors", (dead, alive))
+
+    def _sidecar(self, name: str, path: Optional[Path], cls):
+        # Checkpoints store these structures next to the metadata; older checkpoints
+        # build them from the metadata rows. Either way they are loaded on first use.
+        with self._sidecars_lock:
+            if name not in self._sidecars:
+                loaded = None
+                if path is not None and path.exists():
+                    try:
+                        loaded = cls.load(path)
+                    except KeyError:
+                        # Written by an older version without all of today's arrays
+                        stderr_log("WARN", f"Rebuilding outdated {path.name} from the metadata store")
+                self._sidecars[name] = loaded if loaded is not None else cls.from_rows(self.metadata.iter_rows())
+            return self._sidecars[name]
+
+    def columns(self) -> ProductColumns:
+        """Columnar filter fields of the live rows."""
+        return self._sidecar("columns", self.columns_path, ProductColumns)
+
+    def lexical(self) -> BM25Index:
+        """BM25 inverted index over the live rows."""
+        return self._sidecar("lexical", self.lexical_path, BM25Index)
+
+    def catalog(self) -> Optional[dict]:
+        """Summary of the document schema catalog saved with this checkpoint, or None without one."""
+        with self._sidecars_lock:
+            if "catalog" not in self._sidecars:
+                path = self.catalog_path
+                self._sidecars["catalog"] = SchemaCatalog.load(path).summary() if path is not None and path.exists() else None
+            return self._sidecars["catalog"]
+
+    def search_params(self, nprobe: Optional[int] = None, ef_search: Optional[int] = None,
+                      selector: Optional[faiss.IDSelector] = None) -> Optional[faiss.SearchParameters]:
+        """
+        Per-query FAISS parameters: the ANN knob for this index type plus an ID filter,
+        `selector` if given (it must only admit live rows) or else the tombstone filter.
+        """
+        selector = selector if selector is not None else (self._selectors[-1] if self._selectors else None)
+        if self.kind in ("ivf", "ivfpq") and nprobe:
+            params = faiss.SearchParametersIVF()
+            params.nprobe = nprobe
+        elif self.kind == "hnsw" and ef_search:
+            params = faiss.SearchParametersHNSW()
+            params.efSearch = ef_search
+        elif selector is not None:
+            params = faiss.SearchParameters()
+        else:
+            return None
+        if selector is not None:
+            params.sel = selector
+        return params
+
+    def _search_exact(self, query_vectors: np.ndarray, top_k: int,
+                      row_ids: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Brute-force L2 search over the stored vectors of `row_ids`.
+        """
+        D = np.full((len(query_vectors), top_k), np.inf, dtype=np.float32)
+        I = np.full((len(query_vectors), top_k), -1, dtype=np.int64)
+        k = min(top_k, len(row_ids))
+        if k == 0:
+            return D, I
+        vectors = self.vectors(row_ids)
+        distances = ((query_vectors ** 2).sum(axis=1)[:, None] - 2.0 * query_vectors @ vectors.T
+                     + (vectors ** 2).sum(axis=1)[None, :])
+        order = np.argsort(distances, axis=1)[:, :k]
+        D[:, :k] = np.take_along_axis(distances, order, axis=1)
+        I[:, :k] = row_ids[order]
+        return D, I
+
+    def vectors(self, row_ids) -> np.ndarray:
+        """The stored vectors of `row_ids`, one row each, reconstructed from the index."""
+        return self.index.reconstruct_batch(np.ascontiguousarray(row_ids, dtype=np.int64))
+
+    def search(self, query_vectors: np.ndarray, top_k: int, nprobe: Optional[int] = None,
+               ef_search: Optional[int] = None, filters: Optional[Dict[str, object]] = None,
+               query_texts: Optional[List[str]] = None) -> Tuple[np.ndarray, List[List[dict]]]:
+        """
+        Search the live rows, optionally only those matching `filters`.
+
+        Filters are resolved to the exact set of matching row ids on the columnar fields
+        and pushed into FAISS as an ID selector, so the top_k hits all match. On ANN
+        indexes a small matching set is scored exactly instead, since graph and IVF
+        traversal can run out of candidates under a selective filter.
+
+        With `query_texts` (one per query vector) the search is hybrid: the vector and BM25
+        rankings of up to HYBRID_CANDIDATES rows each are fused with reciprocal-rank fusion,
+        and the returned scores are fused RRF scores (higher is better) instead of distances.
+
+        Args:
+            query_vectors (np.ndarray): A (n, d) float32 query matrix.
+            top_k (int): Number of hits per query.
+            nprobe (Optional[int]): IVF lists to probe; ignored by other index types.
+            ef_search (Optional[int]): HNSW search depth; ignored by other index types.
+            filters (Optional[Dict[str, object]]): See ProductColumns.mask.
+            query_texts (Optional[List[str]]): Query strings for the lexical side of hybrid search.
+
+        Returns:
+            (distances, rows): The (n, top_k) distance matrix and, per query, the hit rows,
+            each with its score under "distance" and its "row_id".
+        """
+        matching = self.columns().select(filters) if filters else None
+        if query_texts is not None:
+            return self._search_hybrid(query_vectors, query_texts, top_k, nprobe, ef_search, matching)
+        D, I = self._search_vectors(query_vectors, top_k, nprobe, ef_search, matching)
+        return D, self._hits(I, D)
+
+    def _search_vectors(self, query_vectors: np.ndarray, top_k: int, nprobe: Optional[int],
+                        ef_search: Optional[int], matching: Optional[np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+        if matching is not None:
+            if self.kind != "flat" and len(matching) <= EXACT_FILTER_LIMIT:
+                D, I = self._search_exact(query_vectors, top_k, matching)
+            else:
+                selector = faiss.IDSelectorBatch(matching)
+                D, I = self.index.search(query_vectors, top_k,
+                                         params=self.search_params(nprobe, ef_search, selector))
+        else:
+            D, I = self.index.search(query_vectors, top_k, params=self.search_params(nprobe, ef_search))
+        return D, I
+
+    def _search_hybrid(self, query_vectors: np.ndarray, query_texts: List[str], top_k: int,
+                       nprobe: Optional[int], ef_search: Optional[int],
+                       matching: Optional[np.ndarray]) -> Tuple[np.ndarray, List[List[dict]]]:
+        depth = max(top_k, HYBRID_CANDIDATES)
+        _, I = self._search_vectors(query_vectors, depth, nprobe, ef_search, matching)
+        lexical = self.lexical()
+        D = np.zeros((len(query_texts), top_k), dtype=np.float32)
+        fused_ids = np.full((len(query_texts), top_k), -1, dtype=np.int64)
+        for q, text in enumerate(query_texts):
+            lexical_ids, _ = lexical.search(text, depth, candidates=matching)
+            vector_ids = [i for i in I[q].tolist() if i >= 0]
+            # Lexical first: on equal fused scores (e.g. lexical rank 1 vs vector rank 1) the exact word match wins
+            for rank, (row_id, score) in enumerate(reciprocal_rank_fusion([lexical_ids.tolist(), vector_ids], top_k)):
+                fused_ids[q, rank], D[q, rank] = row_id, score
+        return D, self._hits(fused_ids, D)
+
+    def _hits(self, I: np.ndarray, D: np.ndarray) -> List[List[dict]]:
+        row_ids = I.tolist()
+        # Only the returned rows are read from the metadata store and decoded
+        rows = self.metadata.get({i for ids in row_ids for i in ids})
+        # Each hit carries its own score, as "distance", and row id, for later reranking
+        return [[{**rows[i], "row_id": i, "distance": float(d)} for i, d in zip(ids, scores) if i in rows]
+                for ids, scores in zip(row_ids, D.tolist())]
+
+
+class ProductIndexStore:
+    """
+    Process-wide holder for the FAISS product index and its metadata.
+
+    The index and metadata are loaded once and served from memory. At most once every
+    `check_interval` seconds the files on disk are stat'ed; if their version changed the
+    store loads a new snapshot on the calling thread and swaps it in atomically.
+
+    Attributes:
+        index_dir (Path): Directory holding the checkpoint manifest, index and metadata.
+        check_interval (float): Minimum seconds between on-disk version checks.
+        mmap (bool): Memory-map the index and metadata read-only (see open_index_files).
+    """
+
+    def __init__(self, index_dir: Path, check_interval: float = 2.0, mmap: bool = False):
+        self.index_dir = Path(index_dir)
+        self.check_interval = check_interval
+        self.mmap = mmap
+        self._snapshot: Optional[IndexSnapshot] = None
+        self._last_check = 0.0
+        self._reload_lock = threading.Lock()
+
+    def exists(self) -> bool:
+        """Whether a complete index and metadata pair is present on disk."""
+        return self.disk_version() is not None
+
+    def disk_version(self) -> Optional[Tuple]:
+        """
+        Returns a version token for the files on disk, or None if they are missing.
+
+        Checkpointed indexes use the manifest's version stamp, which only changes once a
+        complete index/metadata pair is in place. Legacy indexes fall back to mtime/size.
+        """
+        try:
+            manifest = read_manifest(self.index_dir)
+            if manifest is not None:
+                return ("manifest", manifest["version"])
+            paths = index_file_paths(self.index_dir, manifest)
+            index_stat = paths["index"].stat()
+            metadata_stat = paths["metadata"].stat()
+        except (FileNotFoundError, ValueError, KeyError):
+            return None
+        return (
+            index_stat.st_mtime_ns, index_stat.st_size,
+            metadata_stat.st_mtime_ns, metadata_stat.st_size,
+        )
+
+    def _load(self, version: Tuple) -> IndexSnapshot:
+        index, metadata = open_index_files(self.index_dir, mmap=self.mmap)
+        stamp = metadata.info().get("version")
+        if stamp is None:
+            return IndexSnapshot(index=index, metadata=metadata, version=version)
+        return IndexSnapshot(index=index, metadata=metadata, version=version,
+                             columns_path=self.index_dir / f"columns.v{stamp}.npz",
+                             lexical_path=self.index_dir / f"bm25.v{stamp}.npz",
+                             catalog_path=self.index_dir / f"schema_catalog.v{stamp}.json")
+
+    def reload(self, force: bool = False) -> Optional[IndexSnapshot]:
+        """
+        Reloads the snapshot if the files on disk changed (or always, if force=True).
+        A failed reload keeps the previous snapshot; a failed first load raises.
+
+        Returns:
+            Optional[IndexSnapshot]: The current snapshot after the check.
+        """
+        with self._reload_lock:
+            self._last_check = time.monotonic()
+            version = self.disk_version()
+            if version is None:
+                return self._snapshot
+            current = self._snapshot
+            if not force and current is not None and current.version == version:
+                return current
+            try:
+                snapshot = self._load(version)
+            except Exception as e:
+                if current is None:
+                    # Nothing to fall back to: serving an empty index would hide the failure
+                    stderr_log("ERROR", f"Failed to load product index from {self.index_dir}: {e}")
+                    raise
+                # Files may be half-written by a concurrent ingestion; keep serving the old snapshot
+                stderr_log("WARN", f"Failed to reload product index, keeping previous snapshot: {e}")
+                return current
+            # Re-check that nothing changed while we were loading; the next check picks it up
+            if self.disk_version() != version and current is not None:
+                return current
+            self._snapshot = snapshot
+            stderr_log("INFO", f"Loaded product index with {snapshot.metadata.count()} live rows "
+                               f"({len(snapshot.tombstones)} tombstoned)")
+            return snapshot
+
+    def get(self) -> Optional[IndexSnapshot]:
+        """
+        Returns the current snapshot, loading it on first use and hot-reloading it
+        when the files on disk change.
+        """
+        snapshot = self._snapshot
+        if snapshot is None or time.monotonic() - self._last_check >= self.check_interval:
+            return self.reload()
+        return snapshot
+
+
+class MutableProductIndex:
+    """
+    Writable product index used by ingestion, keyed by product_id.
+
+    Every vector gets a fresh row id. Replacing or removing a product tombstones its old
+    row: the row leaves `rows` at once and searches skip it, while its vector stays in
+    the FAISS index until `compact()` rebuilds the index without dead entries.
+
+    For lossy index kinds (LOSSY_KINDS) the original vectors are kept alongside the index
+    and saved with each checkpoint, so compaction and rebuilds re-encode the embeddings
+    rather than decoded codes, which would add quantization error on every pass.
+
+    Attributes:
+        index (Optional[faiss.Index]): IndexIDMap2 over row ids, created on first add.
+        rows (Dict[int, dict]): Live row id -> metadata row.
+        tombstones (Set[int]): Row ids whose vectors are dead but not yet compacted away.
+        next_id (int): Next row id to assign.
+        originals (Optional[Tuple[np.ndarray, np.ndarray]]): Row ids and original vectors,
+            kept only while the index is lossy.
+    """
+
+    def __init__(self, index: Optional[faiss.Index] = None, rows: Optional[Dict[int, dict]] = None,
+                 tombstones: Optional[Set[int]] = None, next_id: int = 0,
+                 originals: Optional[Tuple[np.ndarray, np.ndarray]] = None):
+        self.index = index
+        self.rows: Dict[int, dict] = rows or {}
+        self.tombstones: Set[int] = tombstones or set()
+        self.next_id = next_id
+        # Appended per upsert and concatenated on use
+        self._originals: List[Tuple[np.ndarray, np.ndarray]] = [originals] if originals is not None else []
+        self._by_product: Dict[str, int] = {}
+        self._by_doc: Dict[str, int] = {}
+        for row_id, row in self.rows.items():
+            self._by_product[row["product_id"]] = row_id
+            self._by_doc[row["doc"]] = row_id
+
+    @classmethod
+    def load(cls, index_dir: Path) -> "MutableProductIndex":
+        paths = index_file_paths(index_dir)
+        if not (paths["index"].exists() and paths["metadata"].exists()):
+            return cls()
+        index, rows, tombstones, next_id = load_index_files(index_dir)
+        originals = load_original_vectors(index_dir) if index_kind(index) in LOSSY_KINDS else None
+        return cls(index=index, rows=rows, tombstones=tombstones, next_id=next_id, originals=originals)
+
+    def save(self, index_dir: Path, file_hashes: Dict[str, str], catalog: Optional[SchemaCatalog] = None) -> int:
+        """
+        Write a checkpoint: index, metadata, filter columns, BM25 index, file-hash cache,
+        document schema catalog and, for lossy indexes, the original vectors under a new
+        version stamp. Without `catalog`, the previous checkpoint's catalog is carried over.
+
+        Each file is written atomically under a versioned name, then the manifest is
+        atomically switched to the new version. A crash at any point leaves the previous
+        checkpoint intact, and readers never pair an index with metadata from another
+        version. Files older than the previous checkpoint are removed.
+
+        Returns:
+            int: The new version.
+        """
+        if self.index is None:
+            raise ValueError("Cannot checkpoint an empty product index")
+        manifest = read_manifest(index_dir)
+        version = (manifest["version"] if manifest else 0) + 1
+        files = {
+            "index": f"index.v{version}.bin",
+            "metadata": f"metadata.v{version}.db",
+            "cache": f"product_index_cache.v{version}.json",
+            "columns": f"columns.v{version}.npz",
+            "lexical": f"bm25.v{version}.npz",
+        }
+        previous_catalog = index_dir / manifest["files"]["catalog"] if manifest and "catalog" in manifest["files"] else None
+        if catalog is not None:
+            files["catalog"] = f"schema_catalog.v{version}.json"
+            atomic_write_text(index_dir / files["catalog"], catalog.to_json())
+        elif previous_catalog is not None and previous_catalog.exists():
+            files["catalog"] = f"schema_catalog.v{version}.json"
+            atomic_write_bytes(index_dir / files["catalog"], previous_catalog.read_bytes())
+        atomic_write_bytes(index_dir / files["index"], faiss.serialize_index(self.index).tobytes())
+        MetadataStore.write(index_dir / files["metadata"], self.rows, self.tombstones, self.next_id, version)
+        atomic_write_bytes(index_dir / files["columns"], ProductColumns.from_rows(self.rows.items()).to_bytes())
+        atomic_write_bytes(index_dir / files["lexical"], BM25Index.from_rows(self.rows.items()).to_bytes())
+        atomic_write_text(index_dir / files["cache"], json.dumps(file_hashes, indent=2))
+        originals = self.originals
+        if originals is not None:
+            files["vectors"] = f"vectors.v{version}.npz"
+            buffer = io.BytesIO()
+            np.savez(buffer, row_ids=originals[0], vectors=originals[1])
+            atomic_write_bytes(index_dir / files["vectors"], buffer.getvalue())
+        atomic_write_text(index_dir / MANIFEST_FILE, json.dumps({"version": version, "files": files}, indent=2))
+
+        # Keep the previous checkpoint for readers that resolved the old manifest just now
+        keep = set(files.values()) | (set(manifest["files"].values()) if manifest else set())
+        for pattern in ("index.v*.bin", "metadata.v*.db", "metadata.v*.json", "product_index_cache.v*.json",
+                        "columns.v*.npz", "bm25.v*.npz", "schema_catalog.v*.json", "vectors.v*.npz"):
+            for path in index_dir.glob(pattern):
+                if path.name not in keep:
+                    path.unlink(missing_ok=True)
+        return version
+
+    @property
+    def originals(self) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """Row ids and original vectors of the live rows, or None when none are kept."""
+        if not self._originals:
+            return None
+        ids = np.concatenate([chunk[0] for chunk in self._originals])
+        vectors = np.concatenate([chunk[1] for chunk in self._originals])
+        keep = np.isin(ids, np.fromiter(self.rows, dtype=np.int64, count=len(self.rows)))
+        self._originals = [(ids[keep], vectors[keep])]
+        return self._originals[0]
+
+    @property
+    def live_count(self) -> int:
+        return len(self.rows)
+
+    @property
+    def dead_count(self) -> int:
+        return len(self.tombstones)
+
+    def _tombstone(self, row_id: Optional[int]) -> bool:
+        if row_id is None or row_id not in self.rows:
+            return False
+        row = self.rows.pop(row_id)
+        if self._by_product.get(row["product_id"]) == row_id:
+            del self._by_product[row["product_id"]]
+        if self._by_doc.get(row["doc"]) == row_id:
+            del self._by_doc[row["doc"]]
+        self.tombstones.add(row_id)
+        return True
+
+    def upsert(self, rows: List[dict], vectors: np.ndarray) -> int:
+        """
+        Add rows with their vectors, replacing any live row with the same product_id or doc.
+
+        Returns:
+            int: Number of existing rows that were replaced.
+        """
+        if self.index is None:
+            self.index = faiss.IndexIDMap2(faiss.IndexFlatL2(vectors.shape[1]))
+        replaced = 0
+        row_ids = np.arange(self.next_id, self.next_id + len(rows), dtype=np.int64)
+        for row_id, row in zip(row_ids.tolist(), rows):
+            replaced += self._tombstone(self._by_product.get(row["product_id"]))
+            replaced += self._tombstone(self._by_doc.get(row["doc"]))
+            self.rows[row_id] = row
+            self._by_product[row["product_id"]] = row_id
+            self._by_doc[row["doc"]] = row_id
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        self.index.add_with_ids(vectors, row_ids)
+        if self._originals:
+            self._originals.append((row_ids, vectors.copy()))
+        self.next_id += len(rows)
+        return replaced
+
+    def remove_product(self, product_id: str) -> bool:
+        return self._tombstone(self._by_product.get(str(product_id)))
+
+    def remove_docs(self, docs: Iterable[str]) -> int:
+        """
+        Tombstone the rows that came from the given document file names.
+
+        Returns:
+            int: Number of rows removed.
+        """
+        return sum(self._tombstone(self._by_doc.get(doc)) for doc in docs)
+
+    def live_vectors(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Row ids and vectors of every live row: the kept originals of a lossy index, else
+        read from the index in one pass.
+        """
+        originals = self.originals
+        if originals is not None:
+            return originals
+        if index_kind(self.index) in LOSSY_KINDS:
+            stderr_log("WARN", "No original vectors kept for this lossy index; re-encoding decoded codes "
+                               "adds quantization error. Re-ingest to restore exact vectors.")
+        base = faiss.downcast_index(self.index.index)
+        ids = faiss.vector_to_array(self.index.id_map)
+        vectors = base.reconstruct_n(0, base.ntotal) if base.ntotal else np.zeros((0, base.d), dtype=np.float32)
+        keep = np.isin(ids, np.fromiter(self.rows, dtype=np.int64, count=len(self.rows)))
+        return ids[keep], vectors[keep]
+
+    def compact(self) -> int:
+        """
+        Rebuild the FAISS index with only the live rows, dropping tombstoned vectors.
+        Row ids are kept, so metadata rows do not move, and trained quantizers are reused.
+        Lossy indexes are re-encoded from their original vectors.
+
+        Returns:
+            int: Number of dead vectors dropped.
+        """
+        if self.index is None or not self.tombstones:
+            return 0
+        live_ids, vectors = self.live_vectors()
+        compacted = faiss.clone_index(self.index)
+        compacted.reset()
+        if len(live_ids):
+            compacted.add_with_ids(vectors, live_ids)
+        dropped = len(self.tombstones)
+        self.index = compacted
+        self.tombstones = set()
+        return dropped
+
+    def rebuild(self, spec: IndexSpec) -> None:
+        """
+        Rebuild the index as `spec` (e.g. flat -> IVF or HNSW), training on the live
+        vectors. Tombstoned vectors are dropped on the way.
+        """
+        if self.index is None or not self.rows:
+            return
+        live_ids, vectors = self.live_vectors()
+        rebuilt = spec.build(vectors)
+        rebuilt.add_with_ids(vectors, live_ids)
+        self.index = rebuilt
+        self.tombstones = set()
+        self._originals = [(live_ids, vectors)] if spec.kind in LOSSY_KINDS else []
@@ -0,0 +1,325 @@
+import hashlib
+import json
+import os
+import time
+from dataclasses import dataclass
+from multiprocessing import Pool
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from embeddings import BatchEmbedder, default_embedding_cache
+from index_store import IndexSpec, MutableProductIndex, index_kind, load_file_hashes, load_schema_catalog
+from json_analyzer import SchemaCatalog, document_profile
+from log_utils import stderr_log
+from models import ProductChunkTyped, ProductResponse
+
+ROOT = Path(__file__).parent.resolve()
+DOC_PATH = ROOT / "documents"
+INDEX_DIR = ROOT / "faiss_index"
+
+
+@dataclass
+class IngestStats:
+    """
+    Counters for one ingestion run.
+    """
+    scanned: int = 0
+    skipped: int = 0
+    profiled: int = 0
+    embedded: int = 0
+    replaced: int = 0
+    removed: int = 0
+    compacted: int = 0
+    failed: int = 0
+    checkpoints: int = 0
+    rebuilt: bool = False
+    seconds: float = 0.0
+
+    @property
+    def docs_per_sec(self) -> float:
+        return self.embedded / self.seconds if self.seconds > 0 else 0.0
+
+    def summary(self) -> str:
+        return (f"scanned={self.scanned} skipped={self.skipped} profiled={self.profiled} embedded={self.embedded} "
+                f"replaced={self.replaced} removed={self.removed} compacted={self.compacted} "
+                f"failed={self.failed} checkpoints={self.checkpoints} in {self.seconds:.1f}s ({self.docs_per_sec:.1f} docs/sec)")
+
+
+@dataclass
+class ParsedDocument:
+    """
+    A product document that changed since the last run, parsed and ready to embed.
+    """
+    file_name: str
+    file_hash: str
+    product: ProductChunkTyped
+    response_json: str
+
+
+@dataclass
+class ParseResult:
+    """
+    Outcome of parsing one file in a worker: a product, an unchanged skip, or an error.
+    Either of the first two carries the file's schema catalog profile when it was requested.
+    """
+    file_name: str
+    file_hash: Optional[str] = None
+    product: Optional[ProductChunkTyped] = None
+    response_json: Optional[str] = None
+    profile: Optional[dict] = None
+    skipped: bool = False
+    error: Optional[str] = None
+
+
+def parse_document(task: Tuple[str, Optional[str], Optional[str]]) -> ParseResult:
+    """
+    Read, hash, clean and parse one product file, and build the ProductResponse that
+    search will return for it. Files whose catalog entry is out of date are also
+    profiled for the schema catalog, even when the index already has them. Runs in a
+    worker process.
+
+    Args:
+        task: (file path, MD5 recorded for it in the cache or None, MD5 recorded for it
+            in the schema catalog: "" if absent, None to skip profiling).
+    """
+    path, cached_hash, catalog_hash = task
+    file_name = os.path.basename(path)
+    try:
+        raw = Path(path).read_bytes()
+        f_md_hash = hashlib.md5(raw).hexdigest()
+        profile_needed = catalog_hash is not None and catalog_hash != f_md_hash
+        if cached_hash == f_md_hash:
+            profile = document_profile(json.loads(raw).get("data") or {}) if profile_needed else None
+            return ParseResult(file_name=file_name, file_hash=f_md_hash, skipped=True, profile=profile)
+        data = json.loads(raw)
+        product = ProductChunkTyped.from_json(data)
+        response_json = ProductResponse.from_product_chunk(product).model_dump_json()
+        profile = document_profile(data.get("data") or {}) if profile_needed else None
+        return ParseResult(file_name=file_name, file_hash=f_md_hash, product=product, response_json=response_json,
+                           profile=profile)
+    except Exception as e:
+        return ParseResult(file_name=file_name, error=str(e))
+
+
+def iter_parsed(
+    files: Iterable[Path], cache_meta: Dict[str, str], workers: int = 1, chunksize: int = 64,
+    catalog: Optional[SchemaCatalog] = None,
+) -> Iterator[ParseResult]:
+    """
+    Parse `files` in input order, spreading the work over `workers` processes.
+    Results stream back as they are ready, so embedding can start before parsing ends.
+    With `catalog`, files it has no current entry for are profiled as well.
+    """
+    tasks = ((str(file), cache_meta.get(file.name),
+              (catalog.file_hash(file.name) or "") if catalog is not None else None) for file in files)
+    if workers <= 1:
+        yield from map(parse_document, tasks)
+        return
+    with Pool(processes=workers) as pool:
+        yield from pool.imap(parse_document, tasks, chunksize=chunksize)
+
+
+def parse_changed_documents(
+    files: Iterable[Path], cache_meta: Dict[str, str], stats: IngestStats, workers: int = 1,
+    catalog: Optional[SchemaCatalog] = None,
+) -> Iterator[ParsedDocument]:
+    """
+    Yields the documents whose MD5 differs from `cache_meta`, parsed into ProductChunkTyped.
+    Profiles of files that changed since `catalog` last saw them are recorded into it.
+    """
+    for result in iter_parsed(files, cache_meta, workers=workers, catalog=catalog):
+        stats.scanned += 1
+        if result.profile is not None:
+            catalog.update(result.file_name, result.file_hash, result.profile)
+            stats.profiled += 1
+        if result.skipped:
+            stats.skipped += 1
+        elif result.error is not None:
+            stats.failed += 1
+            stderr_log("ERROR", f"Failed to process {result.file_name}: {result.error}")
+        else:
+            yield ParsedDocument(file_name=result.file_name, file_hash=result.file_hash, product=result.product,
+                                 response_json=result.response_json)
+
+
+def metadata_row(doc: ParsedDocument) -> dict:
+    return {
+        "doc": doc.file_name,
+        "chunk": doc.product.product_content,
+        "product_id": str(doc.product.id),
+        "metadata": doc.product.metadata.model_dump(),
+        "response": doc.response_json,
+    }
+
+
+def process_product_documents(
+    doc_path: Path = DOC_PATH,
+    index_dir: Path = INDEX_DIR,
+    embedder: Optional[BatchEmbedder] = None,
+    add_block_size: int = 1024,
+    parse_workers: int = 1,
+    compact_ratio: float = 0.2,
+    checkpoint_every: int = 5000,
+    index_spec: Optional[IndexSpec] = None,
+) -> IngestStats:
+    """
+    Parse changed product documents in a process pool, embed them in concurrent batches and
+    upsert them into the FAISS index in large blocks.
+
+    The schema catalog of the documents (see json_analyzer.SchemaCatalog) is updated from
+    the same parse, for changed files only, and served by
+    product_metadata_analysis_for_refine_or_tuning_search_result.
+
+    Every `checkpoint_every` embedded documents, and at the end, the index, metadata,
+    per-file hash cache and schema catalog are written as one versioned checkpoint (see
+    MutableProductIndex.save). A crashed run restarts from the last checkpoint and skips
+    the files it already covered.
+
+    A changed file replaces the previous vector for its product_id and a deleted file
+    removes it; both leave tombstones that are compacted away once they exceed
+    `compact_ratio` of the index.
+
+    Args:
+        doc_path (Path): Directory containing product *.json files.
+        index_dir (Path): Directory for the checkpoint manifest, index, metadata and hash cache.
+        embedder (Optional[BatchEmbedder]): Embedding client; defaults to the local Ollama server
+            behind the shared embedding cache, so unchanged product text is not re-embedded.
+        add_block_size (int): Number of vectors buffered before each `index.add`.
+        parse_workers (int): Processes used to read, hash and parse documents.
+        compact_ratio (float): Dead/total vector ratio above which the index is compacted.
+        checkpoint_every (int): Embedded documents between checkpoints.
+        index_spec (Optional[IndexSpec]): Index type to build. New vectors are first added to a
+            flat index; at the end of the run the index is rebuilt and trained as this type if
+            it is not one already.
+
+    Returns:
+        IngestStats: Counters and throughput for the run.
+    """
+    index_dir.mkdir(exist_ok=True)
+    embedder = embedder or BatchEmbedder(cache=default_embedding_cache())
+
+    cache_meta = load_file_hashes(index_dir)
+    catalog = load_schema_catalog(index_dir)
+    product_index = MutableProductIndex.load(index_dir)
+
+    stats = IngestStats()
+    start = time.perf_counter()
+    block_vectors: List[np.ndarray] = []
+    block_docs: List[ParsedDocument] = []
+    checkpointed_at = 0
+    # stats.profiled when the catalog was last saved; parsing runs ahead of embedding
+    catalog_saved_at = 0
+
+    def checkpoint():
+        nonlocal checkpointed_at, catalog_saved_at
+        version = product_index.save(index_dir, cache_meta, catalog)
+        checkpointed_at = stats.embedded
+        catalog_saved_at = stats.profiled
+        stats.checkpoints += 1
+        stderr_log("INFO", f"Checkpoint v{version}: {product_index.live_count} live rows")
+
+    def flush():
+        if not block_docs:
+            return
+        stats.replaced += product_index.upsert([metadata_row(doc) for doc in block_docs], np.vstack(block_vectors))
+        for doc in block_docs:
+            cache_meta[doc.file_name] = doc.file_hash
+        stats.embedded += len(block_docs)
+        block_vectors.clear()
+        block_docs.clear()
+        stderr_log("INFO", f"Indexed {stats.embedded} documents ({stats.embedded / (time.perf_counter() - start):.1f} docs/sec)")
+
+    files = sorted(doc_path.glob("*.json"))
+    docs = parse_changed_documents(files, cache_meta, stats, workers=parse_workers, catalog=catalog)
+    for batch, vectors, error in embedder.map_batches(docs, lambda doc: doc.product.product_content):
+        if error is not None:
+            stats.failed += len(batch)
+            stderr_log("ERROR", f"Failed to embed batch of {len(batch)} documents: {error}")
+            continue
+        block_vectors.append(vectors)
+        block_docs.extend(batch)
+        if len(block_docs) >= add_block_size:
+            flush()
+            if stats.embedded - checkpointed_at >= checkpoint_every:
+                checkpoint()
+    flush()
+
+    # Files that disappeared since the last run
+    names = {file.name for file in files}
+    deleted = set(cache_meta) - names
+    if deleted:
+        stats.removed = product_index.remove_docs(deleted)
+        for name in deleted:
+            del cache_meta[name]
+    uncatalogued = sum(catalog.remove(name) for name in set(catalog.files) - names)
+
+    if index_spec and product_index.index is not None and index_kind(product_index.index) != index_spec.kind:
+        try:
+            dropped = product_index.dead_count
+            product_index.rebuild(index_spec)
+            stats.rebuilt, stats.compacted = True, dropped
+            stderr_log("INFO", f"Rebuilt product index as {index_spec.kind}")
+        except ValueError as e:
+            stderr_log("WARN", f"Keeping {index_kind(product_index.index)} index: {e}")
+
+    total = product_index.live_count + product_index.dead_count
+    if total and product_index.dead_count / total > compact_ratio:
+        stats.compacted = product_index.compact()
+    stats.seconds = time.perf_counter() - start
+
+    catalog_changed = (stats.profiled > catalog_saved_at or uncatalogued) and product_index.index is not None
+    if stats.embedded > checkpointed_at or stats.removed or stats.compacted or stats.rebuilt or catalog_changed:
+        checkpoint()
+        stderr_log("SUCCESS", f"Saved FAISS index and metadata: {stats.summary()}")
+    elif stats.checkpoints == 0:
+        stderr_log("WARN", "No new documents or updates to process.")
+    return stats
+
+
+def compact_product_index(index_dir: Path = INDEX_DIR) -> int:
+    """
+    Rebuild the saved product index without tombstoned vectors.
+
+    Returns:
+        int: Number of dead vectors dropped.
+    """
+    product_index = MutableProductIndex.load(index_dir)
+    dropped = product_index.compact()
+    if dropped:
+        product_index.save(index_dir, load_file_hashes(index_dir))
+    stderr_log("SUCCESS", f"Compacted product index: dropped {dropped} dead vectors, {product_index.live_count} live")
+    return dropped
+
+
+def rebuild_product_index(spec: IndexSpec, index_dir: Path = INDEX_DIR) -> None:
+    """
+    Rebuild the saved product index as another index type, e.g. to try IVF or HNSW settings.
+    """
+    product_index = MutableProductIndex.load(index_dir)
+    product_index.rebuild(spec)
+    product_index.save(index_dir, load_file_hashes(index_dir))
+    stderr_log("SUCCESS", f"Rebuilt product index as {spec.kind} with {product_index.live_count} vectors")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Product document ingestion")
+    parser.add_argument("command", choices=["ingest", "compact", "rebuild"], nargs="?", default="ingest")
+    parser.add_argument("--index-type", choices=["flat", "ivf", "hnsw", "ivfpq"],
+                        help="index type to build; by default ingestion keeps the type on disk")
+    parser.add_argument("--nlist", type=int, default=IndexSpec.nlist)
+    parser.add_argument("--hnsw-m", type=int, default=IndexSpec.hnsw_m)
+    parser.add_argument("--pq-m", type=int, default=IndexSpec.pq_m)
+    args = parser.parse_args()
+    spec = None
+    if args.index_type:
+        spec = IndexSpec(kind=args.index_type, nlist=args.nlist, hnsw_m=args.hnsw_m, pq_m=args.pq_m)
+    if args.command == "compact":
+        compact_product_index()
+    elif args.command == "rebuild":
+        rebuild_product_index(spec or IndexSpec())
+    else:
+        print(process_product_documents(parse_workers=os.cpu_count() or 1, index_spec=spec).summary())
@@ -1,11 +1,39 @@
+import argparse
 import json
 import os
 from pathlib import Path
-from collections import defaultdict
-from typing import Dict, Set, Any
+from collections import Counter, defaultdict
+from multiprocessing import Pool
+from typing import Dict, List, Optional, Set, Any, Tuple
 from pprint import pprint
 
+try:
+    # Streaming parser: huge files are analyzed event by event instead of fully loaded
+    import ijson
+except ImportError:
+    ijson = None
+
+# Fields whose value counts the schema catalog keeps (dotted paths inside "data")
+CATALOG_VALUE_FIELDS = ("brandName", "gender", "ageGroup", "baseColour", "season", "usage", "fashionType", "year",
+                        "masterCategory.typeName", "subCategory.typeName", "articleType.typeName")
+# Sample values longer than this are cut, e.g. HTML descriptions
+SAMPLE_LENGTH = 80
+# Sample values kept per key
+SAMPLES_PER_KEY = 5
+# Type names of the container events of a streaming parse
+_CONTAINER_EVENTS = {"start_map": {}, "start_array": []}
+
 class JsonStructureAnalyzer:
+    """
+    Discovers the keys, value types and sample values of product JSON files.
+
+    Partial results are mergeable (key and type sets are unioned, counts added, samples
+    topped up in first-seen order), so a directory is analyzed by splitting its files
+    into contiguous chunks across a process pool and merging the per-chunk analyzers in
+    file order, with the same result as one serial pass. Files are parsed as a stream of
+    events when ijson is installed, else loaded with json; a file that fails to parse
+    contributes nothing either way.
+    """
     def __init__(self):
         self.unique_keys = defaultdict(set)
         self.unique_nested_keys = {
@@ -16,26 +44,29 @@ class JsonStructureAnalyzer:
             'productDescriptors': set()
         }
         self.data_types = defaultdict(set)
-        self.value_samples = defaultdict(set)
+        # Sample values per key, as dict keys to keep first-seen order
+        self.value_samples = defaultdict(dict)
+        self.key_counts = Counter()
         self.total_files = 0
         self.processed_files = 0
         self.error_files = 0
 
     def analyze_value(self, key: str, value: Any):
         """Analyze the data type and sample values for a key"""
+        self.unique_keys[key].add(type(value).__name__)
         self.data_types[key].add(type(value).__name__)
+        self.key_counts[key] += 1
         
-        # Store sample values (limit to 5 samples per key)
-        if len(self.value_samples[key]) < 5:
+        # Store sample values (limit to SAMPLES_PER_KEY samples per key)
+        if len(self.value_samples[key]) < SAMPLES_PER_KEY:
             if isinstance(value, (str, int, float, bool)):
-                self.value_samples[key].add(str(value))
+                self.value_samples[key][str(value)] = None
 
     def analyze_nested_structure(self, data: Dict, parent_key: str = None):
         """Recursively analyze nested structure"""
         if isinstance(data, dict):
             for key, value in data.items():
                 full_key = f"{parent_key}.{key}" if parent_key else key
-                self.unique_keys[full_key].add(type(value).__name__)
                 
                 # Analyze specific nested structures we're interested in
                 if key in self.unique_nested_keys:
@@ -51,30 +82,97 @@ class JsonStructureAnalyzer:
             for item in data:
                 self.analyze_nested_structure(item, parent_key)
 
+    def analyze_stream(self, file) -> bool:
+        """
+        Analyze the "data" object of a binary JSON file from ijson parse events, with the
+        same result as analyze_nested_structure on the loaded object. Returns whether the
+        file has a "data" object.
+        """
+        found = False
+        for prefix, event, value in ijson.parse(file, use_float=True):
+            if prefix != "data" and not prefix.startswith("data."):
+                continue
+            found = True
+            if event == "map_key":
+                # prefix is the path of the map holding this key
+                if prefix.rsplit(".", 1)[-1] in self.unique_nested_keys:
+                    self.unique_nested_keys[prefix.rsplit(".", 1)[-1]].add(value)
+                continue
+            if prefix == "data" or event in ("end_map", "end_array"):
+                continue
+            segments = prefix[len("data."):].split(".")
+            # List elements have no key of their own; their keys belong to the list's key
+            if segments[-1] == "item":
+                continue
+            path = ".".join(segment for segment in segments if segment != "item")
+            self.analyze_value(path, _CONTAINER_EVENTS[event] if event in _CONTAINER_EVENTS else value)
+        return found
+
     def process_file(self, file_path: Path):
         """Process a single JSON file"""
+        # Accumulated separately and merged only once the whole file has parsed
+        partial = JsonStructureAnalyzer()
         try:
-            with open(file_path, 'r') as f:
-                data = json.load(f)
-                if "data" in data:
-                    self.analyze_nested_structure(data["data"])
-                    self.processed_files += 1
+            with open(file_path, 'rb') as f:
+                if ijson is not None:
+                    found = partial.analyze_stream(f)
+                else:
+                    data = json.load(f)
+                    found = "data" in data
+                    if found:
+                        partial.analyze_nested_structure(data["data"])
+            if found:
+                self.merge(partial)
+                self.processed_files += 1
         except Exception as e:
             print(f"Error processing {file_path}: {e}")
             self.error_files += 1
 
-    def analyze_directory(self, directory_path: str):
-        """Analyze all JSON files in the directory"""
+    def merge(self, other: "JsonStructureAnalyzer") -> "JsonStructureAnalyzer":
+        """
+        Fold the partial result of another analyzer into this one. Samples of `other` fill
+        the free sample slots in their first-seen order, so merging partials of
+        consecutive files in file order keeps the samples of a serial pass.
+        """
+        for key, types in other.unique_keys.items():
+            self.unique_keys[key] |= types
+        for category, keys in other.unique_nested_keys.items():
+            self.unique_nested_keys.setdefault(category, set()).update(keys)
+        for key, types in other.data_types.items():
+            self.data_types[key] |= types
+        for key, samples in other.value_samples.items():
+            mine = self.value_samples[key]
+            for sample in samples:
+                if len(mine) >= SAMPLES_PER_KEY:
+                    break
+                mine[sample] = None
+        self.key_counts.update(other.key_counts)
+        self.total_files += other.total_files
+        self.processed_files += other.processed_files
+        self.error_files += other.error_files
+        return self
+
+    def analyze_directory(self, directory_path: str, workers: int = 1, chunksize: int = 256):
+        """Analyze all JSON files in the directory, spread over `workers` processes"""
         directory = Path(directory_path)
-        json_files = list(directory.glob("*.json"))
-        self.total_files = len(json_files)
+        json_files = sorted(directory.glob("*.json"))
+        self.total_files += len(json_files)
         
-        print(f"Found {self.total_files} JSON files to process...")
+        print(f"Found {len(json_files)} JSON files to process...")
         
-        for i, file_path in enumerate(json_files, 1):
-            if i % 1000 == 0:
-                print(f"Processed {i}/{self.total_files} files...")
-            self.process_file(file_path)
+        if workers <= 1:
+            for i, file_path in enumerate(json_files, 1):
+                if i % 1000 == 0:
+                    print(f"Processed {i}/{len(json_files)} files...")
+                self.process_file(file_path)
+            return
+        chunks = [json_files[i:i + chunksize] for i in range(0, len(json_files), chunksize)]
+        done = 0
+        with Pool(processes=workers) as pool:
+            for partial in pool.imap(analyze_files, chunks):
+                self.merge(partial)
+                done += partial.processed_files + partial.error_files
+                print(f"Processed {done}/{len(json_files)} files...")
 
     def print_analysis(self):
         """Print the analysis results"""
@@ -102,14 +200,170 @@ class JsonStructureAnalyzer:
             if field in self.data_types:
                 print(f"\n{field}:")
                 print(f"Data types: {self.data_types[field]}")
-                print(f"Sample values: {self.value_samples[field]}")
+                print(f"Sample values: {set(self.value_samples[field])}")
+
+def analyze_files(paths: List[Path]) -> JsonStructureAnalyzer:
+    """Partial analysis of some files; runs in a worker process."""
+    analyzer = JsonStructureAnalyzer()
+    for path in paths:
+        analyzer.process_file(path)
+    return analyzer
+
+
+def lookup(data: Dict, path: str) -> Any:
+    """The value at a dotted path in nested dicts, or None."""
+    for key in path.split("."):
+        if not isinstance(data, dict):
+            return None
+        data = data.get(key)
+    return data
+
+
+def document_profile(data: Dict) -> Dict:
+    """
+    What one product document contributes to the schema catalog.
+
+    Args:
+        data (Dict): The "data" object of a product JSON file.
+
+    Returns:
+        Dict: "keys" (sorted "path:type" strings), "values" (CATALOG_VALUE_FIELDS present)
+        and "samples" (one sample value per scalar key path).
+    """
+    analyzer = JsonStructureAnalyzer()
+    analyzer.analyze_nested_structure(data)
+    values = {}
+    for field in CATALOG_VALUE_FIELDS:
+        value = lookup(data, field)
+        if value not in (None, ""):
+            values[field] = str(value)
+    return {
+        "keys": sorted(f"{key}:{type_name}" for key, types in analyzer.unique_keys.items() for type_name in types),
+        "values": values,
+        "samples": {key: min(samples)[:SAMPLE_LENGTH] for key, samples in analyzer.value_samples.items() if samples},
+    }
+
+
+class SchemaCatalog:
+    """
+    Schema and value catalog of the product documents, kept up to date incrementally.
+
+    For every file the catalog records its MD5, the set of key paths and types it
+    contains and the values of CATALOG_VALUE_FIELDS. Key sets are interned, so files
+    with the same structure share one entry. Ingestion re-profiles only changed files
+    (replacing their entry) and drops deleted ones, so the counts in `summary()` stay
+    exact without rescanning the directory. Sample values are illustrative: they are
+    collected as files arrive and not retracted.
+
+    Attributes:
+        keys (List[str]): Interned "path:type" strings.
+        structures (List[Tuple[int, ...]]): Interned key-id sets.
+        files (Dict[str, Tuple[str, int, Dict[str, str]]]): Per file: MD5, structure id, catalog values.
+        samples (Dict[str, List[str]]): Up to SAMPLES_PER_KEY sample values per key path.
+    """
+    def __init__(self, keys: Optional[List[str]] = None, structures: Optional[List[Tuple[int, ...]]] = None,
+                 files: Optional[Dict[str, Tuple[str, int, Dict[str, str]]]] = None,
+                 samples: Optional[Dict[str, List[str]]] = None):
+        self.keys = keys or []
+        self.structures = structures or []
+        self.files = files or {}
+        self.samples = samples or {}
+        self._key_ids = {key: i for i, key in enumerate(self.keys)}
+        self._structure_ids = {structure: i for i, structure in enumerate(self.structures)}
+
+    def file_hash(self, name: str) -> Optional[str]:
+        entry = self.files.get(name)
+        return entry[0] if entry else None
+
+    def _intern(self, table: List, ids: Dict, item) -> int:
+        if item not in ids:
+            ids[item] = len(table)
+            table.append(item)
+        return ids[item]
+
+    def update(self, name: str, file_hash: str, profile: Dict) -> None:
+        """Record (or replace) the profile of file `name`."""
+        structure = tuple(sorted(self._intern(self.keys, self._key_ids, key) for key in profile["keys"]))
+        self.files[name] = (file_hash, self._intern(self.structures, self._structure_ids, structure),
+                            dict(profile["values"]))
+        for key, sample in profile["samples"].items():
+            samples = self.samples.setdefault(key, [])
+            if len(samples) < SAMPLES_PER_KEY and sample not in samples:
+                samples.append(sample)
+
+    def remove(self, name: str) -> bool:
+        return self.files.pop(name, None) is not None
+
+    def summary(self, max_values: int = 50) -> Dict:
+        """
+        Aggregate view of the catalog.
+
+        Returns:
+            Dict: "files", "fields" (per key path: documents containing it, per-type
+            document counts and samples), "nested" (per nested category: attribute key ->
+            documents) and "values" (per CATALOG_VALUE_FIELDS: the max_values most
+            frequent values -> documents).
+        """
+        per_structure = Counter(entry[1] for entry in self.files.values())
+        type_counts: Dict[str, Counter] = defaultdict(Counter)
+        path_counts: Counter = Counter()
+        for structure_id, count in per_structure.items():
+            paths = set()
+            for key_id in self.structures[structure_id]:
+                path, type_name = self.keys[key_id].rsplit(":", 1)
+                type_counts[path][type_name] += count
+                paths.add(path)
+            for path in paths:
+                path_counts[path] += count
+        fields = {
+            path: {"documents": path_counts[path], "types": dict(type_counts[path]),
+                   "samples": self.samples.get(path, [])}
+            for path in sorted(path_counts)
+        }
+        nested = {category: {} for category in JsonStructureAnalyzer().unique_nested_keys}
+        for path in fields:
+            category, _, key = path.partition(".")
+            if category in nested and key and "." not in key:
+                nested[category][key] = path_counts[path]
+        values = {}
+        for field in CATALOG_VALUE_FIELDS:
+            counts = Counter(entry[2][field] for entry in self.files.values() if field in entry[2])
+            values[field] = dict(counts.most_common(max_values))
+        return {"files": len(self.files), "fields": fields, "nested": nested, "values": values}
+
+    def to_json(self) -> str:
+        # Structures no file uses any more are dropped and the rest renumbered
+        used = sorted({entry[1] for entry in self.files.values()})
+        renumber = {old: new for new, old in enumerate(used)}
+        return json.dumps({
+            "keys": self.keys,
+            "structures": [list(self.structures[i]) for i in used],
+            "files": {name: [file_hash, renumber[structure_id], values]
+                      for name, (file_hash, structure_id, values) in self.files.items()},
+            "samples": self.samples,
+        })
+
+    @classmethod
+    def load(cls, path: Path) -> "SchemaCatalog":
+        data = json.loads(Path(path).read_text())
+        return cls(
+            keys=data["keys"],
+            structures=[tuple(structure) for structure in data["structures"]],
+            files={name: (file_hash, structure_id, values)
+                   for name, (file_hash, structure_id, values) in data["files"].items()},
+            samples=data["samples"],
+        )
+
 
 def main():
+    parser = argparse.ArgumentParser(description="Analyze the structure of product JSON files")
+    parser.add_argument("directory", nargs="?", default=str(Path(__file__).parent / "documents"))
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
     analyzer = JsonStructureAnalyzer()
-    directory_path = "/Users/chiragtagadiya/Downloads/product_new/fashion-dataset/styles"
-    
+
     print("Starting JSON structure analysis...")
-    analyzer.analyze_directory(directory_path)
+    analyzer.analyze_directory(args.directory, workers=args.workers)
     analyzer.print_analysis()
 
 if __name__ == "__main__":
@@ -0,0 +1,148 @@
+import io
+import re
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN.findall(text.lower())
+
+
+def lexical_text(row: dict) -> str:
+    """
+    The text indexed for a metadata row: the product content plus exact-match fields that
+    are not part of it (article number, brand).
+    """
+    metadata = row.get("metadata") or {}
+    return " ".join([row.get("chunk", ""), str(metadata.get("articleNumber") or ""), str(metadata.get("brandName") or "")])
+
+
+class BM25Index:
+    """
+    Okapi BM25 inverted index over the live product rows.
+
+    Postings are stored column-wise (CSR): for term t, docs[offsets[t]:offsets[t+1]] are
+    the positions of the rows containing it and tfs the term frequencies. A query touches
+    only the postings of its own terms and scores them with vectorized NumPy, so the
+    lexical side is cheap enough to run on every search.
+
+    Attributes:
+        row_ids (np.ndarray): Row id per document position, ascending.
+        doc_len (np.ndarray): Token count per document.
+        vocab (np.ndarray): Sorted terms.
+        offsets (np.ndarray): Posting list boundaries per term (len(vocab) + 1).
+        docs (np.ndarray): Document positions, grouped by term.
+        tfs (np.ndarray): Term frequency per posting.
+    """
+
+    def __init__(self, row_ids: np.ndarray, doc_len: np.ndarray, vocab: np.ndarray, offsets: np.ndarray,
+                 docs: np.ndarray, tfs: np.ndarray, k1: float = 1.2, b: float = 0.75):
+        self.row_ids = row_ids
+        self.doc_len = doc_len
+        self.vocab = vocab
+        self.offsets = offsets
+        self.docs = docs
+        self.tfs = tfs
+        self.k1 = k1
+        self.b = b
+        self.avg_len = float(doc_len.mean()) if len(doc_len) else 0.0
+        # Per-document part of the BM25 denominator, precomputed once
+        self._norm = (k1 * (1.0 - b + b * doc_len / self.avg_len)).astype(np.float32) if len(doc_len) else doc_len
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[Tuple[int, dict]]) -> "BM25Index":
+        term_ids: Dict[str, int] = {}
+        row_ids, doc_len = [], []
+        doc_parts, term_parts, tf_parts = [], [], []
+        for position, (row_id, row) in enumerate(sorted(rows, key=lambda item: item[0])):
+            tokens = tokenize(lexical_text(row))
+            row_ids.append(row_id)
+            doc_len.append(len(tokens))
+            if not tokens:
+                continue
+            terms, counts = np.unique(
+                np.fromiter((term_ids.setdefault(t, len(term_ids)) for t in tokens), dtype=np.int32, count=len(tokens)),
+                return_counts=True,
+            )
+            doc_parts.append(np.full(len(terms), position, dtype=np.int32))
+            term_parts.append(terms)
+            tf_parts.append(counts.astype(np.float32))
+
+        # Renumber terms in sorted order so queries can binary-search the vocabulary
+        vocab = np.array(list(term_ids), dtype=str)
+        order = np.argsort(vocab)
+        rank = np.empty(len(order), dtype=np.int32)
+        rank[order] = np.arange(len(order), dtype=np.int32)
+        terms = rank[np.concatenate(term_parts)] if term_parts else np.zeros(0, dtype=np.int32)
+        docs = np.concatenate(doc_parts) if doc_parts else np.zeros(0, dtype=np.int32)
+        tfs = np.concatenate(tf_parts) if tf_parts else np.zeros(0, dtype=np.float32)
+        by_term = np.argsort(terms, kind="stable")
+        offsets = np.zeros(len(vocab) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(terms, minlength=len(vocab)), out=offsets[1:])
+        return cls(np.array(row_ids, dtype=np.int64), np.array(doc_len, dtype=np.float32), vocab[order],
+                   offsets, docs[by_term], tfs[by_term])
+
+    def to_bytes(self) -> bytes:
+        buffer = io.BytesIO()
+        np.savez(buffer, row_ids=self.row_ids, doc_len=self.doc_len, vocab=self.vocab,
+                 offsets=self.offsets, docs=self.docs, tfs=self.tfs)
+        return buffer.getvalue()
+
+    @classmethod
+    def load(cls, path: Path) -> "BM25Index":
+        with np.load(path, allow_pickle=False) as data:
+            return cls(data["row_ids"], data["doc_len"], data["vocab"], data["offsets"], data["docs"], data["tfs"])
+
+    def scores(self, query: str) -> np.ndarray:
+        """
+        BM25 score of every document position for `query` (zero where no term matches).
+        """
+        scores = np.zeros(len(self.row_ids), dtype=np.float32)
+        terms = np.unique(np.array(tokenize(query), dtype=str))
+        if not len(terms) or not len(self.vocab):
+            return scores
+        positions = np.searchsorted(self.vocab, terms)
+        found = positions < len(self.vocab)
+        found[found] = self.vocab[positions[found]] == terms[found]
+        n = len(self.row_ids)
+        positions = positions[found]
+        for t in positions:
+            start, stop = self.offsets[t], self.offsets[t + 1]
+            docs, tfs = self.docs[start:stop], self.tfs[start:stop]
+            idf = np.log(1.0 + (n - len(docs) + 0.5) / (len(docs) + 0.5))
+            scores[docs] += idf * tfs * (self.k1 + 1.0) / (tfs + self._norm[docs])
+        return scores
+
+    def search(self, query: str, top_k: int,
+               candidates: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Top documents for `query`, optionally restricted to the row ids in `candidates`.
+
+        Returns:
+            (row_ids, scores): Best first; only documents matching at least one term.
+        """
+        scores = self.scores(query)
+        if candidates is not None:
+            scores[~np.isin(self.row_ids, candidates)] = 0.0
+        matched = np.flatnonzero(scores > 0)
+        if len(matched) > top_k:
+            matched = matched[np.argpartition(-scores[matched], top_k - 1)[:top_k]]
+        matched = matched[np.argsort(-scores[matched], kind="stable")]
+        return self.row_ids[matched], scores[matched]
+
+
+def reciprocal_rank_fusion(rankings: List[List[int]], top_k: int, k: int = 60) -> List[Tuple[int, float]]:
+    """
+    Fuse several best-first id rankings: each id scores sum(1 / (k + rank)) over the
+    rankings it appears in. Returns the top_k (id, score) pairs, best first. Equal scores
+    keep the order of first appearance, so ties go to ids of the earlier rankings.
+    """
+    fused: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, item in enumerate(ranking, start=1):
+            fused[item] = fused.get(item, 0.0) + 1.0 / (k + rank)
+    return sorted(fused.items(), key=lambda pair: -pair[1])[:top_k]
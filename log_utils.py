@@ -3,6 +3,7 @@ from rich.console import Console
 from rich.panel import Panel
 from rich.text import Text
 from datetime import datetime
+import sys
 
 console = Console()
 
@@ -39,4 +40,12 @@ def log(stage: str, msg: str, level: str = "INFO"):
     elif level == "ERROR":
         console.print(panel, style="bold red")
     else:
-        console.print(panel)
\ No newline at end of file
+        console.print(panel)
+
+def stderr_log(level: str, message: str):
+    """
+    Log a plain message to stderr. Used by the MCP server side, where stdout carries
+    the JSON-RPC stream and rich panels would corrupt it.
+    """
+    sys.stderr.write(f"{level}: {message}\n")
+    sys.stderr.flush()
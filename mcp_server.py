@@ -3,46 +3,95 @@ from mcp.server.fastmcp.prompts import base
 from mcp.types import TextContent
 from mcp import types
 from PIL import Image as PILImage
-from typing import List
+from typing import List, Literal
 import math
 import sys
 import os
 import json
-import faiss
 import numpy as np
 from pathlib import Path
-import requests
-from markitdown import MarkItDown
 import time
 import logging
-from models import AddInput, AddOutput, SqrtInput, SqrtOutput, StringsToIntsInput, StringsToIntsOutput, ExpSumInput, ExpSumOutput, ProductChunkTyped, ProductMetadata, ProductResponse, ProductMetadataSubset
+from models import AddInput, AddOutput, SqrtInput, SqrtOutput, StringsToIntsInput, StringsToIntsOutput, ExpSumInput, ExpSumOutput, ProductResponse, ProductMetadataSubset, ProductSearchFilters, RerankOptions, ProductResultSet, ProductTable
+from index_store import IndexSnapshot, IndexSpec, ProductIndexStore
+from embeddings import BatchEmbedder, default_embedding_cache, embed_text
+from reranker import RERANK_MIN_CANDIDATES, RERANK_OVERFETCH, mmr_select, rerank_rows, rerank_scores
+from result_cache import QueryResultCache, ResultSetStore, SemanticQueryCache, check_indices, query_cache_key
+from result_views import project_rows, view_fields
+from search_scheduler import MicroBatcher
+import ingest
 from PIL import Image as PILImage
-from tqdm import tqdm
-import hashlib
 from pathlib import Path
-import re
 import asyncio
+import functools
+from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor
 
 mcp = FastMCP("Agent")
 
-## OLLAMA Embedding Model
-EMBED_URL = "http://localhost:11434/api/embeddings"
-EMBED_MODEL = "nomic-embed-text"
+## Embedding Model: EMBED_PROVIDER=ollama (default) or hashing for the in-process backend (see embeddings.py)
+# Ingestion embeds this many documents per request, with this many requests in flight
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "32"))
+EMBED_CONCURRENCY = int(os.getenv("EMBED_CONCURRENCY", "4"))
+# Processes used to parse product JSON files during ingestion
+PARSE_WORKERS = int(os.getenv("PARSE_WORKERS", str(os.cpu_count() or 1)))
+# Index type built by ingestion (flat, ivf, hnsw, ivfpq); unset keeps the type already on disk
+PRODUCT_INDEX_TYPE = os.getenv("PRODUCT_INDEX_TYPE")
+INDEX_SPEC = IndexSpec(
+    kind=PRODUCT_INDEX_TYPE,
+    nlist=int(os.getenv("PRODUCT_INDEX_NLIST", str(IndexSpec.nlist))),
+    hnsw_m=int(os.getenv("PRODUCT_INDEX_HNSW_M", str(IndexSpec.hnsw_m))),
+) if PRODUCT_INDEX_TYPE else None
 ROOT = Path(__file__).parent.resolve()
 
+# Process-wide product index, loaded once and hot-reloaded when ingestion rewrites it.
+# PRODUCT_INDEX_MMAP=1 maps it read-only so server processes on one host share its pages.
+PRODUCT_INDEX = ProductIndexStore(ROOT / "faiss_index", mmap=os.getenv("PRODUCT_INDEX_MMAP", "0") == "1")
+# Async tools run FAISS search and result hydration on this pool; FAISS releases the GIL while searching
+SEARCH_POOL = ThreadPoolExecutor(max_workers=int(os.getenv("SEARCH_THREADS", str(os.cpu_count() or 4))),
+                                 thread_name_prefix="search")
+# Concurrent searches arriving within SEARCH_BATCH_WINDOW_MS (up to SEARCH_BATCH_MAX) are served together
+SEARCH_BATCHER = MicroBatcher(
+    lambda group, requests: run_search_batch(group, requests),
+    window=float(os.getenv("SEARCH_BATCH_WINDOW_MS", "2")) / 1000.0,
+    max_batch=int(os.getenv("SEARCH_BATCH_MAX", "32")),
+)
+# Finished search results, keyed by normalized query and options; dropped when the index version changes
+QUERY_CACHE = QueryResultCache(
+    max_entries=int(os.getenv("QUERY_CACHE_SIZE", "1024")),
+    ttl=float(os.getenv("QUERY_CACHE_TTL", "300")),
+)
+# Second tier: results of earlier queries whose embedding is within a cosine threshold (paraphrases)
+SEMANTIC_CACHE = SemanticQueryCache(
+    threshold=float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.95")),
+    max_entries=int(os.getenv("SEMANTIC_CACHE_SIZE", "512")),
+    verify_rate=float(os.getenv("SEMANTIC_CACHE_VERIFY_RATE", "0.05")),
+)
+# Search results handed out by handle, so follow-up tools receive a handle and indices instead of product lists
+RESULT_SETS = ResultSetStore(
+    max_entries=int(os.getenv("RESULT_SET_STORE_SIZE", "256")),
+    ttl=float(os.getenv("RESULT_SET_TTL", "1800")),
+)
+
 def get_embeddings(text: str)-> np.ndarray:
     """
-    Get the embeddings for a text using the  Embedding Model
+    Get the embeddings for a text using the  Embedding Model.
+    Texts embedded before (by search, ingestion or agent memory) come from the shared embedding cache.
     """
-    response = requests.post(
-        url=EMBED_URL,
-        json={
-            "model": EMBED_MODEL,
-            "prompt": text
-        }
-    )
-    response.raise_for_status()
-    return np.array(response.json()["embedding"], dtype=np.float32)
+    return embed_text(text, cache=default_embedding_cache())
+
+def get_embeddings_batch(texts: list[str])-> np.ndarray:
+    """
+    Get the embeddings for many texts at once: cached texts are skipped and the rest are
+    embedded in one batch. Returns a (len(texts), dim) matrix.
+    """
+    return BatchEmbedder(cache=default_embedding_cache()).embed(texts)
+
+async def get_embeddings_batch_async(texts: list[str])-> np.ndarray:
+    """
+    Async get_embeddings_batch: awaits the embedding server on a pooled connection instead of blocking the event loop.
+    """
+    return await BatchEmbedder(cache=default_embedding_cache()).aembed(texts)
     
 def mcp_log(level: str, message: str) -> None:
     """
@@ -78,11 +127,14 @@ from typing import List
 
 
 @mcp.tool()
-def preety_print_product_metadata_response(product_response_list: List[ProductResponse] | str | List[str]) -> str:
+def preety_print_product_metadata_response(product_response_list: List[ProductResponse] | str | List[str] | None = None,
+                                           handle: str | None = None, indices: List[int] | None = None) -> str:
     """
     Pretty print a list of ProductResponse objects' metadata
     Args:
         product_response_list: Either a List[ProductResponse], a JSON string, or a list of JSON strings
+        handle: Result handle from search_product_documents, used instead of product_response_list
+        indices: With handle, the products to print, in order (default: all)
     Returns:
         str: Formatted string of product metadata
     """
@@ -90,7 +142,9 @@ def preety_print_product_metadata_response(product_response_list: List[ProductRe
         responses = []
         
         # Handle different input types
-        if isinstance(product_response_list, str):
+        if handle is not None:
+            responses.extend(RESULT_SETS.get(handle, indices))
+        elif isinstance(product_response_list, str):
             # Single JSON string - Fix escaping before parsing
             try:
                 # First try direct JSON parsing
@@ -139,33 +193,41 @@ def preety_print_product_metadata_response(product_response_list: List[ProductRe
         # Join with newlines instead of spaces to better separate products
         return "\n\n".join(formatted_responses)
     except Exception as e:
-        return f"Error formatting product response: {str(e)}\nInput: {product_response_list[:200]}..."
+        return f"Error formatting product response: {str(e)}\nInput: {(product_response_list or handle or '')[:200]}..."
 
 @mcp.tool()
 def return_ranked_product_response_from_ranked_index(
-    product_responses: List[ProductResponse], 
-    ranked_indices: List[int]
-) -> List[ProductResponse]:
+    product_responses: List[ProductResponse] | None = None,
+    ranked_indices: List[int] | None = None,
+    handle: str | None = None,
+) -> ProductResultSet:
     """
     Reorders a list of ProductResponse objects based on a provided ranking of indices.
 
     This function is used when a model (e.g., an LLM or retrieval system) provides a ranked list 
     of indices indicating the relevance or order of product responses based on a user query.
     The function maps those indices back to the original list of `ProductResponse` objects and 
-    returns them in the ranked order.
+    returns them in the ranked order, under a new handle.
 
     Args:
         product_responses (List[ProductResponse]): The original list of product responses.
         ranked_indices (List[int]): A list of indices representing the new ranked order.
+        handle (str): Result handle from search_product_documents, used instead of product_responses.
 
     Returns:
-        List[ProductResponse]: A reordered list of product responses based on the ranked indices.
+        ProductResultSet: The reordered product responses and their handle.
 
     Example:
-        If `product_responses = [A, B, C]` and `ranked_indices = [2, 0]`, 
-        the returned result will be `[C, A]`.
+        If the handle holds `[A, B, C]` and `ranked_indices = [2, 0]`, 
+        the returned products will be `[C, A]`.
     """
-    return [product_responses[i] for i in ranked_indices]
+    if handle is not None:
+        ranked = RESULT_SETS.get(handle, ranked_indices)
+    else:
+        product_responses = product_responses or []
+        ranked = ([product_responses[i] for i in check_indices(ranked_indices)] if ranked_indices is not None
+                  else product_responses)
+    return ProductResultSet(handle=RESULT_SETS.put(ranked), products=ranked)
 
 
 @mcp.tool()
@@ -193,11 +255,35 @@ def product_metadata_analysis_for_refine_or_tuning_search_result()-> dict:
         - article_type = T-shirt
         - usage = Casual
 
+    For the actual values and their counts (to choose filters), use product_facets.
+
     Returns:
         dict: A dictionary with keys representing attribute groups (e.g., article_attributes, metadata)
-              and values as lists of relevant attribute names.
+              and values as lists of relevant attribute names. With a schema catalog from ingestion,
+              also "values": the most frequent values of brandName, gender, usage, season, article type, etc.
     """
-    
+    try:
+        snapshot = PRODUCT_INDEX.get()
+        summary = snapshot.catalog() if snapshot is not None else None
+    except Exception as e:
+        mcp_log("WARN", f"Failed to load the schema catalog: {e}")
+        summary = None
+    if summary is not None:
+        # Built at ingest from the documents themselves, so it follows the catalog as it changes
+        nested = summary["nested"]
+        return {
+            "article_attributes": sorted(nested["articleAttributes"]),
+            "master_category": sorted(nested["masterCategory"]),
+            "sub_category": sorted(nested["subCategory"]),
+            "article_type": sorted(nested["articleType"]),
+            "product_descriptors": sorted(nested["productDescriptors"]),
+            "metadata": [path for path, field in summary["fields"].items()
+                         if "." not in path and not set(field["types"]) & {"dict", "list"}],
+            "values": summary["values"],
+            "documents": summary["files"],
+        }
+
+    # Checkpoints without a schema catalog: attribute names from an earlier json_analyzer run
     article_attributes = ['Add-Ons', 'Ankle Height', 'Arch Type', 'Assorted', 'Back', 'Base Metal', 'Belt Width', 'Blouse', 'Blouse Fabric', 'Body or Garment Size', 'Border', 'Bottom Closure', 'Bottom Fabric', 'Bottom Pattern', 'Bottom Type', 'Brand', 'Brand Fit Name', 'Brick', 'Business Unit', 'Case', 'Character', 'Class', 'Cleats', 'Closure', 'Coin Pocket Type', 'Collar', 'Colour Family', 'Colour Hex Code', 'Colour Shade Name', 'Compartment Closure', 'Concern', 'Content', 'Coverage', 'Cuff', 'Cushioning', 'Design', 'Design Styling', 'Dial Colour', 'Dial Material', 'Dial Pattern', 'Dial Shape', 'Display', 'Distance', 'Distress', 'Dupatta', 'Dupatta Border', 'Dupatta Fabric', 'Dupatta Pattern', 'Effects', 'External Pocket', 'Fabric', 'Fabric 2', 'Fabric 3', 'Fabric Purity', 'Fabric Type', 'Face Shape', 'Fade', 'Family', 'Fastening', 'Fastening and Back Detail', 'Feature', 'Features', 'Features 2', 'Features 3', 'Fine Jewellery', 'Finish', 'Fit', 'Flap Type', 'Fly Type', 'Formulation', 'Fragrance', 'Frame Colour', 'Frame Material', 'Handles', 'Haul Loop Type', 'Heel Height', 'Heel Type', 'Hemline', 'Hood', 'Insole', 'Knit or Woven', 'Laptop Compartment', 'Laptop Size', 'Length', 'Lens Colour', 'Lining', 'Lining Fabric', 'Main Trend', 'Make', 'Material', 'Micro Trend', 'Minimum Shelf Life in Months', 'Minimum Usable Period in Months', 'Model Name', 'Movement', 'Multipack Set', 'Neck', 'Needle', 'Number of Card Holders', 'Number of Compartments', 'Number of Components', 'Number of Contents', 'Number of External Pockets', 'Number of ID Card Holder', 'Number of Inner Pockets', 'Number of Main Compartments', 'Number of Mobile Pouch', 'Number of Panels', 'Number of Pockets', 'Number of Slip Pockets', 'Number of Zips', 'Occasion', 'Ornamentation', 'Outsole Type', 'Padded Shoulder Strap', 'Padding', 'Pattern', 'Pattern Coverage', 'Placket', 'Placket Length', 'Plating', 'Player Type', 'Players', 'Pocket', 'Pocket Type', 'Power Source', 'Print or Pattern Type', 'Processing Time', 'Pronation for Running Shoes', 'Reversible', 'Running Type', 'SPF', 'Saree Fabric', 'Scratch Resistance', 'Seam', 'Segment', 'Set Size', 'Shade', 'Shape', 'Shoe Width', 'Shoulder Strap Type', 'Side Pockets', 'Size', 'Skin Tone', 'Skin Type', 'Sleeve Length', 'Sleeve Styling', 'Sling Strap', 'Slit Detail', 'Sole Material', 'Sport', 'Sport Team', 'Sports Bra Support', 'Stitch', 'Stone Type', 'Strap', 'Strap Closure', 'Strap Colour', 'Strap Material', 'Strap Style', 'Strap Type', 'Straps', 'Strength', 'Stretch', 'Stretchable', 'Style', 'Sub Trend', 'Surface Styling', 'Surface Type', 'Tablet Sleeve', 'Technique', 'Technology', 'Toe Shape', 'Top Design Styling', 'Top Fabric', 'Top Hemline', 'Top Length', 'Top Pattern', 'Top Shape', 'Top Type', 'Total Shelf Life in Months', 'Transparency', 'Trends', 'Type', 'Type of Distress', 'Type of Pleat', 'Units Per Bundle', 'Volume', 'Volume in Litres', 'Waist Rise', 'Waistband', 'Warranty', 'Wash Care', 'Water Resistance', 'Weave Pattern', 'Weave Type', 'Wiring', 'taxMaterial']
     # in master_category typeName is important field is typeName e.g Apparel,Accessories, Footwear, Accessories
     master_category = ['typeName']
@@ -216,6 +302,49 @@ def product_metadata_analysis_for_refine_or_tuning_search_result()-> dict:
         "metadata": metadata
     }
     
+@mcp.tool()
+async def product_facets(handle: str | None = None, filters: ProductSearchFilters | None = None, limit: int = 10,
+                         price_buckets: list[float] | None = None) -> dict:
+    """
+    Value counts of brandName, gender, usage, season, article_type and baseColour, and
+    product counts per price bucket, to pick filters from real values instead of guessing.
+    Counts the products of a search result handle, the catalog products matching filters,
+    both (intersection), or the whole catalog when neither is given. Values are lower-case
+    and can be passed to filters as they are.
+
+    @param handle: str, optional. Result handle from search_product_documents
+    @param filters: ProductSearchFilters, optional. e.g. filters.article_type=["Tshirts"], filters.max_price=1000
+    @param limit: int, most frequent values per field
+    @param price_buckets: list[float], optional. Ascending upper bounds of the price buckets
+    @return dict: {"total": n, "brandName": {"nike": 12, ...}, ..., "price": {"0-500": 3, ...}}
+    """
+    mcp_log("FACETS", f"handle: {handle} filters: {filters}")
+    try:
+        snapshot = await in_search_pool(product_snapshot)
+        if snapshot is None:
+            return {"total": 0}
+        product_ids = [product.id for product in RESULT_SETS.get(handle)] if handle is not None else None
+        filter_values = filters.model_dump(exclude_none=True) if filters else {}
+        return await in_search_pool(facet_counts, snapshot, product_ids, filter_values, limit, price_buckets)
+    except Exception as e:
+        mcp_log("ERROR", f"Failed to compute product facets: {e}")
+        return {"error": str(e)}
+
+
+def facet_counts(snapshot, product_ids: list[int] | None, filter_values: dict, limit: int,
+                 price_buckets: list[float] | None) -> dict:
+    """
+    Facet counts from the snapshot's columnar arrays, over the rows matching `filter_values`
+    and, if given, holding one of `product_ids`.
+    """
+    columns = snapshot.columns()
+    mask = columns.mask(filter_values)
+    if product_ids is not None:
+        mask &= np.isin(columns.product_ids, product_ids)
+    if price_buckets:
+        return columns.facets(mask, limit, price_buckets)
+    return columns.facets(mask, limit)
+
 @mcp.tool()
 def add(input: AddInput) -> AddOutput:
     """
@@ -353,6 +482,18 @@ def fibonacci_numbers(n: int) -> list:
         fib_sequence.append(fib_sequence[-1] + fib_sequence[-2])
     return fib_sequence[:n]
 
+@mcp.tool()
+def embedding_cache_stats() -> dict:
+    """Return hit/miss counters and sizes of the embedding cache"""
+    mcp_log("CALLED", "embedding_cache_stats() -> dict")
+    return default_embedding_cache().stats()
+
+@mcp.tool()
+def query_cache_stats() -> dict:
+    """Return hit/miss counters of the exact and semantic search result caches, search batching and result handle stats"""
+    mcp_log("CALLED", "query_cache_stats() -> dict")
+    return {"exact": QUERY_CACHE.stats(), "semantic": SEMANTIC_CACHE.stats(), "batching": SEARCH_BATCHER.stats(),
+            "result_sets": RESULT_SETS.stats()}
 
 
 # DEFINE AVAILABLE PROMPTS
@@ -371,60 +512,243 @@ def debug_error(error: str) -> list[base.Message]:
     ]
 
 @mcp.tool()
-def search_product_documents(query: str, top_k: int = 5)-> list[ProductResponse]:
+async def search_product_documents(query: str, top_k: int = 5, nprobe: int | None = None, ef_search: int | None = None,
+                             filters: ProductSearchFilters | None = None, mode: Literal["vector", "hybrid"] = "vector",
+                             rerank: RerankOptions | None = None, diversity: float | None = None, view: str = "full",
+                             fields: list[str] | None = None,
+                             compact: bool = False)-> ProductResultSet | ProductTable | dict:
     """
     Based on the query, search for relevant products from the product documents.
-    Return the top_k products.
+    Return the top_k products and a handle to them. Pass the handle (with indices) to
+    return_ranked_product_response_from_ranked_index or preety_print_product_metadata_response
+    instead of copying the products.
+    With filters, only products matching them are searched, so all top_k results match
+    (e.g. filters.brandName=["Nike"], filters.gender=["Men"], filters.max_price=100).
 
     @param query: str
     @param top_k: int
-    @return list[ProductResponse]
-    """
-    ensure_faiss_ready()
-    mcp_log("SEARCH", f"Query: {query}")
+    @param nprobe: int, optional. IVF indexes only: lists probed, higher is slower but more accurate
+    @param ef_search: int, optional. HNSW indexes only: search depth, higher is slower but more accurate
+    @param filters: ProductSearchFilters, optional. brandName, gender, usage, season, article_type, baseColour, min_price, max_price
+    @param mode: "vector" (default) or "hybrid". Hybrid also matches exact words such as brand names,
+        article numbers or "Water Bottle" (BM25) and fuses both rankings
+    @param rerank: RerankOptions, optional. Rerank more candidates on the server by similarity, matches of
+        the query entities (brand, gender, article type), preferred price range and rating, e.g.
+        rerank.entities=["Nike", "Men", "T-shirt"], rerank.max_price=100. Products above rerank.max_price
+        are excluded; rerank.min_price is a soft preference
+    @param diversity: float, optional, 0-1. Pick the top_k from more candidates by maximal marginal relevance,
+        so near-identical variants of one product do not fill the results. 0 keeps the relevance order; higher
+        values skip products similar to those already picked for less relevant ones, trading relevance for
+        variety at diversity : (1 - diversity), one for one at 0.5. 0.7 is a good start
+    @param view: str, "full" (default, whole ProductResponse objects), "summary" (id, name, brand, gender,
+        article type, prices, rating, colour, usage) or "ids". Other views return a table: columns and one row per product
+    @param fields: list[str], optional. Exact fields for the table instead of a view, e.g. ["id", "price",
+        "brandName", "article_type.typeName", "article_attributes.Fabric"]
+    @param compact: bool, leave null fields out of the result
+    @return ProductResultSet (handle and products) or ProductTable (handle, columns, rows)
+    @raises ValueError: unknown view or field
+    """
+    mcp_log("SEARCH", f"Query: {query} filters: {filters} mode: {mode} rerank: {rerank}")
+    # Checked before searching, so a bad view or field is an error rather than an empty result
+    columns = view_fields(view, fields)
     try:
-        index = faiss.read_index(str(ROOT / "faiss_index" / "index.bin"))
-        metadata_list = json.loads((ROOT / "faiss_index" / "metadata.json").read_text())
-        query_embedding = get_embeddings(query)
-        # Reshape query embedding to 2D array as required by faiss
-        query_embedding = query_embedding.reshape(1, -1)
-        # Search returns (D, I) where D is distances and I is indices
-        D, I = index.search(query_embedding, k=top_k)
-        print(f"Distances: {D}, Indices: {I}")
-        
-        results = []
-        for idx in I[0]:  # I[0] because I is a 2D array
-            if idx < len(metadata_list):  # Ensure index is valid
-                data = metadata_list[idx]
-                try:
-                    # First, properly format the metadata string for JSON parsing
-                    metadata_str = data["metadata"]
-                    # Replace single quotes with double quotes, but handle nested quotes properly
-                    metadata_str = re.sub(r"'(.*?)'", r'"\1"', metadata_str)
-                    # Parse the metadata JSON
-                    metadata_dict = json.loads(metadata_str)  
-                    product_chunk = ProductChunkTyped(
-                        id=data["product_id"],
-                        product_content=data["chunk"],
-                        metadata=ProductMetadata(**metadata_dict)
-                    )
-                    
-                    results.append(ProductResponse.from_product_chunk(product_chunk))
-                    # for result in results:
-                    #     print(result.model_dump_json(indent=2))
-                    #     print("--------------------------------")
-                except json.JSONDecodeError as je:
-                    mcp_log("ERROR", f"JSON decode error for metadata: {str(je)}\nMetadata string: {metadata_str}")
-                    continue
-                except Exception as e:
-                    mcp_log("ERROR", f"Error processing product chunk: {str(e)}")
-                    continue
-        
-        return results
+        snapshot = await in_search_pool(product_snapshot)
+        if snapshot is None:
+            return ProductResultSet()
+        filter_values = filters.model_dump(exclude_none=True) if filters else None
+        cache_key = query_cache_key(query, top_k, filter_values, nprobe=nprobe, ef_search=ef_search, mode=mode,
+                                    rerank=rerank.model_dump_json() if rerank else None, diversity=diversity)
+        products = QUERY_CACHE.get(cache_key, snapshot.version)
+        if products is None:
+            # Concurrent searches with the same options are coalesced into one embedding request and one index search
+            request = SearchRequest(query=query, snapshot=snapshot, top_k=top_k, mode=mode, cache_key=cache_key,
+                                    options={"nprobe": nprobe, "ef_search": ef_search, "filters": filter_values, "rerank": rerank,
+                                             "diversity": diversity})
+            products = await SEARCH_BATCHER.submit((snapshot.version, cache_key[1:]), request)
+        return present_results(products, columns, compact)
             
     except Exception as e:
         mcp_log("ERROR", f"Failed to search product documents: {e}")
+        return ProductResultSet()
+
+
+@mcp.tool()
+async def search_product_documents_batch(queries: list[str], top_k: int = 5, nprobe: int | None = None,
+                                   ef_search: int | None = None, filters: ProductSearchFilters | None = None,
+                                   mode: Literal["vector", "hybrid"] = "vector", rerank: RerankOptions | None = None,
+                                   diversity: float | None = None, view: str = "full", fields: list[str] | None = None,
+                                   compact: bool = False)-> list[ProductResultSet | ProductTable | dict]:
+    """
+    Search for many queries in one call, e.g. several rewrites of a user query.
+    All queries are embedded in one batch and searched with a single multi-row index search.
+    Returns one result set (handle and top_k products) per query, in query order.
+
+    @param queries: list[str]
+    @param top_k, nprobe, ef_search, filters, mode, rerank, diversity, view, fields, compact: as in search_product_documents, applied to every query
+    @return list[ProductResultSet | ProductTable]
+    @raises ValueError: unknown view or field
+    """
+    mcp_log("SEARCH", f"Batch of {len(queries)} queries filters: {filters} mode: {mode}")
+    columns = view_fields(view, fields)
+    if not queries:
         return []
+    try:
+        snapshot = await in_search_pool(product_snapshot)
+        if snapshot is None:
+            return [ProductResultSet() for _ in queries]
+        filter_values = filters.model_dump(exclude_none=True) if filters else None
+        cache_keys = [query_cache_key(query, top_k, filter_values, nprobe=nprobe, ef_search=ef_search, mode=mode,
+                                      rerank=rerank.model_dump_json() if rerank else None, diversity=diversity)
+                      for query in queries]
+        results = [QUERY_CACHE.get(key, snapshot.version) for key in cache_keys]
+        # Only the queries not answered from the cache are embedded and searched
+        missing = [i for i, result in enumerate(results) if result is None]
+        if missing:
+            missing_queries = [queries[i] for i in missing]
+            searched = await in_search_pool(search_and_hydrate, snapshot, await get_embeddings_batch_async(missing_queries),
+                                            top_k, nprobe=nprobe, ef_search=ef_search, filters=filter_values,
+                                            rerank=rerank, diversity=diversity, query_texts=missing_queries if mode == "hybrid" else None)
+            for i, responses in zip(missing, searched):
+                results[i] = responses
+                QUERY_CACHE.put(cache_keys[i], snapshot.version, responses)
+        return [present_results(products, columns, compact) for products in results]
+    except Exception as e:
+        mcp_log("ERROR", f"Failed to batch search product documents: {e}")
+        return [ProductResultSet() for _ in queries]
+
+
+@dataclass
+class SearchRequest:
+    """
+    One search_product_documents call waiting in SEARCH_BATCHER.
+    """
+    query: str
+    snapshot: IndexSnapshot
+    top_k: int
+    mode: Literal["vector", "hybrid"]
+    cache_key: tuple
+    options: dict
+
+
+async def run_search_batch(group, requests: list[SearchRequest]) -> list[list[ProductResponse]]:
+    """
+    Serve a batch of searches that share a snapshot and options: embed all queries in one
+    request, answer paraphrases from the semantic cache, and search the rest with one
+    multi-row index search.
+    """
+    first = requests[0]
+    hybrid = first.mode == "hybrid"
+    # Reshape query embeddings to a 2D array as required by faiss
+    embeddings = (await get_embeddings_batch_async([r.query for r in requests])).reshape(len(requests), -1)
+    results: list = [None] * len(requests)
+    sampled = {}
+    # The semantic tier matches on everything but the query text; hybrid results depend on the exact words
+    if not hybrid:
+        for i, request in enumerate(requests):
+            cached, verify = SEMANTIC_CACHE.lookup(embeddings[i:i + 1], request.cache_key[1:], request.snapshot.version)
+            if cached is not None and verify:
+                sampled[i] = cached
+            elif cached is not None:
+                results[i] = cached
+    todo = [i for i, result in enumerate(results) if result is None]
+    if todo:
+        # Searches live rows only; replaced/removed products are tombstoned
+        searched = await in_search_pool(search_and_hydrate, first.snapshot, embeddings[todo], first.top_k,
+                                        query_texts=[requests[i].query for i in todo] if hybrid else None,
+                                        **first.options)
+        for i, responses in zip(todo, searched):
+            request = requests[i]
+            results[i] = responses
+            if i in sampled:
+                # A sampled semantic hit: check it against the real search for the false-hit rate
+                SEMANTIC_CACHE.record_verification([r.id for r in sampled[i]] != [r.id for r in responses])
+            elif not hybrid:
+                SEMANTIC_CACHE.put(embeddings[i:i + 1], request.cache_key[1:], request.snapshot.version, responses)
+            QUERY_CACHE.put(request.cache_key, request.snapshot.version, responses)
+    return results
+
+
+async def in_search_pool(fn, *args, **kwargs):
+    """
+    Run blocking index work (FAISS search, metadata reads, hydration) on SEARCH_POOL so
+    the event loop keeps serving other sessions meanwhile.
+    """
+    return await asyncio.get_running_loop().run_in_executor(SEARCH_POOL, functools.partial(fn, *args, **kwargs))
+
+
+def search_and_hydrate(snapshot, query_vectors: np.ndarray, top_k: int, rerank: RerankOptions | None = None,
+                       diversity: float | None = None, **options) -> list[list[ProductResponse]]:
+    """
+    Search `snapshot` and turn each query's hit rows into ProductResponse objects.
+    With `rerank` or `diversity`, more candidates are fetched and cut down to top_k before
+    hydration: by rerank score, or by MMR over the candidates' stored vectors, with the
+    rerank score (else the search score) as relevance. rerank.max_price is searched as a
+    filter, so products above it are excluded rather than scored down.
+    """
+    if rerank and rerank.max_price is not None:
+        filters = dict(options.get("filters") or {})
+        filters["max_price"] = min(filters.get("max_price", rerank.max_price), rerank.max_price)
+        options = {**options, "filters": filters}
+    fetch_k = max(top_k * RERANK_OVERFETCH, RERANK_MIN_CANDIDATES) if rerank or diversity else top_k
+    D, hits = snapshot.search(query_vectors, fetch_k, **options)
+    hybrid = options.get("query_texts") is not None
+    if diversity:
+        selected = []
+        for rows in hits:
+            if rerank:
+                relevance = rerank_scores(rows, higher_is_better=hybrid, **rerank.model_dump())
+            else:
+                relevance = np.array([row["distance"] for row in rows]) * (1.0 if hybrid else -1.0)
+            vectors = snapshot.vectors([row["row_id"] for row in rows]) if rows else np.zeros((0, 1))
+            selected.append([rows[i] for i in mmr_select(vectors, relevance, top_k, diversity)])
+        hits = selected
+    elif rerank:
+        hits = [rerank_rows(rows, top_k, higher_is_better=hybrid, **rerank.model_dump()) for rows in hits]
+    return [product_responses(rows) for rows in hits]
+
+
+def present_results(products: list[ProductResponse], columns: list[str] | None = None,
+                    compact: bool = False) -> ProductResultSet | ProductTable | dict:
+    """
+    Store one query's products under a new handle and shape them for the caller: full
+    ProductResponse objects, or a ProductTable of `columns` (from view_fields). The handle
+    always refers to the full products. compact=True returns the same as a plain dict without
+    null fields, which the tool response encodes once, also inside a batch's list.
+    """
+    handle = RESULT_SETS.put(products)
+    if columns is None:
+        result = ProductResultSet(handle=handle, products=products)
+    else:
+        result = ProductTable(handle=handle, columns=columns, rows=project_rows(products, columns))
+    return result.model_dump(mode="json", exclude_none=True) if compact else result
+
+
+def product_snapshot():
+    """
+    The current product index snapshot, building the index first if there is none yet.
+    """
+    snapshot = PRODUCT_INDEX.get()
+    if snapshot is None:
+        ensure_faiss_ready()
+        snapshot = PRODUCT_INDEX.reload(force=True)
+    if snapshot is None:
+        mcp_log("WARN", "Product index is not available")
+    return snapshot
+
+
+def product_responses(rows: list[dict]) -> list[ProductResponse]:
+    """
+    ProductResponse objects for the hit rows of one query.
+    """
+    results = []
+    for data in rows:
+        try:
+            # The response fields were built once at ingest time; no re-parsing of the chunk text
+            results.append(ProductResponse.from_row(data))
+        except Exception as e:
+            mcp_log("ERROR", f"Error processing product chunk: {str(e)}")
+            continue
+    return results
     
       
 def process_product_documents():
@@ -432,79 +756,29 @@ def process_product_documents():
     Process the product documents, Parse in proper format compiled into pydantic model ProductChunkTyped,
     Index using Faiss and save to disk.
     Maintain a hash of the processed documents to avoid reprocessing unless necessary.
-    Maintain a hash of the index to avoid reindexing unless necessary.
-    Maintain metadata 
-    """
-    mcp_log("INFO", "Indexing documents with MarkItDown...")
-    ROOT = Path(__file__).parent.resolve()
-    DOC_PATH = ROOT / "documents"
-    INDEX_CACHE = ROOT / "faiss_index"
-    INDEX_CACHE.mkdir(exist_ok=True)
-    INDEX_FILE = INDEX_CACHE / "index.bin"
-    METADATA_FILE = INDEX_CACHE / "metadata.json"
-    CACHE_FILE = INDEX_CACHE / "product_index_cache.json"
-
-    def file_md5_hash(path):
-        return hashlib.md5(Path(path).read_bytes()).hexdigest()
-    
-    CACHE_META = json.loads(CACHE_FILE.read_text()) if CACHE_FILE.exists() else {}
-    metadata_list = json.loads(METADATA_FILE.read_text()) if METADATA_FILE.exists() else []
-    index = faiss.read_index(str(INDEX_FILE)) if INDEX_FILE.exists() else None
-    # all_embeddings = []
-    converter= MarkItDown()
-    
-    for i, file in enumerate(DOC_PATH.glob("*.json")):
-        mcp_log("INFO", f"Processing file {i+1} : {file.name}...")
-        f_md_hash = file_md5_hash(file)
-        if file.name in CACHE_META and CACHE_META[file.name] == f_md_hash:
-            mcp_log("INFO", f"Skipping {file.name} - already processed.")
-            continue
-        try:
-            mcp_log("INFO", f"Processing {file.name}...")
-            # file is not processed, process it
-            product_data = json.load(open(file))
-            product = ProductChunkTyped.from_json(product_data)
-            product_content = product.product_content
-            metadata = product.metadata
-            product_id = product.id
-            embedding = get_embeddings(product_content)
-            #all_embeddings.append(embedding)
-            
-            new_metadata = {
-                "doc": file.name,
-                "chunk": product_content,
-                "product_id": str(product_id),
-                "metadata": json.dumps(metadata.model_dump())
-            }
-            
-            metadata_list.append(new_metadata)
-            if embedding is not None:
-                if index is None:
-                    dim = len(embedding)
-                    index = faiss.IndexFlatL2(dim)
-                index.add(np.stack([embedding]))
-                CACHE_META[file.name] = f_md_hash
-                   
-        except Exception as e:
-            mcp_log("ERROR", f"Failed to process {file.name}: {e}")
-        
-    CACHE_FILE.write_text(json.dumps(CACHE_META, indent=2))
-    METADATA_FILE.write_text(json.dumps(metadata_list, indent=2))
-    if index and index.ntotal > 0:
-        faiss.write_index(index, str(INDEX_FILE))
-        mcp_log("SUCCESS", "Saved FAISS index and metadata")
-    else:
-        mcp_log("WARN", "No new documents or updates to process.")
+    Parses in a process pool, embeds in concurrent batches and adds vectors to the index
+    in large blocks (see ingest.py).
+    """
+    mcp_log("INFO", "Indexing product documents...")
+    stats = ingest.process_product_documents(
+        doc_path=ROOT / "documents",
+        index_dir=ROOT / "faiss_index",
+        embedder=BatchEmbedder(batch_size=EMBED_BATCH_SIZE, concurrency=EMBED_CONCURRENCY,
+                               cache=default_embedding_cache()),
+        parse_workers=PARSE_WORKERS,
+        index_spec=INDEX_SPEC,
+    )
+    mcp_log("INFO", f"Indexing finished: {stats.summary()}")
+    if stats.checkpoints:
+        PRODUCT_INDEX.reload()
         
 
 def ensure_faiss_ready():
     """
     Ensure that the Faiss index is ready.
     """
-    index_path = ROOT / "faiss_index" / "index.bin"
-    metadata_path = ROOT / "faiss_index" / "metadata.json"
     mcp_log("INFO", f"ensure_faiss_ready called")
-    if not(index_path.exists() and metadata_path.exists()):
+    if not PRODUCT_INDEX.exists():
         mcp_log("INFO", "Index and metadata file not found - running process_product_documents()...")
         mcp_log("INFO", f"let's called process_product documents called")
         process_product_documents()
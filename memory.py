@@ -1,6 +1,6 @@
 import faiss
 import numpy as np
-import requests
+from embeddings import EMBED_MODEL, EMBED_URL, EmbeddingCache, EmbeddingProvider, OllamaEmbeddingProvider, default_embedding_cache, default_embedding_provider, embed_text
 from typing import List, Optional, Literal
 from pydantic import BaseModel
 from datetime import datetime
@@ -15,9 +15,6 @@ class MemoryRecord(BaseModel):
     tags: List[str] = []
     session_id: Optional[str] = None
 
-EMBED_URL = "http://localhost:11434/api/embeddings"
-EMBED_MODEL = "nomic-embed-text"
-
 
 
 class MemoryManager:
@@ -26,30 +23,38 @@ class MemoryManager:
     using vector embeddings and FAISS for similarity search.
 
     Attributes:
-        embedding_model_url (str): URL of the embedding model inference endpoint.
-        model_name (str): Name of the embedding model to be used.
+        provider (EmbeddingProvider): Embedding backend (Ollama over HTTP or in-process).
         index (faiss.Index): FAISS index for similarity search.
         data (List[MemoryRecord]): List of stored memory records.
         embeddings (List[np.ndarray]): List of corresponding vector embeddings.
+        cache (EmbeddingCache): Embedding cache shared with the product search server.
     """
 
-    def __init__(self, embedding_model_url=EMBED_URL, model_name=EMBED_MODEL):
+    def __init__(self, embedding_model_url: Optional[str] = None, model_name: Optional[str] = None,
+                 cache: Optional[EmbeddingCache] = None, provider: Optional[EmbeddingProvider] = None):
         """
         Initializes the MemoryManager with the given embedding model settings.
         
         Args:
-            embedding_model_url (str): The URL to the embedding model API.
-            model_name (str): The name of the embedding model to use.
+            embedding_model_url (Optional[str]): The URL to an Ollama embedding API.
+            model_name (Optional[str]): The name of the Ollama embedding model to use.
+            cache (Optional[EmbeddingCache]): Embedding cache; defaults to the on-disk cache shared across processes.
+            provider (Optional[EmbeddingProvider]): Embedding backend. Defaults to an Ollama provider when a URL or
+                model is given, otherwise to the process-wide provider configured by EMBED_PROVIDER.
         """
-        self.embedding_model_url = embedding_model_url
-        self.model_name = model_name
+        if provider is None and (embedding_model_url or model_name):
+            provider = OllamaEmbeddingProvider(url=embedding_model_url or EMBED_URL,
+                                               model_name=model_name or EMBED_MODEL)
+        self.provider = provider or default_embedding_provider()
+        self.cache = cache or default_embedding_cache()
         self.index = None
         self.data: List[MemoryRecord] = []
         self.embeddings: List[np.ndarray] = []
 
     def _get_embedding(self, text: str) -> np.ndarray:
         """
-        Gets the embedding vector for the given text from the remote model.
+        Gets the embedding vector for the given text from the embedding provider,
+        or from the embedding cache if this text was embedded before.
 
         Args:
             text (str): The input text to embed.
@@ -57,12 +62,7 @@ class MemoryManager:
         Returns:
             np.ndarray: The embedding vector as a NumPy array.
         """
-        response = requests.post(
-            self.embedding_model_url,
-            json={"model": self.model_name, "prompt": text},
-        )
-        response.raise_for_status()
-        return np.array(response.json()["embedding"], dtype=np.float32)
+        return embed_text(text, provider=self.provider, cache=self.cache)
 
     def add(self, item: MemoryRecord):
         """
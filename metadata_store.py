@@ -0,0 +1,156 @@
+import json
+import os
+import re
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, Optional, Set, Tuple
+
+SCHEMA = """
+CREATE TABLE products (
+    row_id INTEGER PRIMARY KEY,
+    product_id TEXT NOT NULL,
+    doc TEXT NOT NULL,
+    chunk TEXT NOT NULL,
+    metadata TEXT NOT NULL,
+    response TEXT
+);
+CREATE TABLE tombstones (row_id INTEGER PRIMARY KEY);
+CREATE TABLE info (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+"""
+
+
+def decode_metadata(value) -> dict:
+    """
+    Decode a row's product metadata. Rows from metadata.json stored it as a JSON string,
+    sometimes with single quotes that need repairing first.
+    """
+    if isinstance(value, dict):
+        return value
+    try:
+        return json.loads(value)
+    except json.JSONDecodeError:
+        return json.loads(re.sub(r"'(.*?)'", r'"\1"', value))
+
+
+class MetadataStore:
+    """
+    SQLite-backed product metadata keyed by FAISS row id.
+
+    Rows are looked up by primary key, so a search only reads and decodes the rows it
+    returns. The database file is opened read-only; nothing is loaded up front.
+
+    Each row may carry `response`, the ProductResponse JSON built at ingest time, so
+    search can hydrate results without re-parsing the chunk text. Databases written
+    before that column existed return None for it.
+    """
+
+    def __init__(self, conn: sqlite3.Connection):
+        self._conn = conn
+        self._lock = threading.Lock()
+        columns = {name for _, name, *_ in conn.execute("PRAGMA table_info(products)")}
+        self._select = "SELECT row_id, product_id, doc, chunk, metadata, {} FROM products".format(
+            "response" if "response" in columns else "NULL"
+        )
+
+    @classmethod
+    def open(cls, path: Path, mmap: bool = False) -> "MetadataStore":
+        """
+        Open a database read-only. With mmap=True the file is declared immutable (checkpoint
+        files never change once written), which skips file locking, and SQLite reads it
+        through a shared memory mapping instead of its private page cache.
+        """
+        if mmap:
+            conn = sqlite3.connect(f"file:{path}?mode=ro&immutable=1", uri=True, check_same_thread=False)
+            conn.execute(f"PRAGMA mmap_size={max(path.stat().st_size, 1 << 20)}")
+            conn.execute("PRAGMA cache_size=0")
+        else:
+            conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+        return cls(conn)
+
+    @classmethod
+    def from_rows(cls, rows: Dict[int, dict], tombstones: Set[int], next_id: int,
+                  version: Optional[int] = None) -> "MetadataStore":
+        """
+        An in-memory store, used for indexes saved before the SQLite format.
+        """
+        conn = sqlite3.connect(":memory:", check_same_thread=False)
+        cls._populate(conn, rows, tombstones, next_id, version)
+        return cls(conn)
+
+    @staticmethod
+    def _populate(conn: sqlite3.Connection, rows: Dict[int, dict], tombstones: Iterable[int],
+                  next_id: int, version: Optional[int]) -> None:
+        conn.executescript(SCHEMA)
+        conn.executemany(
+            "INSERT INTO products (row_id, product_id, doc, chunk, metadata, response) VALUES (?, ?, ?, ?, ?, ?)",
+            ((row_id, row["product_id"], row["doc"], row["chunk"], json.dumps(decode_metadata(row["metadata"])),
+              row.get("response"))
+             for row_id, row in rows.items()),
+        )
+        conn.executemany("INSERT INTO tombstones (row_id) VALUES (?)", ((row_id,) for row_id in tombstones))
+        info = {"next_id": next_id}
+        if version is not None:
+            info["version"] = version
+        conn.executemany("INSERT INTO info (key, value) VALUES (?, ?)",
+                         ((key, json.dumps(value)) for key, value in info.items()))
+        conn.commit()
+
+    @classmethod
+    def write(cls, path: Path, rows: Dict[int, dict], tombstones: Set[int], next_id: int, version: int) -> None:
+        """
+        Build a complete database at `path` atomically (temp file, fsync, rename).
+        """
+        tmp = path.with_name(f".{path.name}.tmp")
+        tmp.unlink(missing_ok=True)
+        conn = sqlite3.connect(tmp)
+        try:
+            conn.execute("PRAGMA journal_mode=OFF")
+            conn.execute("PRAGMA synchronous=OFF")
+            cls._populate(conn, rows, tombstones, next_id, version)
+        finally:
+            conn.close()
+        with open(tmp, "rb") as f:
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+
+    def info(self) -> dict:
+        with self._lock:
+            return {key: json.loads(value) for key, value in self._conn.execute("SELECT key, value FROM info")}
+
+    def tombstones(self) -> Set[int]:
+        with self._lock:
+            return {row_id for (row_id,) in self._conn.execute("SELECT row_id FROM tombstones")}
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM products").fetchone()[0]
+
+    @staticmethod
+    def _row(product_id, doc, chunk, metadata, response) -> dict:
+        return {"product_id": product_id, "doc": doc, "chunk": chunk, "metadata": json.loads(metadata),
+                "response": response}
+
+    def get(self, row_ids: Iterable[int]) -> Dict[int, dict]:
+        """
+        Fetch and decode the given live rows. Unknown or tombstoned ids are left out.
+        """
+        row_ids = [int(row_id) for row_id in row_ids if row_id >= 0]
+        if not row_ids:
+            return {}
+        placeholders = ",".join("?" * len(row_ids))
+        with self._lock:
+            fetched = self._conn.execute(
+                f"{self._select} WHERE row_id IN ({placeholders})",
+                row_ids,
+            ).fetchall()
+        return {row_id: self._row(*rest) for row_id, *rest in fetched}
+
+    def iter_rows(self) -> Iterator[Tuple[int, dict]]:
+        with self._lock:
+            fetched = self._conn.execute(f"{self._select} ORDER BY row_id").fetchall()
+        for row_id, *rest in fetched:
+            yield row_id, self._row(*rest)
+
+    def close(self) -> None:
+        self._conn.close()
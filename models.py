@@ -46,6 +46,35 @@ class ProductMetadataSubset(BaseModel):
             displayCategories=product_metadata.displayCategories
         )
 
+class ProductSearchFilters(BaseModel):
+    """
+    Structured filters applied inside the vector search. Each list matches any of its
+    values (case-insensitive); all given fields must match. Prices are inclusive.
+    """
+    brandName: Optional[List[str]] = None
+    gender: Optional[List[str]] = None
+    usage: Optional[List[str]] = None
+    season: Optional[List[str]] = None
+    article_type: Optional[List[str]] = None
+    baseColour: Optional[List[str]] = None
+    min_price: Optional[float] = None
+    max_price: Optional[float] = None
+
+class RerankOptions(BaseModel):
+    """
+    Server-side rerank of search candidates (see reranker.rerank_rows). Entities are the
+    query entities from perception, matched against brand, gender, article type and name.
+    max_price excludes pricier products, like ProductSearchFilters.max_price; min_price is
+    only a soft preference.
+    """
+    entities: List[str] = []
+    min_price: Optional[float] = None
+    max_price: Optional[float] = None
+    similarity_weight: float = 1.0
+    entity_weight: float = 0.5
+    price_weight: float = 0.3
+    rating_weight: float = 0.1
+
 class ProductChunkTyped(BaseModel):
     """
     Pydantic model for product chunk
@@ -272,6 +301,37 @@ class ProductResponse(BaseModel):
         except Exception as e:
             raise ValueError(f"Error parsing product chunk: {str(e)}\nProduct content: {chunk.product_content}")
 
+    @classmethod
+    def from_row(cls, row: dict) -> "ProductResponse":
+        """
+        Create a ProductResponse from a metadata store row. Rows ingested with a stored
+        response are hydrated from its JSON directly; older rows fall back to parsing the chunk.
+        """
+        if row.get("response"):
+            return cls.model_validate_json(row["response"])
+        return cls.from_product_chunk(ProductChunkTyped(
+            id=row["product_id"],
+            product_content=row["chunk"],
+            metadata=ProductMetadata(**row["metadata"])
+        ))
+
+class ProductResultSet(BaseModel):
+    """
+    Search results plus the handle they are stored under on the server. Pass the handle,
+    with indices where needed, to follow-up tools instead of the product list itself.
+    """
+    handle: Optional[str] = None
+    products: List[ProductResponse] = []
+
+class ProductTable(BaseModel):
+    """
+    Projected search results: the handle, the field names once, and one row of values
+    per product (see result_views). Smaller than full ProductResponse objects.
+    """
+    handle: Optional[str] = None
+    columns: List[str] = []
+    rows: List[list] = []
+
 class AddInput(BaseModel):
     a: int
     b: int
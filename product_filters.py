@@ -0,0 +1,151 @@
+import io
+import json
+import re
+from pathlib import Path
+from typing import Dict, Iterable, List, Mapping, Optional, Tuple
+
+import numpy as np
+
+# Filterable categorical columns; all but article_type are ProductMetadata fields
+CATEGORICAL_FIELDS = ("brandName", "gender", "usage", "season", "article_type", "baseColour")
+# Upper bounds of the default price facet buckets; the last bucket is open-ended
+PRICE_BUCKETS = (500.0, 1000.0, 2000.0, 5000.0)
+
+_ARTICLE_TYPE_IN_CHUNK = re.compile(r"Article Type: typeName: ([^|]*)")
+
+
+def article_type_of(row: dict) -> Optional[str]:
+    """
+    The article type of a metadata row. ProductMetadata has no article type field, so it is
+    read from the stored ProductResponse, or from the chunk text for rows ingested without one.
+    """
+    if row.get("response"):
+        return (json.loads(row["response"]).get("article_type") or {}).get("typeName")
+    match = _ARTICLE_TYPE_IN_CHUNK.search(row.get("chunk", ""))
+    return match.group(1).strip() if match else None
+
+
+def _normalize(value) -> str:
+    return str(value).strip().lower() if value is not None else ""
+
+
+class ProductColumns:
+    """
+    Columnar copy of the filterable product fields, one entry per live row.
+
+    Categorical fields are dictionary-encoded (int32 codes into a sorted vocabulary of
+    lower-cased values) and price is a float32 column, so a filter is a few vectorized
+    comparisons over the whole catalog. The result is the exact set of matching row ids,
+    which search hands to FAISS as an ID selector. The same codes give facet counts with
+    one bincount per field.
+
+    Attributes:
+        row_ids (np.ndarray): Live row ids, ascending.
+        product_ids (np.ndarray): Product id per row.
+        price (np.ndarray): Price per row.
+        codes (Dict[str, np.ndarray]): Per categorical field, the vocabulary code per row.
+        vocab (Dict[str, np.ndarray]): Per categorical field, the sorted distinct values.
+    """
+
+    def __init__(self, row_ids: np.ndarray, product_ids: np.ndarray, price: np.ndarray,
+                 codes: Dict[str, np.ndarray], vocab: Dict[str, np.ndarray]):
+        self.row_ids = row_ids
+        self.product_ids = product_ids
+        self.price = price
+        self.codes = codes
+        self.vocab = vocab
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[Tuple[int, dict]]) -> "ProductColumns":
+        row_ids, product_ids, prices = [], [], []
+        raw: Dict[str, List[str]] = {name: [] for name in CATEGORICAL_FIELDS}
+        for row_id, row in sorted(rows, key=lambda item: item[0]):
+            metadata = row["metadata"]
+            row_ids.append(row_id)
+            product_ids.append(int(row["product_id"]))
+            prices.append(metadata.get("price") or 0.0)
+            for name in CATEGORICAL_FIELDS:
+                value = article_type_of(row) if name == "article_type" else metadata.get(name)
+                raw[name].append(_normalize(value))
+        codes, vocab = {}, {}
+        for name, values in raw.items():
+            vocab[name], inverse = np.unique(np.array(values, dtype=str), return_inverse=True)
+            codes[name] = inverse.astype(np.int32)
+        return cls(np.array(row_ids, dtype=np.int64), np.array(product_ids, dtype=np.int64),
+                   np.array(prices, dtype=np.float32), codes, vocab)
+
+    def to_bytes(self) -> bytes:
+        buffer = io.BytesIO()
+        arrays = {"row_ids": self.row_ids, "product_ids": self.product_ids, "price": self.price}
+        for name in CATEGORICAL_FIELDS:
+            arrays[f"codes_{name}"] = self.codes[name]
+            arrays[f"vocab_{name}"] = self.vocab[name]
+        np.savez(buffer, **arrays)
+        return buffer.getvalue()
+
+    @classmethod
+    def load(cls, path: Path) -> "ProductColumns":
+        with np.load(path, allow_pickle=False) as data:
+            return cls(
+                data["row_ids"], data["product_ids"], data["price"],
+                {name: data[f"codes_{name}"] for name in CATEGORICAL_FIELDS},
+                {name: data[f"vocab_{name}"] for name in CATEGORICAL_FIELDS},
+            )
+
+    def __len__(self) -> int:
+        return len(self.row_ids)
+
+    def mask(self, filters: Mapping[str, object]) -> np.ndarray:
+        """
+        Boolean mask over rows matching every filter. A categorical filter is one value or a
+        list of values (any may match, case-insensitive); min_price/max_price are inclusive.
+        """
+        mask = np.ones(len(self.row_ids), dtype=bool)
+        for name in CATEGORICAL_FIELDS:
+            wanted = filters.get(name)
+            if wanted is None:
+                continue
+            wanted = [wanted] if isinstance(wanted, str) else list(wanted)
+            # Map the wanted values to vocabulary codes, then compare codes row-wise
+            codes = np.flatnonzero(np.isin(self.vocab[name], [_normalize(value) for value in wanted]))
+            mask &= np.isin(self.codes[name], codes)
+        if filters.get("min_price") is not None:
+            mask &= self.price >= float(filters["min_price"])
+        if filters.get("max_price") is not None:
+            mask &= self.price <= float(filters["max_price"])
+        return mask
+
+    def select(self, filters: Mapping[str, object]) -> np.ndarray:
+        """
+        Row ids of the live rows matching `filters`.
+        """
+        return self.row_ids[self.mask(filters)]
+
+    def facets(self, mask: Optional[np.ndarray] = None, limit: int = 10,
+               price_buckets: Iterable[float] = PRICE_BUCKETS) -> dict:
+        """
+        Value counts of every categorical field and price bucket counts over the rows in
+        `mask` (all rows if None).
+
+        Args:
+            mask (Optional[np.ndarray]): Boolean mask over rows, e.g. from `mask(filters)`.
+            limit (int): Most frequent values returned per field.
+            price_buckets (Iterable[float]): Ascending upper bounds of the price buckets.
+
+        Returns:
+            dict: {"total": n, "<field>": {value: count, ...}, "price": {"<lo>-<hi>": count, ...}},
+            values lower-cased, most frequent first, empty values and buckets left out.
+        """
+        selected = np.flatnonzero(mask) if mask is not None else slice(None)
+        result = {"total": int(len(self.row_ids[selected]))}
+        for name in CATEGORICAL_FIELDS:
+            counts = np.bincount(self.codes[name][selected], minlength=len(self.vocab[name]))
+            values = [(str(self.vocab[name][i]), int(counts[i])) for i in np.argsort(-counts, kind="stable")
+                      if counts[i] and self.vocab[name][i]]
+            result[name] = dict(values[:limit])
+        edges = np.array(sorted(price_buckets), dtype=np.float32)
+        counts = np.bincount(np.searchsorted(edges, self.price[selected], side="right"), minlength=len(edges) + 1)
+        bounds = [0.0] + edges.tolist()
+        labels = [f"{lo:g}-{hi:g}" for lo, hi in zip(bounds, bounds[1:])] + [f"{bounds[-1]:g}+"]
+        result["price"] = {label: int(count) for label, count in zip(labels, counts) if count}
+        return result
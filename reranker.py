@@ -0,0 +1,157 @@
+import re
+from typing import List, Optional
+
+import numpy as np
+
+from product_filters import article_type_of
+
+# Candidates fetched per requested result when reranking or diversifying
+RERANK_OVERFETCH = 4
+RERANK_MIN_CANDIDATES = 20
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+
+def entity_terms(entities: List[str]) -> List[str]:
+    """
+    Lower-cased distinct words of the query entities, e.g. ["Nike T-shirt", "Men"] -> ["nike", "t", "shirt", "men"].
+    """
+    return list(dict.fromkeys(term for entity in entities for term in _TOKEN.findall(entity.lower())))
+
+
+def _minmax(values: np.ndarray) -> np.ndarray:
+    spread = values.max() - values.min()
+    return (values - values.min()) / spread if spread > 0 else np.ones_like(values)
+
+
+def _relative_to_best(scores: np.ndarray, higher_is_better: bool) -> np.ndarray:
+    """
+    1 for the best score, less by the gap to it relative to the scale of the scores: s / max
+    for similarities, 1 - (d - min) / max for distances. Unlike min-max scaling, candidates
+    almost as close as the best stay close to 1 instead of being spread over [0, 1].
+    """
+    scale = np.abs(scores).max()
+    if scale == 0:
+        return np.ones_like(scores)
+    gap = scores.max() - scores if higher_is_better else scores - scores.min()
+    return 1.0 - gap / scale
+
+
+def rerank_scores(rows: List[dict], entities: Optional[List[str]] = None,
+                  min_price: Optional[float] = None, max_price: Optional[float] = None,
+                  similarity_weight: float = 1.0, entity_weight: float = 0.5, price_weight: float = 0.3,
+                  rating_weight: float = 0.1, higher_is_better: bool = False) -> np.ndarray:
+    """
+    Score search hit rows by a weighted sum of vectorized features, higher is better.
+
+    Features, each in [0, 1]:
+        - similarity: the search score (row["distance"]) relative to the best candidate's
+          (see _relative_to_best), so a slightly closer hit cannot outweigh an entity match;
+        - entity match: fraction of entity words found as whole words in the brand, gender,
+          article type and display name;
+        - price: 1 inside [min_price, max_price], falling off in proportion to the overshoot
+          (rerank_rows and the search tools drop rows above max_price outright);
+        - rating: myntraRating / 5.
+
+    Args:
+        rows (List[dict]): Hit rows of one query with a "distance" key, best first.
+        entities (Optional[List[str]]): Query entities, e.g. PerceptionResult.entities.
+        higher_is_better (bool): True when "distance" is a similarity (hybrid RRF scores).
+
+    Returns:
+        np.ndarray: One score per row.
+    """
+    if not rows:
+        return np.zeros(0)
+    metadata = [row["metadata"] for row in rows]
+    scores = np.array([row["distance"] for row in rows], dtype=np.float64)
+    similarity = _relative_to_best(scores, higher_is_better)
+
+    terms = entity_terms(entities or [])
+    if terms:
+        haystacks = np.array([
+            " " + " ".join(_TOKEN.findall(" ".join(str(value or "") for value in (
+                m.get("brandName"), m.get("gender"), article_type_of(row), m.get("productDisplayName")
+            )).lower())) + " "
+            for m, row in zip(metadata, rows)
+        ])
+        needles = np.array([f" {term} " for term in terms])
+        entity = (np.char.find(haystacks[:, None], needles[None, :]) >= 0).mean(axis=1)
+    else:
+        entity = np.zeros(len(rows))
+
+    price_values = np.array([m.get("price") or 0.0 for m in metadata], dtype=np.float64)
+    price = np.ones(len(rows))
+    if max_price is not None and max_price > 0:
+        price = np.minimum(price, np.where(price_values <= max_price, 1.0, max_price / np.maximum(price_values, 1e-9)))
+    if min_price is not None and min_price > 0:
+        price = np.minimum(price, np.where(price_values >= min_price, 1.0, price_values / min_price))
+
+    rating = np.clip(np.array([m.get("myntraRating") or 0.0 for m in metadata], dtype=np.float64) / 5.0, 0.0, 1.0)
+
+    return (similarity_weight * similarity + entity_weight * entity
+            + price_weight * price + rating_weight * rating)
+
+
+def within_max_price(rows: List[dict], max_price: Optional[float]) -> List[dict]:
+    """
+    The rows priced at most `max_price` (all rows if None).
+    """
+    if max_price is None:
+        return rows
+    return [row for row in rows if (row["metadata"].get("price") or 0.0) <= max_price]
+
+
+def rerank_rows(rows: List[dict], top_k: int, **options) -> List[dict]:
+    """
+    The top_k of `rows` by rerank_scores(rows, **options), best first. max_price is a
+    hard limit: rows priced above it are dropped, not just scored down.
+    """
+    rows = within_max_price(rows, options.get("max_price"))
+    order = np.argsort(-rerank_scores(rows, **options), kind="stable")[:top_k]
+    return [rows[i] for i in order]
+
+
+def mmr_select(vectors: np.ndarray, relevance: np.ndarray, top_k: int, diversity: float) -> np.ndarray:
+    """
+    Pick top_k candidates by maximal marginal relevance: each step takes the candidate
+    maximizing (1 - diversity) * relevance - diversity * (max similarity to the ones
+    already picked). All pairwise similarities come from one matrix product.
+
+    Both terms are min-max scaled over the candidate set, so they share the [0, 1] range.
+    Raw cosine similarities of near-duplicate products sit in a narrow band close to 1,
+    and unscaled they would barely move the ranking at moderate diversity.
+
+    Args:
+        vectors (np.ndarray): (n, d) candidate embeddings.
+        relevance (np.ndarray): Relevance per candidate, higher is better.
+        top_k (int): Number of candidates to pick.
+        diversity (float): 0 keeps the relevance order, 1 only avoids similar candidates. In
+            between, a candidate loses to a less relevant one when its lead in scaled
+            relevance is less than diversity / (1 - diversity) times its lead in scaled
+            similarity to the picks. E.g. a near-duplicate of a pick (similarity about 1)
+            that is 0.1 more relevant than a distinct candidate (similarity about 0) is
+            passed over from diversity 0.1 / 1.1, about 0.09.
+
+    Returns:
+        np.ndarray: Indices of the picked candidates, in pick order.
+    """
+    k = min(top_k, len(vectors))
+    if k == 0:
+        return np.zeros(0, dtype=np.int64)
+    unit = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+    similarity = (unit @ unit.T).astype(np.float64)
+    if len(similarity) > 1:
+        pairs = similarity[~np.eye(len(similarity), dtype=bool)]
+        spread = pairs.max() - pairs.min()
+        similarity = (similarity - pairs.min()) / spread if spread > 0 else np.zeros_like(similarity)
+    relevance = _minmax(np.asarray(relevance, dtype=np.float64))
+    picked = [int(np.argmax(relevance))]
+    closest = similarity[picked[0]].copy()
+    for _ in range(1, k):
+        scores = (1.0 - diversity) * relevance - diversity * closest
+        scores[picked] = -np.inf
+        best = int(np.argmax(scores))
+        picked.append(best)
+        np.maximum(closest, similarity[best], out=closest)
+    return np.array(picked, dtype=np.int64)
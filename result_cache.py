@@ -0,0 +1,298 @@
+import json
+import random
+import re
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, List, Optional, Tuple
+
+import faiss
+import numpy as np
+
+
+def normalize_query(query: str) -> str:
+    """
+    Case- and whitespace-insensitive form of a query, so trivially different spellings share an entry.
+    """
+    return re.sub(r"\s+", " ", query).strip().lower()
+
+
+def query_cache_key(query: str, top_k: int, filters: Optional[dict] = None, **options) -> Tuple:
+    """
+    Cache key for a search: normalized query, top_k, filters and any other search options
+    that change the result (ANN knobs, mode). The index version is tracked by the cache.
+    """
+    return (
+        normalize_query(query),
+        top_k,
+        json.dumps(filters or {}, sort_keys=True),
+        tuple(sorted((name, value) for name, value in options.items() if value is not None)),
+    )
+
+
+class QueryResultCache:
+    """
+    LRU cache of finished search results with a time-to-live.
+
+    Entries belong to one index version. Every lookup and insert passes the version of
+    the snapshot being searched; when it differs from the cache's version (ingestion
+    wrote a new checkpoint) the whole cache is dropped, so results never outlive the
+    index they came from.
+
+    Attributes:
+        max_entries (int): LRU capacity.
+        ttl (float): Seconds an entry stays valid.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 300.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: OrderedDict[Hashable, Tuple[float, Any]] = OrderedDict()
+        self._version: Optional[Hashable] = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.invalidations = 0
+
+    def _check_version(self, version: Hashable) -> None:
+        if version != self._version:
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+            self._version = version
+
+    def get(self, key: Hashable, version: Hashable) -> Optional[Any]:
+        with self._lock:
+            self._check_version(version)
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry[0] > self.ttl:
+                del self._entries[key]
+                self.expired += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: Hashable, version: Hashable, value: Any) -> None:
+        with self._lock:
+            self._check_version(version)
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "expired": self.expired,
+                "invalidations": self.invalidations,
+                "entries": len(self._entries),
+            }
+
+
+class SemanticQueryCache:
+    """
+    Second cache tier for paraphrased queries, matched by embedding similarity.
+
+    Recent query embeddings are kept, L2-normalised, in a small FAISS inner-product
+    index. A lookup returns the cached results of the most similar earlier query whose
+    cosine similarity is at least `threshold` and whose search options (top_k, filters,
+    mode, ...) are identical. The oldest entries are evicted beyond `max_entries`, and
+    the cache is emptied when the index version changes.
+
+    A hit can be wrong: two similar queries may still deserve different results. Callers
+    verify a `verify_rate` fraction of hits against a real search and report the outcome
+    with `record_verification`, which feeds the false-hit statistics.
+
+    Attributes:
+        threshold (float): Minimum cosine similarity for a hit.
+        max_entries (int): Number of recent queries kept.
+        verify_rate (float): Fraction of hits to verify.
+    """
+
+    def __init__(self, threshold: float = 0.95, max_entries: int = 512, verify_rate: float = 0.05):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.verify_rate = verify_rate
+        self._index = None
+        self._entries: OrderedDict[int, Tuple[Hashable, Any]] = OrderedDict()
+        self._next_id = 0
+        self._version: Optional[Hashable] = None
+        self._lock = threading.Lock()
+        self._rng = random.Random(0)
+        self.hits = 0
+        self.misses = 0
+        self.verified = 0
+        self.false_hits = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def _normalize(embedding: np.ndarray) -> np.ndarray:
+        vector = np.ascontiguousarray(embedding, dtype=np.float32).reshape(1, -1).copy()
+        faiss.normalize_L2(vector)
+        return vector
+
+    def _check_version(self, version: Hashable) -> None:
+        if version != self._version:
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+            self._index = None
+            self._version = version
+
+    def lookup(self, embedding: np.ndarray, options: Hashable, version: Hashable) -> Tuple[Optional[Any], bool]:
+        """
+        Returns:
+            (value, verify): The cached results or None, and whether the caller should
+            verify this hit against a real search.
+        """
+        with self._lock:
+            self._check_version(version)
+            if self._index is not None and self._index.ntotal:
+                similarities, ids = self._index.search(self._normalize(embedding), min(8, self._index.ntotal))
+                for similarity, entry_id in zip(similarities[0], ids[0]):
+                    if similarity < self.threshold:
+                        break
+                    entry = self._entries.get(int(entry_id))
+                    if entry is not None and entry[0] == options:
+                        self.hits += 1
+                        return entry[1], self._rng.random() < self.verify_rate
+            self.misses += 1
+            return None, False
+
+    def put(self, embedding: np.ndarray, options: Hashable, version: Hashable, value: Any) -> None:
+        with self._lock:
+            self._check_version(version)
+            vector = self._normalize(embedding)
+            if self._index is None:
+                self._index = faiss.IndexIDMap2(faiss.IndexFlatIP(vector.shape[1]))
+            entry_id = self._next_id
+            self._next_id += 1
+            self._index.add_with_ids(vector, np.array([entry_id], dtype=np.int64))
+            self._entries[entry_id] = (options, value)
+            if len(self._entries) > self.max_entries:
+                oldest, _ = self._entries.popitem(last=False)
+                self._index.remove_ids(np.array([oldest], dtype=np.int64))
+
+    def record_verification(self, false_hit: bool) -> None:
+        with self._lock:
+            self.verified += 1
+            self.false_hits += int(false_hit)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "verified": self.verified,
+                "false_hits": self.false_hits,
+                "false_hit_rate": self.false_hits / self.verified if self.verified else 0.0,
+                "invalidations": self.invalidations,
+                "entries": len(self._entries),
+                "threshold": self.threshold,
+            }
+
+
+def check_indices(indices: Any) -> List[int]:
+    """
+    `indices` as a list of ints, for tools that address items of a result set.
+
+    Raises:
+        ValueError: `indices` is not a list of ints.
+    """
+    if not isinstance(indices, (list, tuple)) or not all(
+            isinstance(i, int) and not isinstance(i, bool) for i in indices):
+        raise ValueError(f"indices must be a list of ints, e.g. [2, 0, 1]; got {indices!r}")
+    return list(indices)
+
+
+class ResultSetStore:
+    """
+    Short-lived server-side store of search result lists, addressed by opaque handles.
+
+    Search tools put their results here and return the handle, so follow-up tools
+    (rerank by index, pretty print) take a handle and a few indices instead of the LLM
+    regenerating the full product list inside a FUNCTION_CALL. The store is bounded:
+    the least recently used sets are evicted beyond `max_entries`, and a set expires
+    `ttl` seconds after it was last used.
+
+    Attributes:
+        max_entries (int): Number of result sets kept.
+        ttl (float): Seconds a result set stays valid after its last use.
+    """
+
+    def __init__(self, max_entries: int = 256, ttl: float = 1800.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: OrderedDict[str, Tuple[float, List[Any]]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.stored = 0
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+
+    def put(self, items: List[Any]) -> str:
+        handle = f"rs-{secrets.token_hex(4)}"
+        with self._lock:
+            self._entries[handle] = (time.monotonic(), list(items))
+            self.stored += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evicted += 1
+        return handle
+
+    def get(self, handle: str, indices: Optional[List[int]] = None) -> List[Any]:
+        """
+        The result set behind `handle`, or only the items at `indices`, in that order.
+
+        Raises:
+            KeyError: The handle is unknown or has expired.
+            ValueError: `indices` is not a list of ints.
+            IndexError: An index is out of range.
+        """
+        if indices is not None:
+            indices = check_indices(indices)
+        with self._lock:
+            entry = self._entries.get(handle)
+            if entry is not None and time.monotonic() - entry[0] > self.ttl:
+                del self._entries[handle]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                raise KeyError(f"Unknown or expired result handle {handle!r}; run the search again")
+            self.hits += 1
+            self._entries[handle] = (time.monotonic(), entry[1])
+            self._entries.move_to_end(handle)
+            items = entry[1]
+        if indices is None:
+            return list(items)
+        for i in indices:
+            if not 0 <= i < len(items):
+                raise IndexError(f"Index {i} out of range for result handle {handle!r} with {len(items)} items")
+        return [items[i] for i in indices]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "stored": self.stored,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evicted": self.evicted,
+                "entries": len(self._entries),
+                "ttl": self.ttl,
+            }
@@ -0,0 +1,61 @@
+from typing import Any, Callable, List, Optional
+
+from pydantic import BaseModel
+
+from models import ProductMetadata, ProductResponse
+
+# Named projections of a ProductResponse; "full" returns the whole object
+SUMMARY_FIELDS = ["id", "productDisplayName", "brandName", "gender", "article_type.typeName", "price",
+                  "discountedPrice", "myntraRating", "baseColour", "usage"]
+VIEWS = {"full": None, "summary": SUMMARY_FIELDS, "ids": ["id"]}
+
+
+def view_fields(view: str = "full", fields: Optional[List[str]] = None) -> Optional[List[str]]:
+    """
+    The fields to return for a view, or None for full ProductResponse objects. Explicit
+    `fields` take precedence over the view.
+
+    Raises:
+        ValueError: Unknown view or field.
+    """
+    if fields:
+        for field in fields:
+            field_getter(field)
+        return list(fields)
+    if view not in VIEWS:
+        raise ValueError(f"Unknown view {view!r}; expected one of {sorted(VIEWS)}")
+    return VIEWS[view]
+
+
+def field_getter(field: str) -> Callable[[ProductResponse], Any]:
+    """
+    Accessor for a field path. The first part is a ProductResponse field (e.g. "article_type")
+    or a ProductMetadata field (e.g. "price", "brandName"); further dotted parts index into
+    dicts, e.g. "article_type.typeName" or "article_attributes.Fabric".
+
+    Raises:
+        ValueError: The first part names neither a ProductResponse nor a ProductMetadata field.
+    """
+    head, *rest = field.split(".")
+    if head in ProductResponse.model_fields:
+        root = lambda product: getattr(product, head)
+    elif head in ProductMetadata.model_fields:
+        root = lambda product: getattr(product.product_metadata, head)
+    else:
+        raise ValueError(f"Unknown field {field!r}")
+
+    def get(product: ProductResponse) -> Any:
+        value = root(product)
+        for part in rest:
+            value = value.get(part) if isinstance(value, dict) else getattr(value, part, None)
+        return value.model_dump() if isinstance(value, BaseModel) else value
+
+    return get
+
+
+def project_rows(products: List[ProductResponse], fields: List[str]) -> List[list]:
+    """
+    One row of field values per product, in `fields` order.
+    """
+    getters = [field_getter(field) for field in fields]
+    return [[get(product) for get in getters] for product in products]
@@ -0,0 +1,86 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Set, Tuple
+
+
+class MicroBatcher:
+    """
+    Coalesces concurrent requests into batches on the running event loop.
+
+    Requests submitted with the same key within `window` seconds of the first one are
+    handed to `process` together, as one list; a batch is sent early once it reaches
+    `max_batch` requests. `process` returns one result per request, in order, and each
+    caller gets its own result (or the batch's exception). Requests with different keys
+    (e.g. different search options) are never mixed.
+
+    A larger window gives bigger batches, and higher throughput under load, at the price
+    of up to `window` extra latency per request. window <= 0 or max_batch <= 1 disables
+    batching.
+
+    Attributes:
+        process (Callable): async (key, requests) -> results.
+        window (float): Seconds to wait for more requests after the first of a batch.
+        max_batch (int): Maximum requests per batch.
+    """
+
+    def __init__(self, process: Callable[[Hashable, List[Any]], Awaitable[List[Any]]],
+                 window: float = 0.002, max_batch: int = 32):
+        self.process = process
+        self.window = window
+        self.max_batch = max_batch
+        self._pending: Dict[Hashable, List[Tuple[Any, asyncio.Future]]] = {}
+        self._running: Set[asyncio.Task] = set()
+        self.batches = 0
+        self.requests = 0
+        self.largest_batch = 0
+
+    async def submit(self, key: Hashable, request: Any) -> Any:
+        if self.window <= 0 or self.max_batch <= 1:
+            self._count(1)
+            return (await self.process(key, [request]))[0]
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        batch = self._pending.get(key)
+        if batch is None:
+            batch = self._pending[key] = []
+            loop.call_later(self.window, self._flush, key, batch)
+        batch.append((request, future))
+        if len(batch) >= self.max_batch:
+            self._flush(key, batch)
+        return await future
+
+    def _flush(self, key: Hashable, batch: List[Tuple[Any, asyncio.Future]]) -> None:
+        # The timer of a batch that was already sent for being full finds it gone
+        if self._pending.get(key) is not batch:
+            return
+        del self._pending[key]
+        task = asyncio.ensure_future(self._run(key, batch))
+        self._running.add(task)
+        task.add_done_callback(self._running.discard)
+
+    async def _run(self, key: Hashable, batch: List[Tuple[Any, asyncio.Future]]) -> None:
+        self._count(len(batch))
+        try:
+            results = await self.process(key, [request for request, _ in batch])
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    def _count(self, size: int) -> None:
+        self.batches += 1
+        self.requests += size
+        self.largest_batch = max(self.largest_batch, size)
+
+    def stats(self) -> dict:
+        return {
+            "batches": self.batches,
+            "requests": self.requests,
+            "mean_batch_size": self.requests / self.batches if self.batches else 0.0,
+            "largest_batch": self.largest_batch,
+            "window_ms": self.window * 1000.0,
+            "max_batch": self.max_batch,
+        }
@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+
+from benchmark import StandInEmbeddingServer, deterministic_embedding
+from embeddings import EMBED_URL, BatchEmbedder, HashingEmbeddingProvider, OllamaEmbeddingProvider
+
+
+class FailingProvider(HashingEmbeddingProvider):
+    """Fails every batch containing the text "boom"."""
+
+    def embed(self, texts):
+        if "boom" in texts:
+            raise RuntimeError("embedding server down")
+        return super().embed(texts)
+
+
+@pytest.fixture(scope="module")
+def server():
+    with StandInEmbeddingServer(dim=8) as server:
+        yield server
+
+
+def test_default_endpoint_is_the_unnormalised_single_text_endpoint():
+    assert OllamaEmbeddingProvider().url == EMBED_URL
+    assert EMBED_URL.endswith("/api/embeddings")
+
+
+@pytest.mark.parametrize("endpoint", ["single_url", "batch_url"])
+def test_ollama_endpoints_return_one_row_per_text_in_order(server, endpoint):
+    provider = OllamaEmbeddingProvider(url=getattr(server, endpoint))
+    texts = ["a", "b", "c"]
+
+    vectors = provider.embed(texts)
+
+    np.testing.assert_allclose(vectors, np.stack([deterministic_embedding(text, 8) for text in texts]))
+
+
+def test_batch_endpoint_sends_one_request_per_call(server):
+    provider = OllamaEmbeddingProvider(url=server.batch_url)
+    before = server.requests
+
+    provider.embed(["a", "b", "c", "d"])
+
+    assert server.requests - before == 1
+
+
+def test_map_batches_yields_batches_in_input_order():
+    embedder = BatchEmbedder(HashingEmbeddingProvider(16), batch_size=3, concurrency=2)
+    items = [f"item {i}" for i in range(10)]
+
+    batches = list(embedder.map_batches(items, lambda item: item))
+
+    assert [batch for batch, _, _ in batches] == [items[0:3], items[3:6], items[6:9], items[9:]]
+    np.testing.assert_array_equal(np.vstack([vectors for _, vectors, _ in batches]),
+                                  HashingEmbeddingProvider(16).embed(items))
+
+
+def test_map_batches_reports_a_failed_batch_and_continues():
+    embedder = BatchEmbedder(FailingProvider(16), batch_size=2, concurrency=2)
+
+    batches = list(embedder.map_batches(["a", "b", "boom", "c", "d"], lambda item: item))
+
+    assert [(vectors is None, type(error)) for _, vectors, error in batches] == [
+        (False, type(None)), (True, RuntimeError), (False, type(None))]
@@ -0,0 +1,81 @@
+import time
+
+import numpy as np
+
+from embeddings import BatchEmbedder, EmbeddingCache, HashingEmbeddingProvider, OllamaEmbeddingProvider, embed_text
+
+
+class CountingProvider(HashingEmbeddingProvider):
+    """HashingEmbeddingProvider that records the texts it is asked to embed."""
+
+    def __init__(self, dim: int = 16):
+        super().__init__(dim)
+        self.calls = []
+
+    def embed(self, texts):
+        self.calls.append(list(texts))
+        return super().embed(texts)
+
+
+def vectors(n: int, dim: int = 4) -> np.ndarray:
+    return np.arange(n * dim, dtype=np.float32).reshape(n, dim)
+
+
+def test_memory_lru_evicts_least_recently_used(tmp_path):
+    cache = EmbeddingCache(tmp_path / "embeddings.db", memory_items=2)
+    cache.put_many("m", ["a", "b"], vectors(2))
+    cache.get("m", "a")  # "a" is now more recent than "b"
+    cache.put("m", "c", vectors(1)[0])
+
+    assert cache.get("m", "a") is not None
+    assert cache.get("m", "c") is not None
+    assert cache.stats()["memory_hits"] == 3
+    # "b" left the LRU but is still on disk
+    assert cache.get("m", "b") is not None
+    assert cache.stats()["disk_hits"] == 1
+
+
+def test_disk_eviction_keeps_most_recently_used(tmp_path):
+    cache = EmbeddingCache(tmp_path / "embeddings.db", memory_items=10, max_disk_entries=1000)
+    old = [f"old {i}" for i in range(600)]
+    new = [f"new {i}" for i in range(600)]
+    cache.put_many("m", old, vectors(600))
+    time.sleep(0.01)
+    cache.put_many("m", new, vectors(600))
+
+    assert cache.stats()["disk_entries"] == 1000
+    fresh = EmbeddingCache(tmp_path / "embeddings.db", memory_items=10)
+    assert all(vector is not None for vector in fresh.get_many("m", new))
+    assert sum(vector is None for vector in fresh.get_many("m", old)) == 200
+
+
+def test_cache_is_keyed_by_model(tmp_path):
+    cache = EmbeddingCache(tmp_path / "embeddings.db")
+    cache.put("m1", "text", vectors(1)[0])
+
+    assert cache.get("m2", "text") is None
+    np.testing.assert_array_equal(cache.get("m1", "text"), vectors(1)[0])
+
+
+def test_batch_embedder_sends_only_uncached_texts(tmp_path):
+    provider = CountingProvider()
+    embedder = BatchEmbedder(provider, cache=EmbeddingCache(tmp_path / "embeddings.db"))
+
+    first = embedder.embed(["red shirt", "blue jeans"])
+    second = embedder.embed(["blue jeans", "red shirt", "green cap"])
+
+    assert provider.calls == [["red shirt", "blue jeans"], ["green cap"]]
+    np.testing.assert_array_equal(second[:2], first[::-1])
+    np.testing.assert_array_equal(second[2], HashingEmbeddingProvider(16).embed(["green cap"])[0])
+
+
+def test_endpoints_with_different_normalisation_do_not_share_entries(tmp_path):
+    cache = EmbeddingCache(tmp_path / "embeddings.db")
+    raw = OllamaEmbeddingProvider(url="http://localhost:11434/api/embeddings")
+    normalised = OllamaEmbeddingProvider(url="http://localhost:11434/api/embed")
+    cache.put(raw.space, "text", vectors(1)[0])
+
+    assert raw.space != normalised.space
+    assert embed_text("text", provider=raw, cache=cache) is not None
+    assert cache.get(normalised.space, "text") is None
+    assert OllamaEmbeddingProvider(url="http://other-host:11434/api/embeddings").space == raw.space
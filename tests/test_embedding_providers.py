@@ -0,0 +1,49 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from embeddings import HashingEmbeddingProvider, OllamaEmbeddingProvider, make_embedding_provider
+
+
+def test_hashing_vectors_have_the_configured_dimension_and_unit_norm():
+    provider = HashingEmbeddingProvider(dim=64)
+
+    vectors = provider.embed(["Nike running shoes", "blue denim jacket for men"])
+
+    assert vectors.shape == (2, 64)
+    assert vectors.dtype == np.float32
+    np.testing.assert_allclose(np.linalg.norm(vectors, axis=1), 1.0, rtol=1e-6)
+    assert provider.model_name == "hashing-64"
+
+
+def test_hashing_vectors_are_deterministic_across_instances():
+    texts = ["Nike running shoes", "Puma T-shirt"]
+
+    np.testing.assert_array_equal(HashingEmbeddingProvider(128).embed(texts), HashingEmbeddingProvider(128).embed(texts))
+    np.testing.assert_array_equal(HashingEmbeddingProvider(128).embed_one(texts[1]),
+                                  HashingEmbeddingProvider(128).embed([texts[1]])[0])
+
+
+def test_hashing_texts_sharing_words_are_closer():
+    provider = HashingEmbeddingProvider(256)
+    query, near, far = provider.embed(["nike running shoes", "nike running shoes for men", "silver wrist watch"])
+
+    assert query @ near > query @ far
+
+
+def test_hashing_text_without_words_is_a_zero_vector():
+    np.testing.assert_array_equal(HashingEmbeddingProvider(8).embed(["", "!!"]), np.zeros((2, 8), dtype=np.float32))
+
+
+def test_hashing_async_matches_sync():
+    provider = HashingEmbeddingProvider(32)
+
+    np.testing.assert_array_equal(asyncio.run(provider.aembed(["a b c"])), provider.embed(["a b c"]))
+
+
+def test_make_embedding_provider_by_name():
+    assert isinstance(make_embedding_provider("hashing", dim=16), HashingEmbeddingProvider)
+    assert isinstance(make_embedding_provider("ollama"), OllamaEmbeddingProvider)
+    with pytest.raises(ValueError):
+        make_embedding_provider("openai")
@@ -0,0 +1,235 @@
+import json
+
+import faiss
+import numpy as np
+import pytest
+
+import index_store
+from index_store import (IndexSpec, MutableProductIndex, ProductIndexStore, load_file_hashes, load_schema_catalog,
+                         read_manifest)
+from json_analyzer import SchemaCatalog, document_profile
+
+DIM = 16
+
+
+def row(product_id: int, brand: str = "nike", price: float = 999.0, doc: str = None) -> dict:
+    return {
+        "doc": doc or f"{product_id}.json",
+        "chunk": f"Product {product_id} by {brand}",
+        "product_id": str(product_id),
+        "metadata": {"brandName": brand, "gender": "Men", "price": price},
+        "response": None,
+    }
+
+
+def vectors(n: int, seed: int = 0) -> np.ndarray:
+    return np.random.default_rng(seed).standard_normal((n, DIM)).astype(np.float32)
+
+
+@pytest.mark.parametrize("kind", ["flat", "hnsw", "ivf", "ivfpq"])
+def test_mmap_serves_every_index_kind(tmp_path, kind):
+    index = MutableProductIndex()
+    embeddings = vectors(400)
+    index.upsert([row(i) for i in range(400)], embeddings)
+    index.rebuild(IndexSpec(kind=kind, nlist=8, nprobe=8, pq_m=4))
+    index.save(tmp_path, {})
+
+    snapshot = ProductIndexStore(tmp_path, mmap=True).get()
+
+    assert snapshot is not None
+    _, hits = snapshot.search(embeddings[:3], 5, nprobe=8)
+    assert all(len(rows) == 5 for rows in hits)
+    if kind != "ivfpq":
+        assert [rows[0]["product_id"] for rows in hits] == ["0", "1", "2"]
+
+
+def test_failed_first_load_raises(tmp_path):
+    index = MutableProductIndex()
+    index.upsert([row(1)], vectors(1))
+    index.save(tmp_path, {})
+    next(tmp_path.glob("index.v*.bin")).write_bytes(b"not an index")
+
+    with pytest.raises(RuntimeError):
+        ProductIndexStore(tmp_path).get()
+
+
+def test_failed_reload_keeps_the_previous_snapshot(tmp_path):
+    index = MutableProductIndex()
+    index.upsert([row(1)], vectors(1))
+    index.save(tmp_path, {})
+    store = ProductIndexStore(tmp_path)
+    first = store.get()
+
+    index.upsert([row(2)], vectors(1, seed=1))
+    index.save(tmp_path, {})
+    next(tmp_path.glob("index.v2.bin")).write_bytes(b"not an index")
+
+    assert store.reload() is first
+
+
+def ids(hits) -> list:
+    return [row["product_id"] for row in hits]
+
+
+def test_upsert_replaces_the_row_of_the_same_product(tmp_path):
+    index = MutableProductIndex()
+    embeddings = vectors(3)
+    index.upsert([row(1), row(2)], embeddings[:2])
+
+    replaced = index.upsert([row(1, brand="puma")], embeddings[2:])
+
+    assert replaced == 1
+    assert (index.live_count, index.dead_count) == (2, 1)
+    index.save(tmp_path, {})
+    snapshot = ProductIndexStore(tmp_path).get()
+    _, hits = snapshot.search(embeddings, 3)
+    # The old vector of product 1 is tombstoned: it no longer matches and is never returned
+    assert ids(hits[0]) == ["2", "1"]
+    assert hits[2][0]["metadata"]["brandName"] == "puma"
+
+
+def test_removed_products_are_not_returned(tmp_path):
+    index = MutableProductIndex()
+    embeddings = vectors(3)
+    index.upsert([row(i) for i in range(3)], embeddings)
+
+    assert index.remove_docs(["1.json", "missing.json"]) == 1
+    assert index.remove_product("2")
+    assert not index.remove_product("2")
+
+    index.save(tmp_path, {})
+    _, hits = ProductIndexStore(tmp_path).get().search(embeddings, 3)
+    assert [ids(rows) for rows in hits] == [["0"]] * 3
+
+
+@pytest.mark.parametrize("kind", ["flat", "ivfpq"])
+def test_compaction_drops_dead_vectors_and_keeps_row_ids(kind):
+    index = MutableProductIndex()
+    embeddings = vectors(400)
+    index.upsert([row(i) for i in range(400)], embeddings)
+    index.rebuild(IndexSpec(kind=kind, nlist=8, nprobe=8, pq_m=4))
+    index.remove_docs([f"{i}.json" for i in range(0, 400, 2)])
+    live_before = dict(index.rows)
+
+    assert index.compact() == 200
+    assert index.index.ntotal == 200
+    assert index.rows == live_before and not index.tombstones
+    if kind == "ivfpq":
+        # Re-encoded from the kept originals, not from decoded codes
+        row_ids, kept = index.originals
+        np.testing.assert_array_equal(kept, embeddings[row_ids])
+
+
+def test_legacy_positional_index_is_migrated_keeping_the_newest_row(tmp_path):
+    embeddings = vectors(3)
+    legacy = faiss.IndexFlatL2(DIM)
+    legacy.add(embeddings)
+    faiss.write_index(legacy, str(tmp_path / "index.bin"))
+    (tmp_path / "metadata.json").write_text(json.dumps([row(1), row(2), row(1, brand="puma")]))
+
+    index = MutableProductIndex.load(tmp_path)
+
+    assert index.rows == {1: row(2), 2: row(1, brand="puma")}
+    assert index.tombstones == {0}
+    _, hits = ProductIndexStore(tmp_path).get().search(embeddings[:1], 3)
+    assert ids(hits[0]) == ["2", "1"]
+
+
+def test_checkpoints_are_versioned_and_keep_the_previous_one(tmp_path):
+    index = MutableProductIndex()
+    for version in (1, 2, 3):
+        index.upsert([row(version)], vectors(1, seed=version))
+        assert index.save(tmp_path, {f"{version}.json": "hash"}) == version
+
+    manifest = read_manifest(tmp_path)
+    assert manifest["version"] == 3
+    assert manifest["files"]["index"] == "index.v3.bin"
+    assert sorted(path.name for path in tmp_path.glob("index.v*.bin")) == ["index.v2.bin", "index.v3.bin"]
+    assert load_file_hashes(tmp_path) == {"3.json": "hash"}
+
+
+def test_a_crash_before_the_manifest_switch_leaves_the_last_checkpoint(tmp_path, monkeypatch):
+    index = MutableProductIndex()
+    index.upsert([row(1)], vectors(1))
+    index.save(tmp_path, {})
+    index.upsert([row(2)], vectors(1, seed=1))
+
+    def crash(path, text):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(index_store, "atomic_write_text", crash)
+    with pytest.raises(OSError):
+        index.save(tmp_path, {})
+
+    assert read_manifest(tmp_path)["version"] == 1
+    assert ProductIndexStore(tmp_path).get().metadata.count() == 1
+
+
+
+@pytest.mark.parametrize("kind", ["flat", "hnsw", "ivf"])
+def test_filtered_search_only_returns_matching_rows(tmp_path, kind, monkeypatch):
+    index = MutableProductIndex()
+    embeddings = vectors(400)
+    index.upsert([row(i, brand="nike" if i % 10 == 0 else "puma", price=float(i)) for i in range(400)], embeddings)
+    index.rebuild(IndexSpec(kind=kind, nlist=8, nprobe=8))
+    index.save(tmp_path, {})
+    snapshot = ProductIndexStore(tmp_path).get()
+    filters = {"brandName": "Nike", "max_price": 200}
+    expected = [str(i) for i in range(0, 201, 10)]
+
+    for limit in (0, 4096):
+        # Below the limit, ANN indexes score the matching rows exactly
+        monkeypatch.setattr(index_store, "EXACT_FILTER_LIMIT", limit)
+        _, hits = snapshot.search(embeddings[:2], 30, nprobe=8, filters=filters)
+
+        assert all(set(ids(rows)) <= set(expected) for rows in hits)
+        if limit or kind != "hnsw":
+            # A selective filter can cut the HNSW graph walk short; the other paths are exhaustive here
+            assert all(sorted(ids(rows), key=int) == expected for rows in hits)
+            assert ids(hits[0])[0] == "0"
+
+
+def test_exact_filtered_search_matches_brute_force(tmp_path):
+    index = MutableProductIndex()
+    embeddings = vectors(400)
+    index.upsert([row(i, price=float(i)) for i in range(400)], embeddings)
+    index.rebuild(IndexSpec(kind="hnsw"))
+    index.save(tmp_path, {})
+    query = vectors(1, seed=7)
+
+    D, hits = ProductIndexStore(tmp_path).get().search(query, 5, filters={"max_price": 99})
+
+    distances = ((embeddings[:100] - query) ** 2).sum(axis=1)
+    assert ids(hits[0]) == [str(i) for i in np.argsort(distances)[:5]]
+    np.testing.assert_allclose(D[0], np.sort(distances)[:5], rtol=1e-4)
+
+
+def test_hybrid_search_finds_exact_words_the_vectors_miss(tmp_path):
+    index = MutableProductIndex()
+    embeddings = vectors(200)
+    index.upsert([row(i) for i in range(200)], embeddings)
+    index.save(tmp_path, {})
+    snapshot = ProductIndexStore(tmp_path).get()
+
+    _, vector_hits = snapshot.search(embeddings[:1], 5)
+    scores, hybrid_hits = snapshot.search(embeddings[:1], 5, query_texts=["137"])
+
+    assert "137" not in ids(vector_hits[0])
+    # Both are first in one ranking; the tie goes to the lexical match
+    assert ids(hybrid_hits[0])[:2] == ["137", "0"]
+    assert (np.diff(scores[0]) <= 0).all()
+    _, filtered = snapshot.search(embeddings[:1], 5, query_texts=["137"], filters={"max_price": 100})
+    assert ids(filtered[0]) == []
+
+
+def test_checkpoint_without_a_catalog_carries_the_previous_one_over(tmp_path):
+    catalog = SchemaCatalog()
+    catalog.update("1.json", "hash", document_profile({"id": 1, "brandName": "Nike"}))
+    index = MutableProductIndex()
+    index.upsert([row(1)], vectors(1))
+    index.save(tmp_path, {}, catalog)
+    index.save(tmp_path, {})
+
+    assert read_manifest(tmp_path)["files"]["catalog"] == "schema_catalog.v2.json"
+    assert load_schema_catalog(tmp_path).files == catalog.files
+    assert ProductIndexStore(tmp_path).get().catalog()["values"]["brandName"] == {"Nike": 1}
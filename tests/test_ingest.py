@@ -0,0 +1,74 @@
+import json
+
+import pytest
+
+import ingest
+from benchmark import write_synthetic_documents
+from embeddings import BatchEmbedder, HashingEmbeddingProvider
+from index_store import MutableProductIndex, load_schema_catalog, read_manifest
+
+
+@pytest.fixture
+def docs(tmp_path):
+    doc_dir = tmp_path / "documents"
+    doc_dir.mkdir()
+    write_synthetic_documents(doc_dir, 10)
+    return doc_dir
+
+
+def run(doc_dir, index_dir, **options):
+    embedder = BatchEmbedder(HashingEmbeddingProvider(16), batch_size=2, concurrency=1)
+    return ingest.process_product_documents(doc_dir, index_dir, embedder=embedder, add_block_size=2, **options)
+
+
+def test_catalog_is_saved_with_the_last_periodic_checkpoint(docs, tmp_path):
+    stats = run(docs, tmp_path / "index", checkpoint_every=10)
+
+    assert (stats.embedded, stats.profiled, stats.checkpoints) == (10, 10, 1)
+    assert read_manifest(tmp_path / "index")["version"] == 1
+    assert len(load_schema_catalog(tmp_path / "index").files) == 10
+
+
+def test_unchanged_rerun_writes_no_checkpoint(docs, tmp_path):
+    run(docs, tmp_path / "index")
+
+    stats = run(docs, tmp_path / "index")
+
+    assert (stats.skipped, stats.embedded, stats.checkpoints) == (10, 0, 0)
+    assert read_manifest(tmp_path / "index")["version"] == 1
+
+
+def test_crashed_run_resumes_from_the_last_checkpoint(docs, tmp_path, monkeypatch):
+    upsert = MutableProductIndex.upsert
+    calls = []
+
+    def crash_on_third_block(self, rows, vectors):
+        calls.append(len(rows))
+        if len(calls) == 3:
+            raise KeyboardInterrupt
+        return upsert(self, rows, vectors)
+
+    monkeypatch.setattr(MutableProductIndex, "upsert", crash_on_third_block)
+    with pytest.raises(KeyboardInterrupt):
+        run(docs, tmp_path / "index", checkpoint_every=4)
+    monkeypatch.setattr(MutableProductIndex, "upsert", upsert)
+
+    stats = run(docs, tmp_path / "index", checkpoint_every=4)
+
+    assert (stats.skipped, stats.embedded) == (4, 6)
+    assert MutableProductIndex.load(tmp_path / "index").live_count == 10
+
+
+def test_changed_and_deleted_documents_replace_and_remove_their_rows(docs, tmp_path):
+    run(docs, tmp_path / "index")
+    changed = json.loads((docs / "3.json").read_text())
+    changed["data"]["productDisplayName"] = "Renamed product"
+    (docs / "3.json").write_text(json.dumps(changed))
+    (docs / "5.json").unlink()
+
+    stats = run(docs, tmp_path / "index")
+
+    assert (stats.embedded, stats.replaced, stats.removed) == (1, 1, 1)
+    index = MutableProductIndex.load(tmp_path / "index")
+    assert sorted(int(row["product_id"]) for row in index.rows.values()) == [0, 1, 2, 3, 4, 6, 7, 8, 9]
+    assert "Renamed product" in next(row["chunk"] for row in index.rows.values() if row["product_id"] == "3")
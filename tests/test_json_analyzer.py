@@ -0,0 +1,136 @@
+import json
+
+import pytest
+
+import json_analyzer
+from json_analyzer import SAMPLES_PER_KEY, JsonStructureAnalyzer, SchemaCatalog, document_profile
+
+
+def product(i: int) -> dict:
+    return {"data": {
+        "id": i,
+        "price": 100 + i,
+        "brandName": f"brand {i % 7}",
+        "articleAttributes": {"Fit": "Regular", "Sleeve": f"s{i % 3}"},
+        "articleType": {"typeName": "Tshirts"},
+        "styleImages": [{"imageURL": f"u{i}"}, {"imageURL": f"v{i}"}],
+    }}
+
+
+def catalog_of(*products) -> SchemaCatalog:
+    catalog = SchemaCatalog()
+    for i, data in enumerate(products):
+        catalog.update(f"{i}.json", f"hash{i}", document_profile(data))
+    return catalog
+
+
+def test_document_profile_lists_typed_keys_and_catalog_values():
+    profile = document_profile(product(1)["data"])
+
+    assert "price:int" in profile["keys"]
+    assert "articleAttributes.Fit:str" in profile["keys"]
+    assert profile["values"] == {"brandName": "brand 1", "articleType.typeName": "Tshirts"}
+    assert profile["samples"]["brandName"] == "brand 1"
+
+
+def test_summary_counts_documents_per_field_and_value():
+    with_colour = {**product(2)["data"], "baseColour": "Blue", "price": 99.5}
+    summary = catalog_of(product(1)["data"], with_colour).summary()
+
+    assert summary["files"] == 2
+    assert summary["fields"]["baseColour"]["documents"] == 1
+    assert summary["fields"]["price"]["types"] == {"int": 1, "float": 1}
+    assert summary["nested"]["articleAttributes"] == {"Fit": 2, "Sleeve": 2}
+    assert summary["values"]["brandName"] == {"brand 1": 1, "brand 2": 1}
+
+
+def test_updating_or_removing_a_file_keeps_counts_exact():
+    catalog = catalog_of(product(1)["data"], product(2)["data"])
+    catalog.update("0.json", "new hash", document_profile({"id": 1, "brandName": "renamed"}))
+
+    assert catalog.remove("1.json")
+    assert not catalog.remove("1.json")
+    summary = catalog.summary()
+    assert summary["files"] == 1
+    assert summary["values"]["brandName"] == {"renamed": 1}
+    assert "price" not in summary["fields"]
+    assert catalog.file_hash("0.json") == "new hash"
+
+
+def test_round_trip_drops_unused_structures(tmp_path):
+    catalog = catalog_of(product(1)["data"], {"id": 2})
+    catalog.remove("1.json")
+    (tmp_path / "catalog.json").write_text(catalog.to_json())
+
+    loaded = SchemaCatalog.load(tmp_path / "catalog.json")
+
+    assert len(loaded.structures) == 1
+    assert loaded.summary() == catalog.summary()
+
+
+def write_documents(directory, n: int, broken=()):
+    for i in range(n):
+        text = json.dumps(product(i))
+        (directory / f"{i:04d}.json").write_text(text[: len(text) // 2] if i in broken else text)
+
+
+def result(analyzer: JsonStructureAnalyzer) -> tuple:
+    return (dict(analyzer.data_types), analyzer.unique_nested_keys, dict(analyzer.key_counts),
+            {key: list(samples) for key, samples in analyzer.value_samples.items()},
+            analyzer.processed_files, analyzer.error_files)
+
+
+@pytest.fixture(params=["ijson", "json"])
+def parser(request, monkeypatch):
+    if request.param == "ijson":
+        if json_analyzer.ijson is None:
+            pytest.skip("ijson is not installed")
+    else:
+        monkeypatch.setattr(json_analyzer, "ijson", None)
+    return request.param
+
+
+def test_merge_of_consecutive_partials_matches_one_pass(tmp_path, parser):
+    write_documents(tmp_path, 30)
+    paths = sorted(tmp_path.glob("*.json"))
+    serial = json_analyzer.analyze_files(paths)
+
+    merged = JsonStructureAnalyzer()
+    for start in range(0, len(paths), 7):
+        merged.merge(json_analyzer.analyze_files(paths[start:start + 7]))
+
+    assert result(merged) == result(serial)
+    assert list(serial.value_samples["brandName"]) == [f"brand {i}" for i in range(SAMPLES_PER_KEY)]
+
+
+def test_merge_unions_keys_and_adds_counts():
+    left, right = JsonStructureAnalyzer(), JsonStructureAnalyzer()
+    left.analyze_nested_structure({"a": 1, "articleType": {"typeName": "x"}})
+    right.analyze_nested_structure({"a": "one", "b": [1, 2], "articleType": {"id": 3}})
+
+    left.merge(right)
+
+    assert left.data_types["a"] == {"int", "str"}
+    assert left.key_counts["a"] == 2
+    assert left.unique_nested_keys["articleType"] == {"typeName", "id"}
+    assert list(left.value_samples["a"]) == ["1", "one"]
+
+
+def test_unparsable_file_contributes_nothing(tmp_path, parser):
+    write_documents(tmp_path, 10, broken={3})
+    analyzer = json_analyzer.analyze_files(sorted(tmp_path.glob("*.json")))
+    expected = json_analyzer.analyze_files([path for path in sorted(tmp_path.glob("*.json")) if path.name != "0003.json"])
+
+    assert analyzer.error_files == 1
+    assert analyzer.processed_files == 9
+    assert result(analyzer)[:4] == result(expected)[:4]
+
+
+def test_parallel_directory_analysis_matches_serial(tmp_path):
+    write_documents(tmp_path, 40, broken={5, 21})
+    serial, parallel = JsonStructureAnalyzer(), JsonStructureAnalyzer()
+    serial.analyze_directory(str(tmp_path))
+    parallel.analyze_directory(str(tmp_path), workers=2, chunksize=6)
+
+    assert result(parallel) == result(serial)
+    assert parallel.total_files == 40
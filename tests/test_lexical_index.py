@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+
+from lexical_index import BM25Index, lexical_text, reciprocal_rank_fusion, tokenize
+
+
+def row(chunk: str, article_number: str = "", brand: str = "") -> dict:
+    return {"chunk": chunk, "metadata": {"articleNumber": article_number, "brandName": brand}}
+
+
+@pytest.fixture
+def index():
+    return BM25Index.from_rows({
+        3: row("blue denim jacket", "ART0000003", "Levis"),
+        5: row("water bottle steel water bottle", "ART0000005", "Milton"),
+        8: row("blue running shoes", "ART0000008", "Nike"),
+        9: row(""),
+    }.items())
+
+
+def test_tokens_are_lower_case_words():
+    assert tokenize("Nike T-Shirt, ART0001!") == ["nike", "t", "shirt", "art0001"]
+
+
+def test_indexed_text_includes_article_number_and_brand():
+    assert tokenize(lexical_text(row("jacket", "ART1", "Levis"))) == ["jacket", "art1", "levis"]
+
+
+def test_exact_article_number_is_the_top_hit(index):
+    row_ids, scores = index.search("art0000008", 3)
+
+    assert row_ids.tolist() == [8]
+    assert scores[0] > 0
+
+
+def test_rarer_and_repeated_terms_score_higher(index):
+    row_ids, _ = index.search("blue water bottle", 4)
+
+    # "water" and "bottle" occur in one document, twice each; "blue" in two of equal length
+    assert row_ids.tolist() == [5, 3, 8]
+    assert index.search("unknown words", 4)[0].tolist() == []
+
+
+def test_candidates_restrict_the_hits(index):
+    assert index.search("blue", 4, candidates=np.array([8]))[0].tolist() == [8]
+
+
+def test_round_trip_through_bytes(index, tmp_path):
+    (tmp_path / "bm25.npz").write_bytes(index.to_bytes())
+
+    loaded = BM25Index.load(tmp_path / "bm25.npz")
+
+    np.testing.assert_allclose(loaded.scores("blue jacket"), index.scores("blue jacket"))
+
+
+def test_rrf_sums_reciprocal_ranks():
+    fused = dict(reciprocal_rank_fusion([[1, 2], [2, 3]], top_k=3, k=60))
+
+    assert fused[2] == pytest.approx(1 / 62 + 1 / 61)
+    assert fused[1] == pytest.approx(1 / 61)
+
+
+def test_rrf_ties_go_to_the_earlier_ranking():
+    fused = reciprocal_rank_fusion([[7, 8], [9, 8]], top_k=3)
+
+    assert [item for item, _ in fused] == [8, 7, 9]
+    assert fused[1][1] == fused[2][1]
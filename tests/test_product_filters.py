@@ -0,0 +1,75 @@
+import json
+
+import numpy as np
+import pytest
+
+from product_filters import ProductColumns, article_type_of
+
+
+def row(product_id: int, brand: str, gender: str, price: float, article_type: str = None) -> dict:
+    return {
+        "product_id": str(product_id),
+        "chunk": f"Article Type: typeName: {article_type} | " if article_type else "",
+        "metadata": {"brandName": brand, "gender": gender, "price": price},
+    }
+
+
+@pytest.fixture
+def columns():
+    rows = {
+        10: row(1, "Nike", "Men", 799.0, "Tshirts"),
+        11: row(2, "nike ", "Women", 1499.0, "Shoes"),
+        12: row(3, "Puma", "Men", 2500.0, "Tshirts"),
+        14: row(4, "Adidas", "Unisex", 450.0),
+    }
+    return ProductColumns.from_rows(rows.items())
+
+
+def test_article_type_comes_from_the_stored_response_or_the_chunk():
+    assert article_type_of({"response": json.dumps({"article_type": {"typeName": "Watches"}})}) == "Watches"
+    assert article_type_of({"chunk": "Article Type: typeName: Tshirts | Sub Category: x"}) == "Tshirts"
+    assert article_type_of({"chunk": "no type"}) is None
+
+
+def test_categorical_filters_are_case_insensitive_and_any_of(columns):
+    assert columns.select({"brandName": "NIKE"}).tolist() == [10, 11]
+    assert columns.select({"brandName": ["puma", "Adidas"]}).tolist() == [12, 14]
+    assert columns.select({"article_type": "tshirts", "gender": "Men"}).tolist() == [10, 12]
+    assert columns.select({"brandName": "Reebok"}).tolist() == []
+
+
+def test_price_bounds_are_inclusive(columns):
+    assert columns.select({"min_price": 799, "max_price": 1499}).tolist() == [10, 11]
+    assert columns.select({"brandName": "nike", "max_price": 1000}).tolist() == [10]
+
+
+def test_no_filters_match_every_row(columns):
+    assert columns.mask({}).all()
+
+
+def test_round_trip_through_bytes(columns, tmp_path):
+    (tmp_path / "columns.npz").write_bytes(columns.to_bytes())
+
+    loaded = ProductColumns.load(tmp_path / "columns.npz")
+
+    np.testing.assert_array_equal(loaded.row_ids, columns.row_ids)
+    assert loaded.select({"gender": "men", "max_price": 1000}).tolist() == [10]
+
+
+def test_facets_count_values_most_frequent_first(columns):
+    facets = columns.facets()
+
+    assert facets["total"] == 4
+    assert facets["brandName"] == {"nike": 2, "adidas": 1, "puma": 1}
+    assert list(facets["gender"]) == ["men", "unisex", "women"]
+    # Rows without an article type are left out of its counts
+    assert facets["article_type"] == {"tshirts": 2, "shoes": 1}
+    assert facets["price"] == {"0-500": 1, "500-1000": 1, "1000-2000": 1, "2000-5000": 1}
+
+
+def test_facets_of_a_filter_mask_with_custom_buckets(columns):
+    facets = columns.facets(columns.mask({"gender": "men"}), limit=1, price_buckets=[1000.0])
+
+    assert facets["total"] == 2
+    assert facets["brandName"] == {"nike": 1}
+    assert facets["price"] == {"0-1000": 1, "1000+": 1}
@@ -0,0 +1,115 @@
+import numpy as np
+import pytest
+
+from reranker import entity_terms, mmr_select, rerank_rows, rerank_scores
+
+
+def hit(product_id: int, distance: float, brand: str = "Puma", gender: str = "Men", name: str = "T-shirt",
+        price: float = 999.0, rating: float = 0.0) -> dict:
+    return {
+        "product_id": str(product_id),
+        "distance": distance,
+        "chunk": "",
+        "metadata": {"brandName": brand, "gender": gender, "productDisplayName": name, "price": price,
+                     "myntraRating": rating},
+    }
+
+
+def test_entity_terms_are_distinct_lower_case_words():
+    assert entity_terms(["Nike T-shirt", "Men", "nike"]) == ["nike", "t", "shirt", "men"]
+
+
+def test_exact_entity_match_beats_a_slightly_closer_mismatch():
+    rows = [hit(1, 0.90, brand="Puma"), hit(2, 0.95, brand="Nike")]
+
+    ranked = rerank_rows(rows, 2, entities=["Nike", "Men", "T-shirt"])
+
+    assert [row["product_id"] for row in ranked] == ["2", "1"]
+
+
+def test_similarity_still_decides_between_equal_matches():
+    rows = [hit(1, 1.2, brand="Nike"), hit(2, 0.8, brand="Nike")]
+
+    assert [row["product_id"] for row in rerank_rows(rows, 2, entities=["Nike"])] == ["2", "1"]
+
+
+def test_entity_words_match_whole_words_only():
+    rows = [hit(1, 1.0, gender="Women"), hit(2, 1.0, gender="Men")]
+
+    scores = rerank_scores(rows, entities=["Men"])
+
+    assert scores[1] > scores[0]
+
+
+def test_hybrid_scores_are_higher_is_better():
+    rows = [hit(1, 1 / 61), hit(2, 1 / 62)]
+
+    scores = rerank_scores(rows, higher_is_better=True)
+
+    assert scores[0] > scores[1]
+    assert scores[0] - scores[1] < 0.05
+
+
+def test_max_price_is_a_hard_limit():
+    rows = [hit(1, 0.5, brand="Nike", price=2500.0), hit(2, 1.0, price=900.0), hit(3, 1.1, price=1000.0)]
+
+    ranked = rerank_rows(rows, 3, entities=["Nike"], max_price=1000.0)
+
+    assert [row["product_id"] for row in ranked] == ["2", "3"]
+
+
+def test_min_price_is_a_soft_preference():
+    rows = [hit(1, 1.0, price=400.0), hit(2, 1.0, price=900.0)]
+
+    scores = rerank_scores(rows, min_price=800.0)
+
+    assert scores[1] > scores[0]
+    assert len(rerank_rows(rows, 2, min_price=800.0)) == 2
+
+
+def variants(n_products: int, per_product: int, dim: int = 32, seed: int = 0) -> np.ndarray:
+    """Rows i * per_product .. (i + 1) * per_product - 1 are near-identical variants of product i."""
+    rng = np.random.default_rng(seed)
+    products = rng.standard_normal((n_products, dim))
+    return np.repeat(products, per_product, axis=0) + 0.05 * rng.standard_normal((n_products * per_product, dim))
+
+
+def test_zero_diversity_keeps_relevance_order():
+    vectors = variants(4, 5)
+    relevance = np.random.default_rng(1).random(len(vectors))
+
+    picked = mmr_select(vectors, relevance, 6, diversity=0.0)
+
+    np.testing.assert_array_equal(picked, np.argsort(-relevance)[:6])
+
+
+def test_diversity_skips_near_duplicates():
+    vectors = variants(4, 5)
+    # The variants of product 0 are the most relevant, then those of product 1, ...
+    relevance = -np.arange(len(vectors), dtype=np.float64)
+
+    plain = mmr_select(vectors, relevance, 4, diversity=0.0)
+    diverse = mmr_select(vectors, relevance, 4, diversity=0.7)
+
+    assert {i // 5 for i in plain} == {0}
+    assert diverse[0] == 0
+    assert sorted(i // 5 for i in diverse) == [0, 1, 2, 3]
+
+
+def test_picks_are_distinct_and_bounded_by_candidates():
+    vectors = variants(2, 2)
+
+    picked = mmr_select(vectors, np.ones(len(vectors)), 10, diversity=0.5)
+
+    assert sorted(picked.tolist()) == [0, 1, 2, 3]
+    assert len(mmr_select(vectors[:0], np.zeros(0), 5, diversity=0.5)) == 0
+
+
+@pytest.mark.parametrize("distinct_relevance, threshold", [(0.0, 0.9 / 1.9), (0.8, 0.1 / 1.1)])
+def test_near_duplicate_is_passed_over_once_diversity_outweighs_its_relevance_lead(distinct_relevance, threshold):
+    # Scaled similarity: 1 between the top pick and its near-duplicate, about 0 to the distinct candidate
+    vectors = np.array([[1.0, 0.0], [1.0, 0.001], [0.0, 1.0], [0.6, 0.8]])
+    relevance = np.array([1.0, 0.9, distinct_relevance, 0.0])
+
+    assert mmr_select(vectors, relevance, 2, diversity=threshold - 0.01)[1] == 1
+    assert mmr_select(vectors, relevance, 2, diversity=threshold + 0.01)[1] == 2
@@ -0,0 +1,160 @@
+import numpy as np
+import pytest
+
+import result_cache
+from result_cache import QueryResultCache, ResultSetStore, SemanticQueryCache, check_indices, query_cache_key
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(result_cache.time, "monotonic", clock)
+    return clock
+
+
+def test_query_key_ignores_case_whitespace_and_unset_options():
+    assert (query_cache_key(" Nike  Shoes", 5, {"gender": "Men"}, nprobe=None, mode="vector")
+            == query_cache_key("nike shoes", 5, {"gender": "Men"}, mode="vector"))
+    assert query_cache_key("nike shoes", 5) != query_cache_key("nike shoes", 10)
+    assert query_cache_key("nike shoes", 5, mode="vector") != query_cache_key("nike shoes", 5, mode="hybrid")
+
+
+def test_new_index_version_drops_every_entry():
+    cache = QueryResultCache()
+    cache.put("a", 1, ["old"])
+    cache.put("b", 1, ["old"])
+
+    assert cache.get("a", 1) == ["old"]
+    assert cache.get("a", 2) is None
+    assert cache.get("b", 1) is None  # the old version is gone, not kept alongside
+    assert cache.stats()["invalidations"] == 1
+
+
+def test_entries_expire_after_ttl(clock):
+    cache = QueryResultCache(ttl=10)
+    cache.put("a", 1, ["x"])
+
+    clock.now += 10
+    assert cache.get("a", 1) == ["x"]
+    clock.now += 1
+    assert cache.get("a", 1) is None
+    assert cache.stats()["expired"] == 1
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = QueryResultCache(max_entries=2)
+    cache.put("a", 1, "a")
+    cache.put("b", 1, "b")
+    cache.get("a", 1)
+    cache.put("c", 1, "c")
+
+    assert [cache.get(key, 1) for key in "abc"] == ["a", None, "c"]
+    assert cache.stats()["hits"] == 3
+
+
+def unit(*values) -> np.ndarray:
+    vector = np.array(values, dtype=np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+def test_paraphrase_above_the_threshold_hits_with_the_same_options():
+    cache = SemanticQueryCache(threshold=0.95, verify_rate=0.0)
+    cache.put(unit(1, 0, 0), ("opts",), 1, ["nike shoes"])
+
+    assert cache.lookup(unit(1, 0.1, 0), ("opts",), 1) == (["nike shoes"], False)
+    assert cache.lookup(unit(1, 0.5, 0), ("opts",), 1) == (None, False)
+    assert cache.lookup(unit(1, 0.1, 0), ("other opts",), 1) == (None, False)
+
+
+def test_semantic_entries_belong_to_one_index_version():
+    cache = SemanticQueryCache()
+    cache.put(unit(1, 0), "opts", 1, ["x"])
+
+    assert cache.lookup(unit(1, 0), "opts", 2)[0] is None
+    assert cache.lookup(unit(1, 0), "opts", 1)[0] is None
+    assert cache.stats()["invalidations"] == 1
+
+
+def test_oldest_semantic_entry_is_evicted():
+    cache = SemanticQueryCache(max_entries=2)
+    for i, vector in enumerate([unit(1, 0, 0), unit(0, 1, 0), unit(0, 0, 1)]):
+        cache.put(vector, "opts", 1, i)
+
+    assert [cache.lookup(vector, "opts", 1)[0] for vector in (unit(1, 0, 0), unit(0, 1, 0), unit(0, 0, 1))] == [None, 1, 2]
+
+
+def test_verification_outcomes_feed_the_false_hit_rate():
+    cache = SemanticQueryCache(verify_rate=1.0)
+    cache.put(unit(1, 0), "opts", 1, ["x"])
+
+    assert cache.lookup(unit(1, 0), "opts", 1) == (["x"], True)
+    cache.record_verification(false_hit=True)
+    cache.record_verification(false_hit=False)
+    assert cache.stats()["false_hit_rate"] == 0.5
+
+
+def test_get_returns_items_in_index_order():
+    store = ResultSetStore()
+    handle = store.put(["a", "b", "c"])
+
+    assert store.get(handle) == ["a", "b", "c"]
+    assert store.get(handle, [2, 0]) == ["c", "a"]
+    assert store.get(handle, []) == []
+
+
+def test_handle_expires_after_ttl_since_last_use(clock):
+    store = ResultSetStore(ttl=10)
+    handle = store.put(["a"])
+
+    clock.now += 8
+    assert store.get(handle) == ["a"]  # use refreshes the TTL
+    clock.now += 8
+    assert store.get(handle) == ["a"]
+    clock.now += 11
+    with pytest.raises(KeyError):
+        store.get(handle)
+    assert store.stats()["entries"] == 0
+
+
+def test_least_recently_used_set_is_evicted():
+    store = ResultSetStore(max_entries=2)
+    first, second = store.put(["a"]), store.put(["b"])
+    store.get(first)
+    third = store.put(["c"])
+
+    with pytest.raises(KeyError):
+        store.get(second)
+    assert store.get(first) == ["a"]
+    assert store.get(third) == ["c"]
+    assert store.stats()["evicted"] == 1
+
+
+def test_out_of_range_index_raises_index_error():
+    store = ResultSetStore()
+    handle = store.put(["a", "b"])
+
+    with pytest.raises(IndexError):
+        store.get(handle, [2])
+    with pytest.raises(IndexError):
+        store.get(handle, [-1])
+
+
+@pytest.mark.parametrize("indices", ["[1, 0]", [1, "0"], [1.0], [True], 1, {0: 1}])
+def test_indices_must_be_a_list_of_ints(indices):
+    store = ResultSetStore()
+    handle = store.put(["a", "b"])
+
+    with pytest.raises(ValueError, match="list of ints"):
+        store.get(handle, indices)
+
+
+def test_check_indices_accepts_tuples():
+    assert check_indices((1, 0)) == [1, 0]
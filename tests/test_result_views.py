@@ -0,0 +1,58 @@
+import json
+
+import numpy as np
+import pytest
+
+from benchmark import synthetic_product
+from mcp_server import present_results
+from models import ProductChunkTyped, ProductResponse, ProductResultSet, ProductTable
+from result_views import SUMMARY_FIELDS, field_getter, project_rows, view_fields
+
+
+@pytest.fixture
+def products():
+    rng = np.random.default_rng(0)
+    return [ProductResponse.from_product_chunk(ProductChunkTyped.from_json(synthetic_product(i, rng))) for i in range(3)]
+
+
+def test_view_fields():
+    assert view_fields("full") is None
+    assert view_fields("summary") == SUMMARY_FIELDS
+    assert view_fields("ids") == ["id"]
+    assert view_fields("summary", ["id", "price"]) == ["id", "price"]
+
+
+@pytest.mark.parametrize("view, fields", [("everything", None), ("full", ["id", "colour"])])
+def test_unknown_view_or_field_raises(view, fields):
+    with pytest.raises(ValueError):
+        view_fields(view, fields)
+
+
+def test_field_paths_reach_metadata_and_nested_dicts(products):
+    product = products[0]
+
+    assert field_getter("id")(product) == product.id
+    assert field_getter("price")(product) == product.product_metadata.price
+    assert field_getter("article_type.typeName")(product) == product.article_type["typeName"]
+    assert field_getter("article_attributes.NoSuchAttribute")(product) is None
+
+
+def test_project_rows_follows_field_order(products):
+    rows = project_rows(products, ["brandName", "id"])
+
+    assert rows == [[product.product_metadata.brandName, product.id] for product in products]
+
+
+def test_compact_results_are_plain_dicts_without_nulls(products):
+    table = present_results(products, ["id", "article_attributes.NoSuchAttribute"], compact=True)
+    full = present_results(products, None, compact=True)
+
+    assert isinstance(table, dict) and isinstance(full, dict)
+    assert table["rows"] == [[product.id, None] for product in products]
+    assert "null" not in json.dumps(full)
+    assert [product["id"] for product in full["products"]] == [product.id for product in products]
+
+
+def test_results_keep_models_unless_compact(products):
+    assert isinstance(present_results(products), ProductResultSet)
+    assert isinstance(present_results(products, ["id"]), ProductTable)
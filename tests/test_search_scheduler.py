@@ -0,0 +1,70 @@
+import asyncio
+
+import pytest
+
+from search_scheduler import MicroBatcher
+
+
+class Recorder:
+    def __init__(self, fail_on=None):
+        self.batches = []
+        self.fail_on = fail_on
+
+    async def __call__(self, key, requests):
+        self.batches.append((key, list(requests)))
+        if self.fail_on in requests:
+            raise RuntimeError("index search failed")
+        return [f"{key}:{request}" for request in requests]
+
+
+def submit_all(batcher, calls):
+    async def main():
+        return await asyncio.gather(*(batcher.submit(key, request) for key, request in calls),
+                                    return_exceptions=True)
+    return asyncio.run(main())
+
+
+def test_concurrent_requests_with_one_key_share_a_batch():
+    process = Recorder()
+    batcher = MicroBatcher(process, window=0.01)
+
+    results = submit_all(batcher, [("k", i) for i in range(5)])
+
+    assert results == [f"k:{i}" for i in range(5)]
+    assert process.batches == [("k", [0, 1, 2, 3, 4])]
+    assert (batcher.batches, batcher.requests, batcher.largest_batch) == (1, 5, 5)
+
+
+def test_different_keys_are_never_mixed():
+    process = Recorder()
+
+    results = submit_all(MicroBatcher(process, window=0.01), [("a", 1), ("b", 2), ("a", 3)])
+
+    assert results == ["a:1", "b:2", "a:3"]
+    assert sorted(process.batches) == [("a", [1, 3]), ("b", [2])]
+
+
+def test_a_full_batch_is_sent_without_waiting_for_the_window():
+    process = Recorder()
+
+    submit_all(MicroBatcher(process, window=60.0, max_batch=2), [("k", i) for i in range(4)])
+
+    assert process.batches == [("k", [0, 1]), ("k", [2, 3])]
+
+
+@pytest.mark.parametrize("window, max_batch", [(0.0, 32), (0.01, 1)])
+def test_batching_can_be_disabled(window, max_batch):
+    process = Recorder()
+
+    submit_all(MicroBatcher(process, window=window, max_batch=max_batch), [("k", 1), ("k", 2)])
+
+    assert process.batches == [("k", [1]), ("k", [2])]
+
+
+def test_a_failed_batch_fails_each_of_its_requests():
+    process = Recorder(fail_on=2)
+
+    results = submit_all(MicroBatcher(process, window=0.01), [("a", 1), ("a", 2), ("b", 3)])
+
+    assert [type(result) for result in results[:2]] == [RuntimeError, RuntimeError]
+    assert results[2] == "b:3"